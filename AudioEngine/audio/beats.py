@@ -0,0 +1,257 @@
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from .manifest import read_manifest, stem_file, drum_stem
+
+# Beat-Raster pro Song aus dem Drum-Stem: Onset-Kurve aus der Energie pro
+# Frame, Tempo ueber die Autokorrelation, Phase ueber die Onset-Summe entlang
+# des Rasters, Downbeat = staerkste Position im 4er-Takt. Alles vektorisiert
+# mit NumPy, gerechnet im Process-Pool, Ergebnis als .beats.npz neben dem Song.
+
+HOP = 512            # Samples pro Onset-Frame
+MIN_BPM = 70
+MAX_BPM = 180
+PREFERRED_BPM = 120  # Gewichtung gegen Halb-/Doppeltempo
+BEATS_PER_BAR = 4
+
+def _decode_mono(stem_path):
+    # im Worker ohne Stem-Cache dekodieren (offline-Server, einmal pro Prozess)
+    from pyo import SndTable, sndinfo
+    from .engine import AudioEngine
+
+    engine = AudioEngine(audio="offline")
+    if not engine.server.getIsBooted():
+        engine.boot()
+    info = sndinfo(stem_path)
+    snd = SndTable(stem_path)
+    chnls = max(1, int(info[3]))
+    mono = np.zeros(snd.getSize(), dtype=np.float32)
+    for c in range(chnls):
+        mono += np.asarray(snd.getBuffer(c))[:len(mono)]
+    del snd
+    return mono / chnls, float(info[2])
+
+def onset_envelope(mono):
+    # log-Energie pro Frame, nur Anstiege, lokaler Mittelwert abgezogen
+    n = len(mono) // HOP
+    frames = mono[:n * HOP].reshape(n, HOP)
+    energy = np.log1p(1000 * (frames.astype(np.float32) ** 2).mean(axis=1))
+    onset = np.maximum(0, np.diff(energy, prepend=energy[:1]))
+    local = np.convolve(onset, np.ones(16) / 16, mode="same")
+    return np.maximum(0, onset - local)
+
+def estimate_period(onset, fps):
+    # Autokorrelation ueber FFT, Kandidaten zwischen MIN_BPM und MAX_BPM,
+    # Vielfache des Lags zaehlen mit (Kamm), Ergebnis in Frames (nicht ganzzahlig)
+    n = len(onset)
+    size = 1 << (2 * n - 1).bit_length()
+    spec = np.fft.rfft(onset - onset.mean(), size)
+    ac = np.fft.irfft(spec * np.conj(spec), size)[:n]
+
+    lo = max(1, int(fps * 60 / MAX_BPM))
+    hi = min(n // 4, int(fps * 60 / MIN_BPM) + 1)
+    if hi <= lo + 2:
+        return None
+    lags = np.arange(lo, hi)
+    comb = ac[lags] + 0.5 * ac[2 * lags] + 0.25 * ac[4 * lags]
+    bpms = 60 * fps / lags
+    score = comb * np.exp(-0.5 * np.log2(bpms / PREFERRED_BPM) ** 2)
+
+    i = int(np.argmax(score))
+    lag = float(lags[i])
+    if 0 < i < len(score) - 1:
+        a, b, c = score[i - 1:i + 2]
+        denom = a - 2 * b + c
+        if denom != 0:
+            lag += 0.5 * (a - c) / denom
+    return lag
+
+def fit_grid(onset, period):
+    # beste Phase fuer das Raster, dann jeden Beat auf das naechste
+    # Onset-Maximum ziehen und Phase/Periode per Ausgleichsgerade nachfuehren
+    n = len(onset)
+    count = int((n - 1) / period)
+    k = np.arange(count)
+    phases = np.arange(int(np.ceil(period)))
+    idx = np.minimum((phases[:, None] + k[None, :] * period).round().astype(int), n - 1)
+    phase = float(phases[np.argmax(onset[idx].sum(axis=1))])
+
+    w = max(1, int(period / 8))
+    centers = (phase + k * period).round().astype(int)
+    window = np.clip(centers[:, None] + np.arange(-w, w + 1)[None, :], 0, n - 1)
+    peaks = window[np.arange(count), np.argmax(onset[window], axis=1)]
+    strength = onset[peaks]
+    strong = strength > np.median(strength)
+    if strong.sum() >= 8:
+        period, phase = np.polyfit(k[strong], peaks[strong].astype(float), 1)
+    return phase, period
+
+def analyze_beats(stem_path, out_path, source_id, npy_path=None, file_sr=None):
+    # laeuft im Worker-Prozess; npy_path: schon dekodierter Stem aus dem Cache
+    if npy_path is not None:
+        pcm = np.load(npy_path, mmap_mode="r")
+        mono = pcm.mean(axis=0, dtype=np.float32)
+        sr = file_sr
+    else:
+        mono, sr = _decode_mono(stem_path)
+
+    fps = sr / HOP
+    onset = onset_envelope(mono)
+    bpm = 0.0
+    beats = np.zeros(0)
+    downbeats = np.zeros(0)
+    confidence = 0.0
+
+    period = estimate_period(onset, fps) if onset.any() else None
+    if period is not None:
+        phase, period = fit_grid(onset, period)
+        # Raster ueber den ganzen Song, auch vor dem ersten erkannten Beat
+        phase %= period
+        positions = phase + np.arange(int((len(onset) - phase) / period) + 1) * period
+        positions = positions[positions < len(onset)]
+        beats = positions / fps
+        bpm = 60 * fps / period
+
+        strength = onset[np.minimum(positions.round().astype(int), len(onset) - 1)]
+        usable = len(strength) // BEATS_PER_BAR * BEATS_PER_BAR
+        bar_pos = int(np.argmax(strength[:usable].reshape(-1, BEATS_PER_BAR).mean(axis=0))) if usable else 0
+        downbeats = beats[bar_pos::BEATS_PER_BAR]
+        confidence = float(strength.mean() / (onset.mean() + 1e-9))
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, source=np.array(source_id), bpm=np.array(bpm), beats=beats, downbeats=downbeats,
+                 confidence=np.array(confidence))
+    os.replace(tmp, out_path)
+    return out_path
+
+class BeatGrid:
+    def __init__(self, bpm, beats, downbeats, confidence=0.0):
+        self.bpm = bpm
+        self.beats = beats         # Sekunden
+        self.downbeats = downbeats # Sekunden, erster Beat jedes Takts
+        self.confidence = confidence
+
+    @property
+    def first_beat(self):
+        return float(self.beats[0]) if len(self.beats) else 0.0
+
+    @staticmethod
+    def read(path, source_id):
+        # None, wenn nicht vorhanden oder veraltet, bpm 0 -> kein Tempo erkannt
+        try:
+            with np.load(path) as data:
+                if str(data["source"]) != source_id:
+                    return None
+                return BeatGrid(float(data["bpm"]), data["beats"], data["downbeats"], float(data["confidence"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def snap(self, target, current, unit="beat"):
+        # Ziel auf den naechsten Beat/Takt ziehen, der Abstand des Kopfes zum
+        # letzten Beat/Takt bleibt erhalten -> der Rhythmus laeuft ohne Versatz weiter
+        grid = self.downbeats if unit == "bar" else self.beats
+        if len(grid) == 0:
+            return target
+        i = int(np.clip(np.searchsorted(grid, target), 1, len(grid) - 1))
+        nearest = grid[i - 1] if target - grid[i - 1] <= grid[i] - target else grid[i]
+        j = max(0, int(np.searchsorted(grid, current, side="right")) - 1)
+        offset = max(0.0, current - grid[j])
+        return float(nearest + offset)
+
+class BeatService:
+    # Analyse im Process-Pool, angestossen beim Indexieren (niedrige Prioritaet)
+    # und bei load/preload. Auf dem Lade-Pfad wird nur nachgeschlagen (get),
+    # fertige Raster gehen an die listeners (song pfad, grid).
+    # workers=0: nur fertige Dateien lesen (z.B. im Deck-Prozess)
+    def __init__(self, cache, workers=1):
+        self.cache = cache
+        # spawn statt fork: der Hauptprozess hat laufende Audio-Threads
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) \
+            if workers > 0 else None
+        self.grids = {} # song pfad -> BeatGrid, nur die letzten Songs
+        self.lock = threading.Lock()
+        self.listeners = []
+
+        # ein Song nach dem anderen, load/preload vor Index-Auftraegen
+        self.jobs = queue.PriorityQueue()
+        self.seq = itertools.count()
+        threading.Thread(target=self._run, name="beats", daemon=True).start()
+
+    @staticmethod
+    def beats_path(song_path):
+        return os.path.join(song_path, ".beats.npz")
+
+    @staticmethod
+    def drums_path(song_path):
+        # Stem mit role "drums" aus dem Manifest
+        stem = drum_stem(read_manifest(song_path))
+        if stem is None:
+            raise ValueError("kein Drum-Stem im Manifest")
+        return stem_file(song_path, stem)
+
+    def get(self, song_path):
+        with self.lock:
+            return self.grids.get(song_path)
+
+    def prepare(self, song_path):
+        # nach load/preload: Raster in den RAM holen, falls noetig berechnen
+        if self.get(song_path) is None:
+            self.jobs.put((0, next(self.seq), song_path, True))
+
+    def prepare_many(self, song_paths):
+        # nach dem Indexieren: nur sicherstellen, dass die Datei da ist
+        for song_path in song_paths:
+            self.jobs.put((1, next(self.seq), song_path, False))
+
+    def _run(self):
+        while True:
+            _, _, song_path, remember = self.jobs.get()
+            try:
+                grid = self._ensure(song_path, remember)
+            except Exception as e:
+                print(f"[Beats] {os.path.basename(song_path)}: {e}")
+                continue
+            if grid is None or grid.bpm <= 0 or not remember:
+                continue
+            with self.lock:
+                if len(self.grids) >= 16:
+                    self.grids.pop(next(iter(self.grids)))
+                self.grids[song_path] = grid
+            for listener in list(self.listeners):
+                listener(song_path, grid)
+
+    def _ensure(self, song_path, remember=False):
+        stem_path = self.drums_path(song_path)
+        st = os.stat(stem_path)
+        source_id = f"{st.st_mtime_ns}|{st.st_size}"
+        out_path = self.beats_path(song_path)
+        grid = BeatGrid.read(out_path, source_id)
+        if grid is not None or self.executor is None:
+            return grid
+
+        # load/preload: ueber den Stem-Cache, wartet auf einen laufenden Decode
+        # des Loaders statt denselben Stem parallel zu dekodieren. Beim Indexieren
+        # nur mitbenutzen, was schon im Cache liegt, sonst dekodiert der Worker
+        start = time.perf_counter()
+        if self.cache is None:
+            cached = None
+        elif remember:
+            cached = self.cache.pcm_file(stem_path)
+        else:
+            cached = self.cache.cached_file(stem_path)
+        npy_path, file_sr = cached if cached is not None else (None, None)
+        self.executor.submit(analyze_beats, stem_path, out_path, source_id, npy_path, file_sr).result()
+        grid = BeatGrid.read(out_path, source_id)
+        if grid is None or grid.bpm <= 0:
+            print(f"[Beats] {os.path.basename(song_path)}: kein Tempo erkannt")
+        else:
+            print(f"[Beats] {os.path.basename(song_path)}: {grid.bpm:.1f} BPM, {len(grid.beats)} Beats "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return grid
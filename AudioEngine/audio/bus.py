@@ -0,0 +1,69 @@
+from pyo import *
+from .effects import EffectsFactory
+
+class EffectBus:
+    # Send/Return: ein gemeinsamer Effekt (z.B. ein Freeverb) fuer alle Kanaele,
+    # jeder Kanal schickt mit eigenem Send-Level hinein
+    def __init__(self, name, fx_type, channels, out=True):
+        self.name = name
+        self.fx_type = fx_type
+        self.out = out # False: Return wird von der Session gemischt
+        self.levels = {ch.id: 0.0 for ch in channels}
+
+        self.mixer = Mixer(outs=1, chnls=2, time=0.05)
+        for ch in channels:
+            # post-fader, nach der Effektkette des Kanals
+            self.mixer.addInput(ch.id, ch.output)
+            self.mixer.setAmp(ch.id, 0, 0)
+
+        # nur das Wet-Signal, der Dry-Anteil laeuft schon ueber die Kanaele
+        self.fx = EffectsFactory.create(fx_type, self.mixer[0], 0.5, wet_only=True)
+        if self.out:
+            self.fx.out_node.out()
+
+        # solange kein Kanal sendet, rechnet der Bus nicht
+        self.active = True
+        self._update_active()
+
+    def set_send(self, ch_id, level):
+        level = max(0.0, min(1.0, float(level)))
+        self.levels[ch_id] = level
+        self.mixer.setAmp(ch_id, 0, level)
+        self._update_active()
+
+    def set_param(self, param, value):
+        if param == 'x':
+            return self.fx.set_x(value)
+        elif param == 'y':
+            return self.fx.set_y(value)
+        print("Parameter ist nicht x oder y")
+
+    def _update_active(self):
+        active = any(level > 0 for level in self.levels.values())
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            self.mixer.play()
+            self.fx.play()
+            if self.out:
+                self.fx.out_node.out()
+        else:
+            self.mixer.stop()
+            self.fx.stop()
+
+    def suspend(self):
+        self.mixer.stop()
+        self.fx.stop()
+
+    def resume(self):
+        # nur wieder starten, wenn ein Kanal sendet
+        if self.active:
+            self.mixer.play()
+            self.fx.play()
+            if self.out:
+                self.fx.out_node.out()
+
+    def print_state(self):
+        sends = ", ".join(f"{ch}: {level:.2f}" for ch, level in self.levels.items())
+        print(f"[Bus] {self.name} ({'aktiv' if self.active else 'aus'}) x={self.fx.x:.2f} y={self.fx.y:.2f} | {sends}")
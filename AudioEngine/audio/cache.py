@@ -0,0 +1,233 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from pyo import *
+
+class StemCache:
+    # Dekodierte Stems (float32 PCM) auf Platte + LRU im RAM,
+    # damit ein Song nicht bei jedem load neu aus MP3 dekodiert wird
+    DECODE_CHUNK = 30 # Sekunden pro Stueck beim Dekodieren langer Stems
+
+    def __init__(self, cache_dir, max_mem_mb, sr):
+        self.cache_dir = cache_dir
+        self.max_mem_bytes = int(max_mem_mb * 1024 * 1024)
+        self.sr = sr
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # key -> (pcm array [chnls, frames], sample rate der datei)
+        self.mem = OrderedDict()
+        self.mem_bytes = 0
+        self.lock = threading.Lock()
+        # key -> Lock, damit jeder Stem nur einmal gleichzeitig dekodiert wird
+        self.decoding = {}
+
+        # Statistik
+        self.hits_mem = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.load_times = {} # stem pfad -> (quelle, sekunden)
+
+    def key(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{int(self.sr)}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _files(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".npy", base + ".sr"
+
+    @staticmethod
+    def _tmp(path):
+        # eigener Temp-Name pro Prozess/Thread: parallele Writes desselben
+        # Keys (z.B. aus Deck-Prozessen) ueberschreiben sich nicht gegenseitig
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.decoding.setdefault(key, threading.Lock())
+
+    def _write_sr(self, sr_file, file_sr):
+        tmp = self._tmp(sr_file)
+        with open(tmp, "w") as f:
+            f.write(str(file_sr))
+        os.replace(tmp, sr_file)
+
+    def _decode(self, path):
+        # MP3 einmalig ueber pyo dekodieren
+        info = sndinfo(path)
+        snd = SndTable(path)
+        chnls = max(1, int(info[3]))
+        pcm = np.empty((chnls, snd.getSize()), dtype=np.float32)
+        for c in range(chnls):
+            pcm[c] = np.asarray(snd.getBuffer(c))[:pcm.shape[1]]
+        del snd
+        return pcm, float(info[2])
+
+    def _decode_chunked(self, key, path):
+        # stueckweise direkt in die .npy Datei dekodieren,
+        # der ganze Stem liegt dabei nie im RAM
+        info = sndinfo(path)
+        frames = int(info[0])
+        file_sr = float(info[2])
+        chnls = max(1, int(info[3]))
+        npy_file, sr_file = self._files(key)
+        tmp = self._tmp(npy_file)
+
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(chnls, frames))
+        step = int(self.DECODE_CHUNK * file_sr)
+        pos = 0
+        while pos < frames:
+            snd = SndTable(path, start=pos / file_sr, stop=min(frames, pos + step) / file_sr)
+            n = min(snd.getSize(), frames - pos)
+            if n <= 0:
+                break
+            for c in range(chnls):
+                out[c, pos:pos + n] = np.asarray(snd.getBuffer(c))[:n]
+            del snd
+            pos += n
+        out.flush()
+        del out
+        os.replace(tmp, npy_file)
+        self._write_sr(sr_file, file_sr)
+
+    def _write(self, key, pcm, file_sr):
+        # atomar schreiben, damit abgebrochene Writes keinen kaputten Cache hinterlassen
+        npy_file, sr_file = self._files(key)
+        tmp = self._tmp(npy_file)
+        with open(tmp, "wb") as f:
+            np.save(f, pcm)
+        os.replace(tmp, npy_file)
+        self._write_sr(sr_file, file_sr)
+
+    def _remember(self, key, pcm, file_sr):
+        # nur echte RAM-Kopien, ein memmap wuerde in mem_bytes nur mitgezaehlt
+        if pcm.nbytes > self.max_mem_bytes or isinstance(pcm, np.memmap):
+            return
+        self.mem[key] = (pcm, file_sr)
+        self.mem_bytes += pcm.nbytes
+        # aelteste Eintraege rauswerfen bis Limit passt
+        while self.mem_bytes > self.max_mem_bytes:
+            _, (old, _) = self.mem.popitem(last=False)
+            self.mem_bytes -= old.nbytes
+
+    def forget(self, path):
+        # RAM-Kopie eines Stems verwerfen (z.B. freigegebener stummer Stem),
+        # die .npy Datei bleibt fuer das naechste Laden liegen
+        try:
+            key = self.key(path)
+        except OSError:
+            return
+        with self.lock:
+            entry = self.mem.pop(key, None)
+            if entry is not None:
+                self.mem_bytes -= entry[0].nbytes
+
+    def get_pcm(self, path):
+        # liefert (pcm, sample rate der datei, quelle)
+        key = self.key(path)
+        with self.lock:
+            entry = self.mem.get(key)
+            if entry is not None:
+                self.mem.move_to_end(key)
+                self.hits_mem += 1
+                return entry[0], entry[1], "ram"
+
+        npy_file, sr_file = self._files(key)
+        # laeuft schon ein Decode fuer diesen Stem, danach von Platte lesen
+        with self._key_lock(key):
+            if os.path.exists(npy_file) and os.path.exists(sr_file):
+                # memmap, Seiten werden erst beim Kopieren gelesen
+                pcm = np.load(npy_file, mmap_mode="r")
+                with open(sr_file) as f:
+                    file_sr = float(f.read())
+                source = "disk"
+            else:
+                pcm, file_sr = self._decode(path)
+                self._write(key, pcm, file_sr)
+                source = "decode"
+
+        if isinstance(pcm, np.memmap) and pcm.nbytes <= self.max_mem_bytes:
+            # Disk-Hit: RAM-Kopie fuer den LRU, ausserhalb des Locks lesen
+            pcm = np.array(pcm)
+
+        with self.lock:
+            if source == "disk":
+                self.hits_disk += 1
+            else:
+                self.misses += 1
+            self._remember(key, pcm, file_sr)
+        return pcm, file_sr, source
+
+    def pcm_file(self, path):
+        # Pfad der .npy Datei (fuer andere Prozesse/Streaming), dekodiert falls noetig
+        key = self.key(path)
+        npy_file, sr_file = self._files(key)
+        with self._key_lock(key):
+            if not (os.path.exists(npy_file) and os.path.exists(sr_file)):
+                self._decode_chunked(key, path)
+                with self.lock:
+                    self.misses += 1
+        with open(sr_file) as f:
+            return npy_file, float(f.read())
+
+    def cached_file(self, path):
+        # wie pcm_file, aber ohne zu dekodieren: None wenn noch nicht im Cache
+        npy_file, sr_file = self._files(self.key(path))
+        if not (os.path.exists(npy_file) and os.path.exists(sr_file)):
+            return None
+        with open(sr_file) as f:
+            return npy_file, float(f.read())
+
+    def open_pcm(self, path):
+        # lange Stems: nur als memmap, landet nicht im RAM-Cache
+        start = time.perf_counter()
+        npy_file, file_sr = self.pcm_file(path)
+        pcm = np.load(npy_file, mmap_mode="r")
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.load_times[path] = ("stream", elapsed)
+        print(f"[Cache] {os.path.basename(path)}: stream in {elapsed * 1000:.1f} ms")
+        return pcm, file_sr
+
+    def load_table(self, path):
+        # liefert (DataTable, dauer in sekunden)
+        start = time.perf_counter()
+        pcm, file_sr, source = self.get_pcm(path)
+
+        chnls, frames = pcm.shape
+        table = DataTable(size=frames, chnls=chnls)
+        for c in range(chnls):
+            np.asarray(table.getBuffer(c))[:frames] = pcm[c]
+
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.load_times[path] = (source, elapsed)
+        print(f"[Cache] {os.path.basename(path)}: {source} in {elapsed * 1000:.1f} ms")
+        return table, frames / file_sr
+
+    def stats(self):
+        with self.lock:
+            load_times = {}
+            for path, (source, elapsed) in self.load_times.items():
+                stem = f"{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}"
+                load_times[stem] = {"source": source, "ms": round(elapsed * 1000, 1)}
+
+            return {
+                "hits_mem": self.hits_mem,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "mem_entries": len(self.mem),
+                "mem_mb": round(self.mem_bytes / (1024 * 1024), 1),
+                "load_times": load_times,
+            }
+
+    def print_stats(self):
+        st = self.stats()
+        print(f"[Cache] RAM-Hits: {st['hits_mem']}, Disk-Hits: {st['hits_disk']}, Misses: {st['misses']}, "
+              f"RAM: {st['mem_entries']} Stems / {st['mem_mb']} MB")
+        for stem, t in st["load_times"].items():
+            print(f"\t{stem}: {t['source']} {t['ms']} ms")
@@ -1,109 +1,304 @@
+import time
 from pyo import *
-from .effects import EffectsFactory
+from .pool import EffectPool
+from .eq import EQCascade, LINEAR_TYPES, GLIDE as EQ_GLIDE
+from .stream import StreamTable
+from .stats import table_bytes
 
 class AudioChannel:
-    def __init__(self, channel_id):
+    def __init__(self, channel_id, cache, transport, pool_sizes=None, out=True, fuse_eq=True):
         self.id = channel_id
+        self.cache = cache
+        self.transport = transport
+        # Name kommt aus dem Manifest des geladenen Songs, "" = Kanal unbenutzt
         self.track_type = ""
-        match self.id:
-            case 0:
-                self.track_type = "Bass"
-            case 1:
-                self.track_type = "Drums"
-            case 2:
-                self.track_type = "Instruments"
-            case 3:
-                self.track_type = "Vocals"
 
         self.muted = False
-        self.speed_val = SigTo(value=1.0, time=2.5, init=1.0) # glaettung von aenderungen
+        self.touched = time.monotonic() # letzte Aenderung durch den Benutzer
+        self.silent_since = None # seit wann stumm (mute/Lautstaerke 0)
 
         # Statt SfPlayer lieber SndTable
-        self.table = SndTable(initchnls=2) # Leere Table beim Start
-        self.phasor = Phasor(freq=0) # "Abspielkopf", Freq 0 -> stehender Kopf
-        self.player = Pointer(table=self.table, index=self.phasor)
+        self.empty = SndTable(initchnls=2) # Leere Table beim Start und fuer freigegebene Stems
+        self.table = self.empty
+        self.loaded = False # liegt der Stem gerade in der Table
+        self.duration = 0
+        # Abspielkopf kommt vom gemeinsamen Transport,
+        # scale gleicht abweichende Stem-Laengen aus, offset verschiebt den Stem
+        self.scale = Sig(1)
+        self.offset = Sig(0)
+        self.offset_sec = 0.0
+        # kuerzere oder verschobene Stems: Index am Rand festhalten statt von
+        # vorne zu wiederholen, ausserhalb 0-1 ist der Stem stumm
+        self.stem_pos = Sig(self.transport.phasor, mul=self.scale, add=self.offset)
+        self.index = Clip(self.stem_pos, min=0, max=1)
+        self.inside = Between(self.stem_pos, min=0, max=1)
+        self.player = Pointer(table=self.table, index=self.index)
+
+        # Streaming: Index im Ringpuffer, wird erst bei Bedarf gebaut
+        self.stream = None
+        self.ring_ratio = None
+        self.ring_index = None
 
         # Output Routing
         self.amp = SigTo(1, time=0.05)
         self.effects = []
         self.player.setMul(self.amp)
 
-        self.output = Switch(input=self.player, outs=1)
-        self.output.out()
+        # gate vom Transport: bei Pause/Stop ausblenden, dazu stumm hinter dem Stem-Ende
+        self.edge = self.transport.gate * self.inside
+        self.output = Switch(input=self.player, outs=1, mul=self.edge)
+        if out:
+            # sonst mischt die Session/Deck den Ausgang selbst
+            self.output.out()
         #self.fx_output = None #Switch(input=None, outs=1)
         #self.fx_output.out()
 
         self.last_input = self.player
         self.last_amp = self.amp
 
-    def get_phasor_phase(self):
-        print(f"Phase von Phasor: {self.phasor.phase}")
-    
-    def load(self, filepath):
-        print(f"{filepath}/{self.track_type}.mp3")
-        self.table.setSound(f"{filepath}/{self.track_type}.mp3")
+        # Effekte werden beim Start vorab gebaut und nur noch ausgeliehen
+        self.pool = EffectPool(pool_sizes or {}, clock=transport)
+
+        # benachbarte Filter-Effekte als eine Biquad-Kaskade rechnen
+        self.fuse_eq = fuse_eq
+        self.cascades = []
+
+        # angehalten, solange die Session im Leerlauf ist
+        self.suspended = False
+
+        # Freeze: gerenderte Kette statt Live-Graph
+        self.stem_file = None
+        self.frozen = False
+        self.frozen_player = None
+        self.chain_version = 0 # zaehlt jede Aenderung an der Kette
+
+    def assign(self, name):
+        # Kanal bekommt einen Stem aus dem Manifest, None -> unbenutzt
+        self.track_type = name or ""
+
+    def swap_table(self, table, duration, stem_file=None):
+        # neue Table einhaengen, alte wird vom GC aufgeraeumt
+        # Transport-Dauer muss vorher gesetzt sein (SongLoader)
+        # table None: Stem bleibt zugeordnet, liegt aber nicht im RAM (stumm)
+        if self.frozen:
+            self.unfreeze()
+        self.stem_file = stem_file
+        self.duration = duration
+        self.loaded = table is not None
+        if table is None:
+            table = self.empty
+
+        if isinstance(table, StreamTable):
+            # nur ein Fenster um den Kopf liegt in der Table
+            if self.ring_index is None:
+                self.ring_ratio = Sig(1)
+                self.ring_index = Wrap(Sig(self.index, mul=self.ring_ratio))
+            self.ring_ratio.value = table.ratio
+            if not self.suspended:
+                self.ring_index.play()
+            self.stream = table
+            self.table = table.table
+            self.player.setIndex(self.ring_index)
+        else:
+            if self.ring_index is not None:
+                self.ring_index.stop()
+            self.stream = None
+            self.table = table
+            self.player.setIndex(self.index)
 
-        duration = self.table.getDur()
-        if duration > 0:
-            self.phasor.setFreq(self.speed_val.value / duration)
-            self.phasor.reset() # An Anfang spulen
-            self.phasor.setPhase(0.0)
+        self.player.setTable(self.table)
+        self._update_alignment()
 
-    def toggle_mute(self):
-        self.muted = not self.muted
-        self.player.setMul(0 if self.muted else 1)
-        return
+    def _update_alignment(self):
+        if self.duration <= 0:
+            return
+        self.scale.value = self.transport.duration / self.duration
+        self.offset.value = self.offset_sec / self.duration
 
-    def set_speed(self, speed):
-        self.speed_val.value = speed
+    def set_offset(self, seconds):
+        # Stem gegenueber dem Transport verschieben (z.B. fuer Alignment)
+        self.offset_sec = float(seconds)
+        self._update_alignment()
 
-        duration = self.table.getDur()
-        if duration > 0:
-            self.phasor.setFreq(self.speed_val.value / duration)
-        return
+    def stem_position(self, pos=None):
+        # normierte Position im Stem fuer Transport-Position pos (Standard: aktuell)
+        if pos is None:
+            pos = self.transport.position()
+        return min(1.0, max(0.0, pos * self.scale.value + self.offset.value))
 
-    def scrub_speed(self, speed):
-        newSpeed = self.player.speed
-        if newSpeed < speed:
-            while newSpeed < speed:
-                newSpeed += 0.012
-                self.player.setSpeed(newSpeed)
-                time.sleep(0.03)
-        else:
-            while newSpeed > speed:
-                newSpeed -= 0.012
-                self.player.setSpeed(newSpeed)
-                time.sleep(0.03)
-        
-        self.speed.setSpeed(speed)
+    def prefetch(self, pos):
+        # vor einem Seek aufrufen, damit der Ring am Ziel schon Daten hat
+        if self.stream is not None:
+            self.stream.prefetch(self.stem_position(pos))
+
+    def toggle_mute(self):
+        self.muted = not self.muted
+        self.touched = time.monotonic()
+        # beim Aufheben wieder an die Kanal-Lautstaerke, nicht fest auf 1
+        self.player.setMul(0 if self.muted else self.amp)
+        if self.frozen_player is not None:
+            self.frozen_player.setMul(0 if self.muted else self.amp)
+        self._update_silence()
         return
 
-    def seek(self, position):
-        pos = max(0.0, min(1.0, float(position)))
-        # An Anfang spulen und dann Phase setzen
-        self.phasor.reset()
-        self.phasor.setPhase(pos) 
+    def audible(self):
+        return not self.muted and self.amp.value > 0
+
+    def _update_silence(self):
+        if self.audible():
+            self.silent_since = None
+        elif self.silent_since is None:
+            self.silent_since = time.monotonic()
+
+    def chain_spec(self):
+        return [(fx["wrapper"].fx_type, fx["wrapper"].x, fx["wrapper"].y)
+                for fx in self.effects if not fx["wrapper"].bypassed]
+
+    def _chain_changed(self):
+        # vor jeder Aenderung: gefrorene Kette wieder live schalten
+        self.chain_version += 1
+        self.touched = time.monotonic()
+        if self.frozen:
+            self.unfreeze()
+
+    def freeze(self, table):
+        # Live-Kette stoppen und nur noch die gerenderte Table abspielen
+        mul = 0 if self.muted else self.amp
+        self.frozen_player = Pointer(table=table, index=self.index, mul=mul)
+        self.output.setInput(self.frozen_player)
+        if self.suspended:
+            self.frozen_player.stop()
+        for fx in self.effects:
+            if fx["wrapper"].active:
+                fx["wrapper"].stop()
+        for cascade in self.cascades:
+            cascade.stop()
+        self.player.stop()
+        self.frozen = True
+        print(f"[Freeze] {self.track_type}: {len(self.effects)} Effekte eingefroren")
+
+    def unfreeze(self):
+        if not self.frozen:
+            return
+        # Live-Graph wieder starten, Position kommt weiter vom Transport
+        self.frozen = False
+        if not self.suspended:
+            self.player.play()
+            self._rewire()
+        self.frozen_player.stop()
+        self.frozen_player = None
+        print(f"[Freeze] {self.track_type}: wieder live")
+
+    def suspend(self):
+        # Leerlauf: gesamten Kanal-Graph anhalten, Zustand bleibt erhalten
+        if self.suspended:
+            return
+        self.suspended = True
+        for fx in self.effects:
+            if fx["wrapper"].active:
+                fx["wrapper"].stop()
+        for cascade in self.cascades:
+            cascade.stop()
+        if self.frozen_player is not None:
+            self.frozen_player.stop()
+        self.player.stop()
+        for node in (self.stem_pos, self.index, self.inside, self.edge):
+            node.stop()
+        if self.stream is not None:
+            self.ring_index.stop()
+        self.output.stop()
+
+    def resume(self):
+        if not self.suspended:
+            return
+        self.suspended = False
+        for node in (self.stem_pos, self.index, self.inside, self.edge):
+            node.play()
+        if self.stream is not None:
+            self.ring_index.play()
+        self.output.play()
+        if self.frozen:
+            self.frozen_player.play()
+        else:
+            self.player.play()
+            self._rewire()
+
+    def _rewire(self):
+        # Kette vom Player bis zum Output neu verdrahten,
+        # Laeufe von >= 2 linearen Filtern laufen als eine EQCascade,
+        # umgangene Effekte (bypass) werden gestoppt und uebersprungen
+        chain = []
+        for fx in self.effects:
+            if fx["wrapper"].bypassed:
+                if fx["wrapper"].active:
+                    fx["wrapper"].stop()
+                fx["wrapper"].fused = None
+            else:
+                chain.append(fx)
+
+        src = self.player
+        used = 0
+        n = len(chain)
+        i = 0
+        while i < n:
+            j = i
+            if self.fuse_eq:
+                while j < n and chain[j]["wrapper"].fx_type in LINEAR_TYPES:
+                    j += 1
+
+            if j - i >= 2:
+                run = [fx["wrapper"] for fx in chain[i:j]]
+                if used == len(self.cascades):
+                    self.cascades.append(EQCascade())
+                cascade = self.cascades[used]
+                used += 1
+                # Einzel-Effekte pausieren, x/y bleiben im Wrapper gespeichert
+                for fx in run:
+                    if fx.active:
+                        fx.stop()
+                    fx.fused = cascade
+                src = cascade.configure(src, run)
+                i = j
+            else:
+                fx = chain[i]["wrapper"]
+                fx.fused = None
+                if not fx.active:
+                    fx.play()
+                fx.set_input(src)
+                src = fx.out_node
+                i += 1
+
+        for cascade in self.cascades[used:]:
+            cascade.stop()
+
+        self.last_input = src
+        self.last_amp = chain[-1]["amp"] if chain else self.amp
+        if not self.frozen:
+            self.output.setInput(self.last_input)
 
     def set_vol(self, volume):
+        self.touched = time.monotonic()
         #self.player.setMul(volume)
         self.amp.value = volume
-        return
+        self._update_silence()
+        return self.amp.time
 
     def effect_add(self, fx_type, y):
+        fx_wrapper = self.effect_acquire(fx_type, y)
+        if fx_wrapper is not None:
+            self.effect_attach(fx_wrapper)
+
+    def effect_acquire(self, fx_type, y):
+        # Effekt aus dem Pool holen (Amp haengt schon am out node), ggf. nachbauen.
+        # Bei Bundles im Control-Thread, eingehaengt wird erst im Block
         print(f"\tHinzufuegen von Effekttyp {fx_type}")
         if not self.player:
-            return
+            return None
+        return self.pool.acquire(fx_type, self.last_input, y)
 
-        # Factory Effekt erstellen lassen
-        fx_wrapper = EffectsFactory.create(fx_type, self.last_input, y)
-        
-        if fx_wrapper is None:
-            return
-
-        new_amp = SigTo(1, time=0.5, init=1)
-        
-        # Wrapper out node fuer Routing
-        fx_wrapper.out_node.setMul(new_amp)
+    def effect_attach(self, fx_wrapper):
+        self._chain_changed()
+        new_amp = fx_wrapper.amp
         
         # Wrapper und Amp in Liste einfuegen
         self.effects.append({
@@ -111,64 +306,69 @@ class AudioChannel:
             'amp': new_amp
         })
         
-        self.last_input = fx_wrapper.out_node
-        self.last_amp = new_amp
+        self._rewire()
 
-        self.output.setInput(self.last_input)
-
-    def effect_rm(self, id):
+    def effect_rm(self, id, log=True):
         # evtll suche nach ID in Zukunft statt nur Index
+        # log=False: im Block-Callback (Bundles) nichts ausgeben
 
-        print(f"\tEntferne Effekt an Stelle {id}")
+        if log:
+            print(f"\tEntferne Effekt an Stelle {id}")
         # falls index hoeher als elemente in liste
         fx_size = len(self.effects)
         if id >= fx_size:
             return
+        self._chain_changed()
 
-        effect_node = self.effects[id]
-        
-        # faelle zu beachten
-        # 1. einziger effekt in chain (-> rohen input direkt in out)
-        if fx_size == 1:
-            self.last_input = self.player
-            self.last_amp = self.amp
-            self.output.setInput(self.last_input)
-        # 2. letzter effekt in chain (-> nur vorheriges element zum output chainen)
-        elif id == (fx_size - 1):
-            prev_node = self.effects[id - 1]
-            self.last_input = prev_node["wrapper"].out_node
-            self.last_amp = prev_node["amp"]
-            self.output.setInput(self.last_input)
-        # 3. erster effekt in chain (-> rohen input in naechstes element chainen)
-        elif id == 0:
-            next_node = self.effects[id + 1]
-            next_node["wrapper"].set_input(self.player)
-        # sonst mittendrin
-        else:
-            prev_mixer = self.effects[id - 1]["wrapper"].out_node
-            next_node = self.effects[id + 1]
-            next_node["wrapper"].set_input(prev_mixer)
+        effect_node = self.effects.pop(id)
 
-        effect_node["wrapper"].stop()
-        self.effects.pop(id)
+        # Nachbarn neu verbinden (auch wenn dadurch Filter-Laeufe verschmelzen)
+        self._rewire()
 
+        # zurueck in den Pool statt wegwerfen
+        effect_node["wrapper"].fused = None
+        self.pool.release(effect_node["wrapper"])
 
-    def effect_set(self, id, param, value):
-        print(f"\tSetze Parameter {param} von Effekt {id} gleich {value}")
+
+    def effect_set(self, id, param, value, log=True):
+        if log:
+            print(f"\tSetze Parameter {param} von Effekt {id} gleich {value}")
         
         if id >= len(self.effects):
             return
+        self._chain_changed()
 
-        effect_node = self.effects[id]
+        fx = self.effects[id]["wrapper"]
+        if fx.bypassed:
+            # wer einen Effekt anfasst, will ihn auch hoeren
+            fx.bypassed = False
+            self._rewire()
         
         if param == 'x':
-            effect_node["wrapper"].set_x(value)
+            smoothing = fx.set_x(value)
         elif param == 'y':
-            effect_node["wrapper"].set_y(value)
+            smoothing = fx.set_y(value)
         else:
             print("Parameter ist nicht x oder y")
             return
 
+        # in der Kaskade: Koeffizienten neu berechnen, die Stufe gleitet dorthin
+        if fx.fused is not None:
+            fx.fused.update()
+            return EQ_GLIDE
+        return smoothing
+
+    def effect_bypass(self, id, bypassed):
+        # Effekt aus der Kette nehmen ohne ihn zu entfernen
+        if id >= len(self.effects):
+            return
+        fx = self.effects[id]["wrapper"]
+        if fx.bypassed == bypassed:
+            return
+        self._chain_changed()
+        fx.bypassed = bypassed
+        self._rewire()
+
     def effect_swap(self):
         # effekt chain swappen
         # noetig, damit die reihenfolge ggf geaendert werden kann
@@ -177,25 +377,50 @@ class AudioChannel:
         # OOB zugriffe verhindern oder swappen mit sich selber
         fx_size = len(self.effects)
         if fx_size != 2: return
-
-        # FX A und FX B zwischenspeichern
-        fx_a = self.effects[0]
-        fx_b = self.effects[1]
-
-        # Chaining swappen
-        fx_a_out = fx_a["wrapper"].out_node
-        fx_b_out = fx_b["wrapper"].out_node
-        fx_a["wrapper"].set_input(fx_b_out)
-        fx_b["wrapper"].set_input(self.player)
-        self.output.setInput(fx_a_out)
-
-        # Position im Array tauschen
-        self.effects[0] = fx_b
-        self.effects[1] = fx_a
-
-        # sicherheitshalber last... anpassen
-        self.last_input = self.effects[fx_size-1]["wrapper"]
-        self.last_amp = self.effects[fx_size-1]["amp"]
+        self._chain_changed()
+
+        # Position im Array tauschen und neu verdrahten
+        self.effects[0], self.effects[1] = self.effects[1], self.effects[0]
+        self._rewire()
+
+    def get_state(self):
+        return {
+            "track": self.track_type or None,
+            "loaded": self.loaded,
+            "muted": self.muted,
+            "frozen": self.frozen,
+            "streaming": self.stream is not None,
+            "volume": round(float(self.amp.value), 3),
+            "offset": round(self.offset_sec, 3),
+            "effects": [{"type": fx["wrapper"].fx_type,
+                         "x": round(fx["wrapper"].x, 3),
+                         "y": round(fx["wrapper"].y, 3),
+                         "bypassed": fx["wrapper"].bypassed} for fx in self.effects],
+        }
+
+    def stats(self):
+        # lebende pyo-Objekte und Table-Speicher dieses Kanals
+        base = [self.scale, self.offset, self.stem_pos, self.index, self.inside, self.edge, self.player, self.amp, self.output]
+        if self.ring_index is not None:
+            base += [self.ring_ratio, self.ring_index]
+        if self.frozen_player is not None:
+            base.append(self.frozen_player)
+        effects = [{"type": fx["wrapper"].fx_type,
+                    "nodes": len(fx["wrapper"]._nodes()),
+                    "active": fx["wrapper"].active,
+                    "fused": fx["wrapper"].fused is not None} for fx in self.effects]
+        stages = sum(len(cascade.stages) for cascade in self.cascades)
+        pool_nodes = sum(len(fx._nodes()) for free in self.pool.free.values() for fx in free) \
+            + sum(len(fx._nodes()) for _, fx in self.pool.draining)
+        return {
+            "track": self.track_type,
+            # je Stufe ein Biquada + 6 Koeffizienten-SigTos
+            "nodes": len(base) + sum(fx["nodes"] for fx in effects) + stages * 7,
+            "effects": effects,
+            "cascade_stages": stages,
+            "pool_nodes": pool_nodes + 1, # + silence
+            "table_mb": round(table_bytes(self.table) / (1024 * 1024), 1),
+        }
 
     def effects_print(self):
         for fx in self.effects:
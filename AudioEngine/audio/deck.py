@@ -0,0 +1,367 @@
+import math
+import queue
+import threading
+import multiprocessing
+from pyo import *
+from .manifest import read_manifest, stem_file
+from .stats import process_stats, rss_mb
+
+# Decks: jeweils vier Stems + Effektketten (eine AudioSession).
+# Ein Deck laeuft entweder im Hauptprozess (LocalDeck) oder in einem eigenen
+# Prozess mit eigenem pyo-Server (ProcessDeck). Der Deck-Prozess rechnet
+# Block fuer Block im Takt des Haupt-Servers und schreibt seinen Ausgang in
+# einen Ringpuffer aus SharedTables, den der Haupt-Server ausliest und mischt.
+
+class LocalDeck:
+    def __init__(self, deck_id, session):
+        self.id = deck_id
+        self.session = session
+        self.gain = session.gain
+
+    def handle_cmd(self, cmd):
+        return self.session.handle_cmd(cmd)
+
+    def handle_fx_cmd(self, cmd):
+        return self.session.handle_fx_cmd(cmd)
+
+    def prepare_bundle_cmd(self, kind, cmd):
+        return self.session.prepare_bundle_cmd(kind, cmd)
+
+    def get_state(self):
+        return self.session.get_state()
+
+    def stats(self):
+        return dict(self.session.stats(), deck=self.id)
+
+    def tick(self):
+        pass
+
+    def stop(self):
+        pass
+
+def deck_worker(deck_id, options, ring_names, cmd_q, state_q, tick, ready):
+    # laeuft im Deck-Prozess: eigener Server im manual-Modus,
+    # ein server.process() pro Tick vom Haupt-Server
+    from .engine import AudioEngine
+    from .cache import StemCache
+    from .session import AudioSession
+    from .freeze import Freezer
+    from .beats import BeatService
+
+    engine = AudioEngine(sr=options["sr"], buffersize=options["buffersize"], audio="manual")
+    engine.start()
+
+    cache = StemCache(options["cache_path"], options["cache_mem_mb"], options["sr"])
+    session = AudioSession(engine, cache, options["song_base"], pool_sizes=options["pool_sizes"], out=False,
+                           freezer=Freezer(engine, cache, options), fuse_eq=options.get("fuse_eq", True),
+                           idle_hold=options.get("idle_hold", 2.0), idle_threshold=options.get("idle_threshold", 1e-4),
+                           stream_after=options.get("stream_after"), stream_window=options.get("stream_window", 30),
+                           beats=BeatService(cache, workers=0), # Analyse laeuft im Hauptprozess
+                           stem_slots=options.get("stem_slots", 4), stem_release=options.get("stem_release"))
+
+    rings = [SharedTable(name, create=False, size=options["ring_size"]) for name in ring_names]
+    # TableFill schreibt den Deck-Ausgang in die Ringe, die Liste haelt die
+    # Objekte am Leben (pyo stoppt sie sonst beim Aufraeumen)
+    fills = [TableFill(session.output[i], rings[i]) for i in range(2)]
+
+    # Vorlauf: so viele Blocks liegt das Deck vor dem Lesekopf
+    for _ in range(options["prefill"]):
+        engine.server.process()
+    ready.set()
+
+    state_every = max(1, int(options["sr"] / options["buffersize"] / options["state_rate"]))
+    blocks = 0
+    while True:
+        if not tick.acquire(timeout=1.0):
+            continue
+
+        # Befehle immer zwischen zwei Blocks -> atomar pro Block
+        while True:
+            try:
+                item = cmd_q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                for fill in fills:
+                    fill.stop()
+                engine.stop()
+                return
+            kind, msg = item
+            # Bundle: alle Befehle vor demselben Block
+            for kind, msg in (msg if kind == "bundle" else [(kind, msg)]):
+                try:
+                    if kind == "cmd":
+                        session.handle_cmd(msg)
+                    else:
+                        session.handle_fx_cmd(msg)
+                except Exception as e:
+                    print(f"[Deck {deck_id}] Fehler bei '{msg}': {e}")
+
+        engine.server.process()
+
+        blocks += 1
+        if blocks % state_every == 0:
+            try:
+                state_q.put_nowait(session.get_state())
+            except queue.Full:
+                pass
+
+class ProcessDeck:
+    def __init__(self, deck_id, options):
+        self.id = deck_id
+        self.state = {}
+        self.started = False
+        # stumme Stems laedt der Deck-Prozess erst beim Aufdrehen
+        self.lazy = options.get("stem_release") is not None
+
+        ring_size = options["buffersize"] * options["ring_blocks"]
+        ring_names = [f"/mci_deck{deck_id}_{side}" for side in ("l", "r")]
+        self.rings = [SharedTable(name, create=True, size=ring_size) for name in ring_names]
+
+        ctx = multiprocessing.get_context("spawn")
+        self.cmd_q = ctx.Queue()
+        self.state_q = ctx.Queue(maxsize=4)
+        self.tick_sem = ctx.Semaphore(0)
+        self.ready = ctx.Event()
+        self.process = ctx.Process(target=deck_worker, name=f"deck{deck_id}", daemon=True,
+                                   args=(deck_id, dict(options, ring_size=ring_size), ring_names,
+                                         self.cmd_q, self.state_q, self.tick_sem, self.ready))
+        self.process.start()
+
+        # Lesekopf: eine Umdrehung pro Ring, startet erst wenn das Deck bereit ist
+        self.gain = SigTo(1, time=0.05, init=1)
+        self.reader = Osc(table=self.rings, freq=options["sr"] / ring_size, interp=1, mul=self.gain)
+        self.reader.out()
+
+    def handle_cmd(self, cmd):
+        self.cmd_q.put(("cmd", cmd))
+
+    def handle_fx_cmd(self, cmd):
+        self.cmd_q.put(("fx", cmd))
+
+    def handle_bundle(self, entries):
+        self.cmd_q.put(("bundle", entries))
+
+    def get_state(self):
+        while True:
+            try:
+                self.state = self.state_q.get_nowait()
+            except queue.Empty:
+                return self.state
+
+    def stats(self):
+        # Details kennt nur der Deck-Prozess selbst ("@N stats" gibt sie dort aus)
+        return {"deck": self.id, "pid": self.process.pid, "rss_mb": rss_mb(self.process.pid)}
+
+    def tick(self):
+        # im Block-Callback des Haupt-Servers: dem Deck einen Block freigeben
+        if not self.started:
+            if not self.ready.is_set():
+                return
+            # Lesekopf auf 0, Deck ist jetzt prefill Blocks voraus
+            self.reader.reset()
+            self.started = True
+        self.tick_sem.release()
+
+    def stop(self):
+        self.cmd_q.put(None)
+        self.tick_sem.release()
+        self.process.join(timeout=2)
+
+class DeckRouter:
+    # Verteilt cmd/fx nach Deck-ID ("@1 load ..."), ohne Prefix -> Deck 0.
+    # xfade/deckvol werden hier im Mixer behandelt.
+    def __init__(self, decks, library=None, waveform=None, song_base=None, engine=None, beats=None):
+        self.decks = decks
+        self.beats = beats
+        self.engine = engine # fuer Bundles im selben Block
+        self.library = library
+        self.waveform = waveform
+        self.song_base = song_base
+        self.xfade = 0.5
+        self.volumes = [1.0] * len(decks)
+        self._update_gains()
+        if beats is not None and any(isinstance(deck, ProcessDeck) for deck in decks):
+            beats.listeners.append(self._grid_ready)
+
+    def _grid_ready(self, song_path, grid):
+        # Deck-Prozesse lesen das fertige Raster selbst von Platte
+        for deck in self.decks:
+            if isinstance(deck, ProcessDeck):
+                deck.handle_cmd("grid")
+
+    @staticmethod
+    def split_deck(cmd):
+        parts = cmd.split(maxsplit=1)
+        if parts and parts[0].startswith("@") and parts[0][1:].isdigit():
+            return int(parts[0][1:]), parts[1] if len(parts) > 1 else ""
+        return 0, cmd
+
+    def set_queue(self, queue):
+        for deck in self.decks:
+            if isinstance(deck, LocalDeck):
+                deck.session.queue = queue
+
+    def _update_gains(self):
+        # Crossfader zwischen Deck 0 (A) und 1 (B), equal power
+        for i, deck in enumerate(self.decks):
+            fade = 1.0
+            if len(self.decks) > 1 and i < 2:
+                angle = self.xfade * math.pi / 2
+                fade = math.cos(angle) if i == 0 else math.sin(angle)
+            deck.gain.value = self.volumes[i] * fade
+
+    def _deck(self, deck_id):
+        if deck_id >= len(self.decks):
+            print(f"[Router] Deck {deck_id} gibt es nicht")
+            return None
+        return self.decks[deck_id]
+
+    def handle_cmd(self, cmd):
+        deck_id, msg = self.split_deck(cmd)
+        cmd_split = msg.split()
+        if not cmd_split:
+            return
+
+        if cmd_split[0] == "xfade":
+            if len(cmd_split) > 1:
+                self.xfade = max(0.0, min(1.0, float(cmd_split[1])))
+                self._update_gains()
+            return
+
+        elif cmd_split[0] == "deckvol":
+            # deckvol <deck> <volume>
+            if len(cmd_split) > 2 and self._deck(int(cmd_split[1])) is not None:
+                self.volumes[int(cmd_split[1])] = float(cmd_split[2])
+                self._update_gains()
+            return
+
+        deck = self._deck(deck_id)
+        if deck is None:
+            return
+
+        # Deck-Prozesse haben keinen Song-Index -> hier pruefen und Waveforms anstossen
+        if cmd_split[0] in ("load", "preload") and len(cmd_split) > 2 and isinstance(deck, ProcessDeck):
+            if self.library is not None and self.library.check(cmd_split[1], cmd_split[2]):
+                print(f"[Library] {cmd_split[1]}-{cmd_split[2]}: Stems fehlen")
+                return
+            song_path = f"{self.song_base}/{cmd_split[1]}-{cmd_split[2]}"
+            # lazy: welche Stems geladen sind, weiss nur der Deck-Prozess ->
+            # Waveforms dann nur auf Anfrage
+            if self.waveform is not None and not deck.lazy:
+                try:
+                    self.waveform.prepare_song([stem_file(song_path, stem) for stem in read_manifest(song_path)])
+                except ValueError as e:
+                    print(f"[Waveform] {cmd_split[1]}-{cmd_split[2]}: {e}")
+            if self.beats is not None:
+                self.beats.prepare(song_path)
+
+        return deck.handle_cmd(msg)
+
+    def handle_fx_cmd(self, cmd):
+        deck_id, msg = self.split_deck(cmd)
+        deck = self._deck(deck_id)
+        if deck is None:
+            return
+        return deck.handle_fx_cmd(msg)
+
+    def handle_bundle(self, entries):
+        # [(cmd/fx, "@N ..."), ...]: lokale Befehle laufen zusammen im
+        # Block-Callback, Deck-Prozesse bekommen ihren Teil als ein Paket
+        local = []
+        remote = {}
+        for kind, msg in entries:
+            deck_id, rest = self.split_deck(msg)
+            deck = self._deck(deck_id)
+            if isinstance(deck, ProcessDeck) and rest.split()[:1] not in (["xfade"], ["deckvol"]):
+                remote.setdefault(deck_id, []).append((kind, rest))
+            else:
+                local.append((kind, msg))
+
+        for deck_id, items in remote.items():
+            self.decks[deck_id].handle_bundle(items)
+        if not local:
+            return
+
+        # Pruefen, Prefetch, Pool und Wake hier im Control-Thread,
+        # im Block laufen nur noch die vorbereiteten Setter
+        steps = []
+        for kind, msg in local:
+            try:
+                step = self._prepare_bundle_cmd(kind, msg)
+            except Exception as e:
+                print(f"[Router] Fehler im Bundle bei '{msg}': {e}")
+                continue
+            if step is not None:
+                steps.append((msg, *step))
+
+        errors = []
+        done = threading.Event()
+
+        def apply():
+            for msg, step, _ in steps:
+                try:
+                    step()
+                except Exception as e:
+                    errors.append((msg, e)) # ausgeben erst im Control-Thread
+            done.set()
+
+        if self.engine is not None:
+            self.engine.call_in_block(apply)
+            # der naechste Befehl der Queue darf nicht vor dem Bundle laufen
+            if not done.wait(timeout=1.0):
+                print("[Router] Bundle nach 1 s noch nicht angewendet")
+        else:
+            apply()
+        for msg, e in errors:
+            print(f"[Router] Fehler im Bundle bei '{msg}': {e}")
+        for _, _, after in steps:
+            if after is not None:
+                after()
+
+    def _prepare_bundle_cmd(self, kind, msg):
+        deck_id, rest = self.split_deck(msg)
+        cmd_split = rest.split()
+        if kind == "cmd" and cmd_split[:1] == ["xfade"]:
+            value = max(0.0, min(1.0, float(cmd_split[1])))
+            def xfade():
+                self.xfade = value
+                self._update_gains()
+            return xfade, None
+        if kind == "cmd" and cmd_split[:1] == ["deckvol"]:
+            target = int(cmd_split[1])
+            if self._deck(target) is None:
+                return None
+            def deckvol():
+                self.volumes[target] = float(cmd_split[2])
+                self._update_gains()
+            return deckvol, None
+        deck = self._deck(deck_id)
+        if deck is None:
+            return None
+        return deck.prepare_bundle_cmd(kind, rest)
+
+    def handle_query(self, cmd):
+        if self.library is None:
+            return None
+        return self.library.handle_query(self.split_deck(cmd)[1])
+
+    def get_state(self):
+        return {
+            "xfade": round(self.xfade, 3),
+            "volumes": [round(v, 3) for v in self.volumes],
+            "decks": [deck.get_state() for deck in self.decks],
+        }
+
+    def stats(self):
+        # fuer /stats: Hauptprozess + alle Decks
+        return dict(process_stats(), decks=[deck.stats() for deck in self.decks])
+
+    def tick(self):
+        # als Block-Listener an der Engine
+        for deck in self.decks:
+            deck.tick()
+
+    def stop(self):
+        for deck in self.decks:
+            deck.stop()
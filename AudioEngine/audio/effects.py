@@ -1,7 +1,12 @@
+import time
 from pyo import *
 
+# Notenlaengen in Beats fuer die tempo-synchronen Effekte (1/32 bis 1 Takt)
+BEAT_DIVISIONS = [0.125, 0.25, 0.5, 1.0, 2.0, 4.0]
+
 class Effect:
     def __init__(self, in_node, out_node, x_sig, y_sig, x_mapper, y_mapper, keep_alive=None):
+        self.fx_type = None     # wird von EffectsFactory gesetzt
         self.in_node = in_node  # effekt selbst als pyo-obj
         self.out_node = out_node
         # SigTo fuer Params einzeln
@@ -12,32 +17,112 @@ class Effect:
         self.x_mapper = x_mapper 
         self.y_mapper = y_mapper 
 
+        # Zwischenobjekte (LFOs, Delays, ...), die mit gestoppt/gestartet werden
         self.keep_alive = keep_alive if keep_alive is not None else []
 
+        # aktuelle Werte 0-1
+        self.x = 0.5
+        self.y = 0.5
+
+        self.amp = None    # Ausgangs-Amp, wird vom EffectPool gesetzt
+        self.active = True # laeuft der Graph gerade
+        self.fused = None  # EQCascade, falls der Effekt dort mitlaeuft
+        self.bypassed = False # aus der Kette genommen (z.B. vom CpuGovernor)
+        self.touched = time.monotonic() # letzte Aenderung durch den Benutzer
+
+        # Glaettungszeiten der SigTos, nach reset bis zum naechsten set auf 0
+        self.glide = (x_sig.time, y_sig.time)
+        self.snapped = False
+
+    def _unsnap(self):
+        if self.snapped:
+            self.x_sig.time, self.y_sig.time = self.glide
+            self.snapped = False
+
     def set_x(self, value):
         # value ist zwischen 0 und 1
+        self._unsnap()
+        self.x = value
+        self.touched = time.monotonic()
         target_val = self.x_mapper(value)
         self.x_sig.value = target_val
+        # Glaettungszeit bis der Wert erreicht ist
+        return self.x_sig.time
 
     def set_y(self, value):
         # value ist zwischen 0 und 1
+        self._unsnap()
+        self.y = value
+        self.touched = time.monotonic()
         target_val = self.y_mapper(value)
         self.y_sig.value = target_val
+        return self.y_sig.time
 
     def set_input(self, new_in):
         self.in_node.setInput(new_in)
+
+    def reset(self, y_init):
+        # Ausgangszustand wie frisch aus der Factory, Werte springen ohne
+        # Glaettung (kein Gleiten von den Werten des vorigen Benutzers)
+        self.bypassed = False
+        self.touched = time.monotonic()
+        self.x = 0.5
+        self.y = float(y_init)
+        self.x_sig.time = 0
+        self.y_sig.time = 0
+        self.x_sig.value = self.x_mapper(self.x)
+        self.y_sig.value = self.y_mapper(self.y)
+        self.snapped = True
+
+    def flush(self):
+        # Delay-Leitungen sofort leeren, Reverb/Filter klingen im Pool auf Stille aus
+        for node in self._nodes():
+            if isinstance(node, Delay):
+                node.reset()
+
+    def _nodes(self):
+        nodes = [self.x_sig, self.y_sig, *self.keep_alive, self.in_node, self.out_node]
+        if self.amp is not None:
+            nodes.append(self.amp)
+        return nodes
+
+    def play(self):
+        for node in self._nodes():
+            node.play()
+        self.active = True
         
     def stop(self):
-        self.out_node.stop()
-        self.in_node.stop()
+        # gestoppte Objekte kosten keine CPU, bleiben aber erhalten (Pool)
+        for node in self._nodes():
+            node.stop()
+        self.active = False
 
 class EffectsFactory:
-    def create(fx_type, input_signal, y_init):
+    TYPES = ["lowcut", "hicut", "lowboost", "hiboost", "gate", "crush", "flanger", "reverb", "delay",
+             "beatgate", "beatdelay"]
+
+    def create(fx_type, input_signal, y_init, wet_only=False, clock=None):
+        # wet_only: ohne beigemischtes Eingangssignal (fuer Send-Busse)
+        # clock: Transport mit Beat-Raster, noetig fuer beatgate/beatdelay
+        fx = EffectsFactory._build(fx_type, input_signal, y_init, wet_only, clock)
+        if fx is not None:
+            fx.fx_type = fx_type
+            fx.y = float(y_init)
+        return fx
+
+    def _build(fx_type, input_signal, y_init, wet_only, clock=None):
         x_init = 0.5
         y_init = float(y_init)
 
         def make_sig(val): return SigTo(val, time=0.05, init=val)
 
+        # x -> Notenlaenge in Beats, springt ohne Glaettung
+        map_division = lambda x: BEAT_DIVISIONS[min(len(BEAT_DIVISIONS) - 1, int(x * len(BEAT_DIVISIONS)))]
+
+        if fx_type in ("beatgate", "beatdelay") and clock is None:
+            print(f"Effekt {fx_type} braucht einen Transport")
+            return None
+
         if fx_type == "lowcut":
             # Mapping Logik: 0.0 -> 50Hz, 1.0 -> 1500Hz
             map_freq = lambda x: 50 + (x * 1450)
@@ -120,12 +205,17 @@ class EffectsFactory:
             s_strength = make_sig(map_strength(y_init))
 
             gate = LFO(freq=s_speed, type=2, sharp=1, mul=0.5, add=0.5)
-            mod = (Sig(1) - s_strength) + (gate * s_strength)
+            one = Sig(1)
+            dry = one - s_strength
+            wet = gate * s_strength
+            mod = dry + wet
 
             sound_in = Switch(input=input_signal, outs=1)
-            sound_out = Switch(input=(sound_in * mod), outs=1)
+            gated = sound_in * mod
+            sound_out = Switch(input=gated, outs=1)
 
-            return Effect(sound_in, sound_out, s_speed, s_strength, map_speed, map_strength)
+            return Effect(sound_in, sound_out, s_speed, s_strength, map_speed, map_strength,
+                          keep_alive=[gate, one, dry, wet, mod, gated])
 
         elif fx_type == "crush":
             map_bits = lambda x: 12 - (x * 10)
@@ -150,10 +240,13 @@ class EffectsFactory:
             middelay = 0.005
 
             lfo = Sine(freq=sig_lfospeed, mul=middelay * depth, add=middelay)
-            flg = Delay(DCBlock(sound_in), delay=lfo, feedback=sig_fb)
-            cmp = Compress(sound_in + flg, thresh=-20, ratio=4)
+            dc = DCBlock(sound_in)
+            flg = Delay(dc, delay=lfo, feedback=sig_fb)
+            mix = sound_in + flg
+            cmp = Compress(mix, thresh=-20, ratio=4)
 
-            return Effect(sound_in, cmp, sig_lfospeed, sig_fb, map_lfospeed, map_fb)
+            return Effect(sound_in, cmp, sig_lfospeed, sig_fb, map_lfospeed, map_fb,
+                          keep_alive=[depth, lfo, dc, flg, mix])
 
         elif fx_type == "reverb":
             map_size = lambda x: 0.2 + (x * 0.75)
@@ -162,14 +255,17 @@ class EffectsFactory:
             sig_size = make_sig(map_size(x_init))
             sig_damp = make_sig(map_damp(y_init))
             
+            # Eingang als Switch, damit set_input auch das Dry-Signal umhaengt
+            sound_in = Switch(input=input_signal, outs=1)
+
             # Wichtig: Freeverb erlaubt Sig-Objekte für size und damp
-            node = Freeverb(input_signal, size=sig_size, damp=sig_damp, bal=1.0)
-            mixer = node + input_signal
+            node = Freeverb(sound_in, size=sig_size, damp=sig_damp, bal=1.0)
+            mixer = Sig(node) if wet_only else node + sound_in
            #mixer = Mixer(outs=1, chnls=2)
            #mixer.addInput(0, node)
            #mixer.addInput(1, input_signal)
             
-            return Effect(node, mixer, sig_size, sig_damp, map_size, map_damp)
+            return Effect(sound_in, mixer, sig_size, sig_damp, map_size, map_damp, keep_alive=[node])
 
         elif fx_type == "delay":
             map_time = lambda x: 0.01 + (x * 1.49)
@@ -178,13 +274,56 @@ class EffectsFactory:
             sig_time = make_sig(map_time(x_init))
             sig_feed = make_sig(map_feed(y_init))
             
-            node = Delay(input_signal, delay=sig_time, feedback=sig_feed)
-            mixer = node + input_signal
+            sound_in = Switch(input=input_signal, outs=1)
+
+            node = Delay(sound_in, delay=sig_time, feedback=sig_feed)
+            mixer = Sig(node) if wet_only else node + sound_in
            #mixer = Mixer(outs=1, chnls=2)
            #mixer.addInput(0, node)
            #mixer.addInput(1, input_signal)
             
-            return Effect(node, mixer, sig_time, sig_feed, map_time, map_feed)
+            return Effect(sound_in, mixer, sig_time, sig_feed, map_time, map_feed, keep_alive=[node])
+
+        elif fx_type == "beatgate":
+            # wie gate, aber phasenstarr zum Beat-Raster des Songs,
+            # folgt damit auch Speed, Seek und Pause
+            map_rate = lambda x: 1.0 / map_division(x) # Zyklen pro Beat
+            map_strength = lambda x: x
+
+            s_rate = SigTo(map_rate(x_init), time=0, init=map_rate(x_init))
+            s_strength = make_sig(map_strength(y_init))
+
+            cycles = clock.beats * s_rate
+            phase = Wrap(cycles)
+            gate = Compare(phase, comp=0.5, mode="<") # erste Haelfte jeder Note offen
+            one = Sig(1)
+            dry = one - s_strength
+            wet = gate * s_strength
+            mod = dry + wet
+
+            sound_in = Switch(input=input_signal, outs=1)
+            gated = sound_in * mod
+            sound_out = Switch(input=gated, outs=1)
+
+            return Effect(sound_in, sound_out, s_rate, s_strength, map_rate, map_strength,
+                          keep_alive=[cycles, phase, gate, one, dry, wet, mod, gated])
+
+        elif fx_type == "beatdelay":
+            # Delay-Zeit als Notenlaenge, Sekunden pro Beat kommen vom Transport
+            map_feed = lambda x: x * 0.75
+
+            sig_div = SigTo(map_division(x_init), time=0, init=map_division(x_init))
+            sig_feed = make_sig(map_feed(y_init))
+
+            sound_in = Switch(input=input_signal, outs=1)
+
+            beat_time = clock.beat_sec * sig_div
+            delay_time = Clip(beat_time, min=0.01, max=4.0)
+            node = Delay(sound_in, delay=delay_time, feedback=sig_feed, maxdelay=4.0)
+            mixer = Sig(node) if wet_only else node + sound_in
+
+            return Effect(sound_in, mixer, sig_div, sig_feed, map_division, map_feed,
+                          keep_alive=[beat_time, delay_time, node])
 
         else:
             print(f"Effekt {fx_type} unbekannt")
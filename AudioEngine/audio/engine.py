@@ -1,27 +1,107 @@
+import time
+import threading
+from collections import deque
 from pyo import *
 
 class AudioEngine:
     # Nur eine Instanz vom Server erzeugen
     _instance = None
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(AudioEngine, cls).__new__(cls)
             cls._instance.initialized = False
         return cls._instance        
 
-    def __init__(self):
+    def __init__(self, sr=44100, buffersize=256, audio="portaudio"):
         if self.initialized:
             return
 
-        self.server = Server(nchnls=2, duplex=0)
+        # audio="offline": kein Audiogeraet, rendert so schnell wie moeglich in eine Datei
+        self.sr = sr
+        self.buffersize = buffersize
+        self.offline = audio.startswith("offline")
+        self.server = Server(sr=sr, nchnls=2, buffersize=buffersize, duplex=0, audio=audio)
         #self.server.setVerbosity(1)
+
+        # Funktionen, die am Anfang des naechsten Audio-Blocks ausgefuehrt werden
+        # (deque.append/popleft sind threadsicher)
+        self.block_calls = deque()
+        # Funktionen, die bei jedem Block aufgerufen werden
+        self.block_listeners = []
+        self.blocks = 0
+        self.server.setCallback(self._on_block)
+
+        # Block-Takt fuer den manual-Modus ohne Soundkarte (headless)
+        self.clock_thread = None
+        self.clock_running = False
+        self.late_blocks = 0
         
         self.initialized = True
+
+    def boot(self):
+        if not self.server.getIsBooted():
+            self.server.boot()
     
     def start(self):
-        self.server.boot().start()
+        self.boot()
+        self.server.start()
         #self.server.gui(locals())
 
+    def start_clock(self):
+        # headless: server.process() in Echtzeit selbst anstossen
+        self.clock_running = True
+        self.clock_thread = threading.Thread(target=self._clock, name="block-clock", daemon=True)
+        self.clock_thread.start()
+
+    def _clock(self):
+        period = self.buffersize / self.sr
+        next_t = time.perf_counter()
+        while self.clock_running:
+            self.server.process()
+            next_t += period
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late_blocks += 1
+                if delay < -16 * period:
+                    # weit zurueck -> neu einsynchronisieren statt nachzuholen
+                    next_t = time.perf_counter()
+
     def stop(self):
+        if self.clock_thread is not None:
+            self.clock_running = False
+            self.clock_thread.join(timeout=1)
         self.server.stop()
-        self.server.shutdown()
\ No newline at end of file
+        self.server.shutdown()
+
+    def render(self, dur, filename):
+        # nur offline: blockiert bis dur Sekunden gerendert sind, gibt Wall-Time zurueck
+        self.boot()
+        self.server.recordOptions(dur=dur, filename=filename, fileformat=0, sampletype=1)
+        start = time.perf_counter()
+        self.server.start()
+        return time.perf_counter() - start
+
+    def block_time(self):
+        # Audio-Zeit in Sekunden seit Start (gezaehlte Blocks)
+        return self.blocks * self.buffersize / self.sr
+
+    def call_in_block(self, func):
+        # alles was hier landet wird im selben Block angewendet
+        self.block_calls.append(func)
+
+    def _on_block(self):
+        self.blocks += 1
+        while self.block_calls:
+            func = self.block_calls.popleft()
+            try:
+                func()
+            except Exception as e:
+                print(f"[Engine] Fehler im Block-Callback: {e}")
+
+        for listener in self.block_listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"[Engine] Fehler im Block-Listener: {e}")
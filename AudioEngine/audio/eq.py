@@ -0,0 +1,110 @@
+import math
+from pyo import *
+
+# Lineare Filter-Effekte, die zu einer Biquad-Kaskade zusammengefasst werden koennen
+LINEAR_TYPES = ("lowcut", "hicut", "lowboost", "hiboost")
+
+# ButHP/ButLP entsprechen einem Biquad mit Butterworth-Q, EQ rechnet mit q=1
+BUTTER_Q = 1 / math.sqrt(2)
+SHELF_Q = 1.0
+
+# Glaettung der Koeffizienten, wie die SigTos der einzelnen Effekte. Lineares
+# Ueberblenden bleibt stabil (das Stabilitaetsdreieck von a1/a2 ist konvex).
+GLIDE = 0.05
+
+def biquad_coeffs(fx_type, freq, boost, sr):
+    # RBJ-Cookbook, normiert auf a0 = 1
+    freq = max(10.0, min(freq, sr * 0.49))
+    w0 = 2 * math.pi * freq / sr
+    cs = math.cos(w0)
+    sn = math.sin(w0)
+
+    if fx_type in ("lowcut", "hicut"):
+        alpha = sn / (2 * BUTTER_Q)
+        if fx_type == "lowcut":
+            b0, b1, b2 = (1 + cs) / 2, -(1 + cs), (1 + cs) / 2
+        else:
+            b0, b1, b2 = (1 - cs) / 2, 1 - cs, (1 - cs) / 2
+        a0, a1, a2 = 1 + alpha, -2 * cs, 1 - alpha
+    else:
+        # Shelf mit q wie pyo EQ, sonst klingt der fusionierte Shelf anders
+        A = 10 ** (boost / 40)
+        sq = 2 * math.sqrt(A) * (sn / (2 * SHELF_Q))
+        if fx_type == "lowboost":
+            b0 = A * ((A + 1) - (A - 1) * cs + sq)
+            b1 = 2 * A * ((A - 1) - (A + 1) * cs)
+            b2 = A * ((A + 1) - (A - 1) * cs - sq)
+            a0 = (A + 1) + (A - 1) * cs + sq
+            a1 = -2 * ((A - 1) + (A + 1) * cs)
+            a2 = (A + 1) + (A - 1) * cs - sq
+        else:
+            b0 = A * ((A + 1) + (A - 1) * cs + sq)
+            b1 = -2 * A * ((A - 1) + (A + 1) * cs)
+            b2 = A * ((A + 1) + (A - 1) * cs - sq)
+            a0 = (A + 1) - (A - 1) * cs + sq
+            a1 = 2 * ((A - 1) - (A + 1) * cs)
+            a2 = (A + 1) - (A - 1) * cs - sq
+
+    return b0 / a0, b1 / a0, b2 / a0, 1.0, a1 / a0, a2 / a0
+
+def stage_params(fx):
+    # gleiche x/y Zuordnung wie in EffectsFactory
+    if fx.fx_type in ("lowcut", "hicut"):
+        return fx.x_mapper(fx.x), 0.0
+    return fx.y_mapper(fx.y), fx.x_mapper(fx.x)
+
+class EQCascade:
+    # Eine Kette aus Biquada-Stufen fuer mehrere aufeinanderfolgende Filter-Effekte.
+    # Statt eines Filters + zwei SigTo pro Effekt gibt es nur noch einen Biquad
+    # pro Stufe, die Koeffizienten werden bei jeder x/y Aenderung neu berechnet
+    # und gleiten ueber SigTos dorthin. Stufen werden wiederverwendet und nur
+    # bei Bedarf neu gebaut.
+    def __init__(self):
+        self.stages = []
+        self.coeffs = [] # pro Stufe 6 SigTo (b0, b1, b2, a0, a1, a2)
+        self.effects = []
+        self.out_node = None
+
+    def configure(self, input_signal, effects):
+        self.effects = list(effects)
+        while len(self.stages) < len(self.effects):
+            sigs = [SigTo(v, time=GLIDE, init=v) for v in (1, 0, 0, 1, 0, 0)]
+            self.coeffs.append(sigs)
+            # stereo bauen, die Stream-Anzahl steht ab hier fest
+            self.stages.append(Biquada(Sig([0, 0]), *sigs))
+
+        src = input_signal
+        for i, (stage, sigs) in enumerate(zip(self.stages, self.coeffs)):
+            if i < len(self.effects):
+                stage.setInput(src)
+                if not stage.isPlaying():
+                    for sig in sigs:
+                        sig.play()
+                    stage.play()
+                src = stage
+            else:
+                stage.stop()
+                for sig in sigs:
+                    sig.stop()
+        self.out_node = src
+        # neu zusammengesetzt -> Koeffizienten springen, kein Gleiten vom
+        # Effekt, der vorher auf der Stufe lag
+        self.update(glide=0)
+        return self.out_node
+
+    def update(self, glide=GLIDE):
+        if not self.stages:
+            return
+        sr = self.stages[0].getSamplingRate()
+        for sigs, fx in zip(self.coeffs, self.effects):
+            freq, boost = stage_params(fx)
+            for sig, value in zip(sigs, biquad_coeffs(fx.fx_type, freq, boost, sr)):
+                sig.time = glide
+                sig.value = value
+
+    def stop(self):
+        for stage, sigs in zip(self.stages, self.coeffs):
+            stage.stop()
+            for sig in sigs:
+                sig.stop()
+        self.effects = []
@@ -0,0 +1,110 @@
+import os
+import hashlib
+import threading
+import multiprocessing
+
+# Channel-Freeze: die aktuelle Effektkette eines Stems wird in einem eigenen
+# Prozess offline (pyo offline-Server) ueber den ganzen Song gerendert.
+# Das Ergebnis ist zeitgleich zum Original und kann vom Transport-Index
+# direkt abgespielt werden, statt die Kette jeden Block neu zu rechnen.
+
+def render_frozen(stem_path, chain, out_wav, options, tempo=None):
+    # laeuft im Kind-Prozess, tempo: (bpm, erster beat) fuer beatgate/beatdelay
+    import numpy as np
+    from .beats import BeatGrid
+    from .engine import AudioEngine
+    from .cache import StemCache
+    from .channel import AudioChannel
+    from .ramp import SpeedRamp
+    from .transport import Transport
+
+    engine = AudioEngine(sr=options["sr"], buffersize=options["buffersize"], audio="offline")
+    engine.boot()
+
+    cache = StemCache(options["cache_path"], options["cache_mem_mb"], options["sr"])
+    ramp = SpeedRamp(1.0)
+    transport = Transport(ramp.sig)
+    channel = AudioChannel(0, cache, transport)
+
+    table, duration = cache.load_table(stem_path)
+    if tempo is not None:
+        transport.set_grid(BeatGrid(tempo[0], np.array([tempo[1]]), np.array([])))
+    transport.set_duration(duration)
+    channel.swap_table(table, duration)
+    transport.seek(0.0)
+
+    for i, (fx_type, x, y) in enumerate(chain):
+        channel.effect_add(fx_type, y)
+        channel.effect_set(i, 'x', x)
+
+    tmp = out_wav + ".tmp.wav"
+    engine.render(duration, tmp)
+    os.replace(tmp, out_wav)
+
+class Freezer:
+    def __init__(self, engine, cache, options):
+        self.engine = engine
+        self.cache = cache
+        self.options = options
+        self.out_dir = os.path.join(cache.cache_dir, "frozen")
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.ctx = multiprocessing.get_context("spawn")
+        # Kanaele, deren Kette gerade gerendert wird (bis apply gelaufen ist)
+        self.pending = set()
+
+    def _out_file(self, stem_path, chain, tempo=None):
+        raw = f"{self.cache.key(stem_path)}|{chain!r}|{tempo!r}"
+        return os.path.join(self.out_dir, hashlib.sha1(raw.encode()).hexdigest() + ".wav")
+
+    def freeze(self, channel):
+        # kehrt sofort zurueck, der Wechsel passiert spaeter an einer Block-Grenze.
+        # False -> kein Freeze gestartet
+        if channel in self.pending:
+            print(f"[Freeze] {channel.track_type}: Freeze laeuft schon")
+            return False
+        if channel.frozen or not channel.effects or channel.stem_file is None:
+            print(f"[Freeze] {channel.track_type}: nichts zu freezen")
+            return False
+        if channel.stream is not None:
+            # gerenderte Kette waere wieder ein kompletter Stem im RAM
+            print(f"[Freeze] {channel.track_type}: Stem wird gestreamt, kein Freeze")
+            return False
+
+        chain = channel.chain_spec()
+        version = channel.chain_version
+        stem_path = channel.stem_file
+        # tempo-synchrone Effekte brauchen das Beat-Raster auch beim Rendern
+        grid = channel.transport.grid
+        synced = any(fx_type in ("beatgate", "beatdelay") for fx_type, _, _ in chain)
+        tempo = (grid.bpm, grid.first_beat) if synced and grid is not None else None
+
+        def run():
+            out_wav = self._out_file(stem_path, chain, tempo)
+            try:
+                if not os.path.exists(out_wav):
+                    proc = self.ctx.Process(target=render_frozen, args=(stem_path, chain, out_wav, self.options, tempo))
+                    proc.start()
+                    proc.join()
+                    if proc.exitcode != 0 or not os.path.exists(out_wav):
+                        print(f"[Freeze] {channel.track_type}: Rendern fehlgeschlagen")
+                        self.pending.discard(channel)
+                        return
+                table, _ = self.cache.load_table(out_wav)
+            except Exception as e:
+                print(f"[Freeze] {channel.track_type}: {e}")
+                self.pending.discard(channel)
+                return
+
+            def apply():
+                # ohne Lock, laeuft im Audio-Thread
+                self.pending.discard(channel)
+                # Kette oder Song hat sich inzwischen geaendert -> verwerfen
+                if channel.chain_version != version or channel.stem_file != stem_path:
+                    print(f"[Freeze] {channel.track_type}: Kette geaendert, verworfen")
+                    return
+                channel.freeze(table)
+            self.engine.call_in_block(apply)
+
+        self.pending.add(channel)
+        threading.Thread(target=run, name=f"freeze{channel.id}", daemon=True).start()
+        return True
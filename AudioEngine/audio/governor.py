@@ -0,0 +1,163 @@
+import time
+import threading
+
+# Effekte, die sich zum Umgehen lohnen (Delay-Leitungen, Reverb, Kompressor)
+HEAVY_TYPES = ("reverb", "flanger", "delay", "beatdelay")
+
+class CpuGovernor:
+    # Beobachtet den BlockMonitor und greift bei Ueberlast ein, eine Stufe pro
+    # Periode in der Reihenfolge der Policy:
+    #   freeze - Kette des am laengsten nicht angefassten Kanals einfrieren
+    #   bypass - schweren Effekt, der am laengsten nicht angefasst wurde, umgehen
+    # Faellt die Last lange genug unter low, werden die Eingriffe rueckwaerts
+    # wieder aufgehoben. Alle Aenderungen laufen als Befehle ueber die CommandQueue,
+    # ein Eingriff zaehlt erst, wenn er tatsaechlich gegriffen hat. Solange ein
+    # Freeze noch rendert, wird nicht weiter eingegriffen. Ist keine Massnahme
+    # mehr moeglich, steht im State eine groessere BUFFERSIZE als Vorschlag
+    # (pyo kann sie nicht im Betrieb aendern, config.py + Neustart).
+    def __init__(self, monitor, decks, queue, policy, high=0.8, low=0.5, period=1.0, recover=5.0):
+        self.monitor = monitor
+        self.sessions = [(deck.id, deck.session) for deck in decks if getattr(deck, "session", None) is not None]
+        self.queue = queue
+        self.policy = list(policy)
+        self.high = high
+        self.low = low
+        self.period = period
+        self.recover = recover
+
+        self.actions = [] # (art, deck_id, channel, effect), juengste zuletzt
+        self.pending = [] # wie actions plus Zeitpunkt, noch nicht angekommen
+        self.suggested_buffer = None
+        self.exhausted = False
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="governor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        last_bad = 0
+        calm_since = None
+        while self.running:
+            time.sleep(self.period)
+            self._settle()
+            load, _ = self.monitor.recent(self.period)
+            bad = self.monitor.overruns + self.monitor.xruns
+            new_bad = bad - last_bad
+            last_bad = bad
+
+            now = time.monotonic()
+            if load > self.high or new_bad > 0:
+                calm_since = None
+                self._degrade(load, new_bad)
+            elif load < self.low and self.actions:
+                if calm_since is None:
+                    calm_since = now
+                elif now - calm_since >= self.recover:
+                    self._restore()
+                    calm_since = now # eine Stufe pro recover-Zeit
+            else:
+                calm_since = None
+
+    def _settle(self):
+        # angekommene Eingriffe nach actions, verworfene/fehlgeschlagene vergessen
+        now = time.monotonic()
+        still = []
+        for kind, deck_id, ch, fx, since in self.pending:
+            if (ch.frozen if kind == "freeze" else fx.bypassed):
+                self.actions.append((kind, deck_id, ch, fx))
+            elif kind == "freeze" and ch in self._freezer(deck_id).pending:
+                still.append((kind, deck_id, ch, fx, since))
+            elif now - since < self.period:
+                # Befehl steckt evtl. noch in der CommandQueue
+                still.append((kind, deck_id, ch, fx, since))
+            else:
+                print(f"[Governor] {kind} auf {ch.track_type} hat nicht gegriffen")
+        self.pending = still
+
+    def _freezer(self, deck_id):
+        for sid, session in self.sessions:
+            if sid == deck_id:
+                return session.freezer
+        return None
+
+    def _freezing(self, deck_id, ch):
+        # Freeze laeuft (vom Governor oder vom Benutzer angestossen)
+        freezer = self._freezer(deck_id)
+        return (freezer is not None and ch in freezer.pending) \
+            or any(p[0] == "freeze" and p[2] is ch for p in self.pending)
+
+    def _degrade(self, load, new_bad):
+        if any(p[0] == "freeze" for p in self.pending):
+            # erst abwarten, ob der Freeze die Last senkt
+            return
+        for step in self.policy:
+            if getattr(self, f"_step_{step}")():
+                self.exhausted = False
+                print(f"[Governor] Last {load * 100:.0f}%, {new_bad} Ueberlaeufe -> {step}")
+                return
+        if not self.exhausted:
+            self.exhausted = True
+            self.suggested_buffer = self.monitor.buffersize * 2
+            print(f"[Governor] Last {load * 100:.0f}%, keine Massnahme mehr moeglich, "
+                  f"Vorschlag: BUFFERSIZE={self.suggested_buffer} in config.py")
+
+    def _step_freeze(self):
+        candidates = [(ch.touched, deck_id, ch) for deck_id, session in self.sessions
+                      if session.freezer is not None
+                      for ch in session.channels
+                      if ch.effects and not ch.frozen and ch.stream is None
+                      and not self._freezing(deck_id, ch)
+                      and not any(a[2] is ch for a in self.actions if a[0] == "freeze")]
+        if not candidates:
+            return False
+        _, deck_id, ch = min(candidates, key=lambda c: c[0])
+        self.queue.put_cmd(f"@{deck_id} freeze {ch.id}")
+        self.pending.append(("freeze", deck_id, ch, None, time.monotonic()))
+        return True
+
+    def _step_bypass(self):
+        candidates = [(fx["wrapper"].touched, deck_id, ch, fx["wrapper"]) for deck_id, session in self.sessions
+                      for ch in session.channels if not ch.frozen and not self._freezing(deck_id, ch)
+                      for fx in ch.effects
+                      if fx["wrapper"].fx_type in HEAVY_TYPES and not fx["wrapper"].bypassed
+                      and not any(p[3] is fx["wrapper"] for p in self.pending)]
+        if not candidates:
+            return False
+        _, deck_id, ch, fx = min(candidates, key=lambda c: c[0])
+        index = self._index(ch, fx)
+        if index is None:
+            return False
+        self.queue.put_fx(f"@{deck_id} bypass {ch.id} {index} 1")
+        self.pending.append(("bypass", deck_id, ch, fx, time.monotonic()))
+        return True
+
+    @staticmethod
+    def _index(ch, fx):
+        for i, entry in enumerate(ch.effects):
+            if entry["wrapper"] is fx:
+                return i
+        return None
+
+    def _restore(self):
+        kind, deck_id, ch, fx = self.actions.pop()
+        if kind == "freeze":
+            if ch.frozen:
+                self.queue.put_cmd(f"@{deck_id} unfreeze {ch.id}")
+        elif kind == "bypass":
+            index = self._index(ch, fx)
+            # inzwischen entfernt oder vom Benutzer schon wieder aktiviert
+            if index is not None and fx.bypassed:
+                self.queue.put_fx(f"@{deck_id} bypass {ch.id} {index} 0")
+        print(f"[Governor] Last wieder niedrig -> {kind} aufgehoben")
+
+    def get_state(self):
+        return dict(self.monitor.summary(),
+                    actions=len(self.actions),
+                    pending=len(self.pending),
+                    suggested_buffer=self.suggested_buffer)
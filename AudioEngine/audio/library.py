@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import threading
+from pyo import sndinfo
+from .manifest import read_manifest, stem_file
+
+class SongLibrary:
+    # Index ueber musik_files: Songs "<artist>-<title>" mit ihren Stems laut Manifest,
+    # Dauer, Samplerate, Kanaele und Hash pro Datei. Beim Rescan werden nur
+    # Dateien neu gelesen, deren mtime/Groesse sich geaendert hat.
+    def __init__(self, base_path, index_file):
+        self.base_path = base_path
+        self.index_file = index_file
+        self.songs = {} # "<artist>-<title>" -> eintrag
+        self.lock = threading.Lock()
+        self.scanning = False
+        self.listeners = [] # bekommen nach jedem Scan die Pfade aller gueltigen Songs
+        self._read_index()
+
+    def _read_index(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file) as f:
+                self.songs = json.load(f).get("songs", {})
+        except (OSError, ValueError) as e:
+            print(f"[Library] Index unlesbar, wird neu aufgebaut: {e}")
+            self.songs = {}
+
+    def _write_index(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"songs": self.songs}, f)
+        os.replace(tmp, self.index_file)
+
+    @staticmethod
+    def _hash(path):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _stem_info(self, path, old):
+        st = os.stat(path)
+        if old is not None and old["mtime"] == st.st_mtime_ns and old["size"] == st.st_size:
+            return old, False
+
+        info = sndinfo(path)
+        if info is None:
+            raise ValueError("nicht lesbar")
+        return {
+            "mtime": st.st_mtime_ns,
+            "size": st.st_size,
+            "duration": round(float(info[1]), 3),
+            "sr": int(info[2]),
+            "chnls": int(info[3]),
+            "sha1": self._hash(path),
+        }, True
+
+    def scan(self):
+        # kann lange dauern -> im Hintergrund-Thread aufrufen
+        self.scanning = True
+        changed = 0
+        songs = {}
+        try:
+            names = sorted(os.listdir(self.base_path))
+        except OSError as e:
+            print(f"[Library] {self.base_path} nicht lesbar: {e}")
+            names = []
+
+        for name in names:
+            song_dir = os.path.join(self.base_path, name)
+            if name.startswith(".") or "-" not in name or not os.path.isdir(song_dir):
+                continue
+
+            artist, title = name.split("-", 1)
+            with self.lock:
+                old_stems = self.songs.get(name, {}).get("stems", {})
+
+            stems = {}
+            missing = []
+            try:
+                layout = read_manifest(song_dir)
+            except ValueError as e:
+                print(f"[Library] {name}: {e}")
+                layout = []
+                missing.append("manifest")
+            for stem in layout:
+                path = stem_file(song_dir, stem)
+                if not os.path.exists(path):
+                    missing.append(stem["name"])
+                    continue
+                try:
+                    stems[stem["name"]], updated = self._stem_info(path, old_stems.get(stem["name"]))
+                    changed += updated
+                except (OSError, ValueError) as e:
+                    print(f"[Library] {name}/{stem['file']}: {e}")
+                    missing.append(stem["name"])
+
+            songs[name] = {
+                "artist": artist,
+                "title": title,
+                "valid": not missing,
+                "missing": missing,
+                "duration": max((s["duration"] for s in stems.values()), default=0),
+                "layout": [stem["name"] for stem in layout], # Reihenfolge = Kanal
+                "stems": stems,
+            }
+
+        with self.lock:
+            removed = len(set(self.songs) - set(songs))
+            self.songs = songs
+            if changed or removed:
+                self._write_index()
+        self.scanning = False
+        print(f"[Library] {len(songs)} Songs, {changed} Dateien neu gelesen, {removed} entfernt")
+
+        valid = [os.path.join(self.base_path, name) for name, song in songs.items() if song["valid"]]
+        for listener in self.listeners:
+            listener(valid)
+
+    def scan_async(self):
+        threading.Thread(target=self.scan, name="library", daemon=True).start()
+
+    def check(self, artist, title):
+        # None wenn unbekannt, sonst Liste fehlender Stems
+        with self.lock:
+            song = self.songs.get(f"{artist}-{title}")
+        return None if song is None else song["missing"]
+
+    def list(self, offset=0, limit=100):
+        with self.lock:
+            names = sorted(self.songs)
+            page = names[offset:offset + limit]
+            songs = [{"artist": self.songs[n]["artist"],
+                      "title": self.songs[n]["title"],
+                      "duration": self.songs[n]["duration"],
+                      "valid": self.songs[n]["valid"]} for n in page]
+        return {"type": "list", "offset": offset, "total": len(names), "scanning": self.scanning, "songs": songs}
+
+    def handle_query(self, cmd):
+        # None -> kein Query, normal als Befehl behandeln
+        cmd_split = cmd.split()
+        if not cmd_split:
+            return None
+
+        if cmd_split[0] == "list":
+            # list [offset] [limit]
+            try:
+                offset = int(cmd_split[1]) if len(cmd_split) > 1 else 0
+                limit = int(cmd_split[2]) if len(cmd_split) > 2 else 100
+            except ValueError:
+                return {"type": "list", "error": "offset und limit muessen Zahlen sein"}
+            if offset < 0 or limit < 0:
+                return {"type": "list", "error": "offset und limit duerfen nicht negativ sein"}
+            return self.list(offset, limit)
+
+        elif cmd_split[0] == "info":
+            if len(cmd_split) > 2:
+                return self.info(cmd_split[1], cmd_split[2])
+
+        return None
+
+    def info(self, artist, title):
+        with self.lock:
+            song = self.songs.get(f"{artist}-{title}")
+            if song is None:
+                return {"type": "info", "error": f"{artist}-{title} unbekannt"}
+            return {"type": "info", **song}
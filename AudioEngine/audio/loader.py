@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pyo import sndinfo
+from .manifest import read_manifest, stem_file
+from .stream import StreamTable
+
+class SongLoader:
+    # Dekodiert Songs im Hintergrund in ein zweites Table-Set,
+    # der eigentliche Wechsel passiert dann an einer Block-Grenze
+    def __init__(self, engine, channels, transport, sync=False, stream_after=None, stream_window=30, beats=None,
+                 release_after=None):
+        self.engine = engine
+        self.beats = beats # BeatService, hier wird nur nachgeschlagen
+        self.channels = channels
+        self.transport = transport
+        # sync: direkt im aufrufenden Thread dekodieren (Offline-Render, deterministisch)
+        self.sync = sync
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loader")
+        self.lock = threading.Lock()
+
+        self.preloaded = {} # song pfad -> Future mit [(table, dauer), ...]
+        self.current = None # aktuell geladener Song
+        self.load_gen = 0   # nur der zuletzt angeforderte load darf swappen
+
+        # Stems laenger als stream_after Sekunden werden gestreamt, None -> nie
+        self.stream_after = stream_after
+        self.stream_window = stream_window
+
+        # Lazy: nur hoerbare Stems dekodieren, stumme nach release_after
+        # Sekunden wieder freigeben. None -> immer alle Stems laden
+        self.release_after = release_after
+        self.stem_gen = 0 # wechselt mit jedem Song, alte Nachlade-Auftraege verfallen
+        self.loading = set() # Stems, die gerade nachgeladen werden
+        self.sweeping = release_after is not None and not sync
+        if self.sweeping:
+            threading.Thread(target=self._sweep, name="stem-release", daemon=True).start()
+
+    def _decode(self, song_path):
+        # pro Kanal (stem, table oder None, dauer), stem None -> Kanal unbenutzt
+        start = time.perf_counter()
+        stems = read_manifest(song_path)
+        if len(stems) > len(self.channels):
+            print(f"[Loader] {os.path.basename(song_path)}: nur {len(self.channels)} von {len(stems)} Stems")
+        entries = []
+        for i, ch in enumerate(self.channels):
+            if i >= len(stems):
+                entries.append((None, None, 0))
+                continue
+            path = stem_file(song_path, stems[i])
+            if self.release_after is not None and not ch.audible():
+                # stumm -> nur die Dauer aus dem Header, dekodiert wird beim Aufdrehen
+                entries.append((stems[i], None, float(sndinfo(path)[1])))
+            else:
+                entries.append((stems[i], *self._load_stem(ch.cache, path)))
+        loaded = sum(table is not None for _, table, _ in entries)
+        print(f"[Loader] {os.path.basename(song_path)} bereit nach {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({loaded} von {min(len(stems), len(self.channels))} Stems geladen)")
+        return entries
+
+    def _load_stem(self, cache, stem_path):
+        if self.stream_after is not None and sndinfo(stem_path)[1] > self.stream_after:
+            pcm, file_sr = cache.open_pcm(stem_path)
+            stream = StreamTable(pcm, file_sr, self.stream_window)
+            return stream, stream.duration
+        return cache.load_table(stem_path)
+
+    def _submit(self, song_path):
+        if not self.sync:
+            return self.executor.submit(self._decode, song_path)
+        future = Future()
+        try:
+            future.set_result(self._decode(song_path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def preload(self, song_path):
+        # liefert das Future des Decodes (z.B. fuer Folge-Auftraege)
+        with self.lock:
+            if song_path not in self.preloaded:
+                # nur ein Song wird vorgehalten
+                self.preloaded = {song_path: self._submit(song_path)}
+            return self.preloaded[song_path]
+
+    def load(self, song_path, position=0.0, play=True):
+        # position/play: z.B. beim Wiederherstellen nach einem Absturz
+        with self.lock:
+            future = self.preloaded.pop(song_path, None)
+            if future is None:
+                future = self._submit(song_path)
+            self.load_gen += 1
+            gen = self.load_gen
+
+        future.add_done_callback(lambda f: self._swap(gen, song_path, f, position, play))
+        return future
+
+    def _swap(self, gen, song_path, future, position=0.0, play=True):
+        if future.exception() is not None:
+            print(f"[Loader] Laden von {song_path} fehlgeschlagen: {future.exception()}")
+            return
+
+        with self.lock:
+            if gen != self.load_gen:
+                # inzwischen wurde ein anderer Song angefordert
+                return
+
+        tables = future.result()
+        self.engine.call_in_block(lambda: self._apply(tables, song_path, position, play))
+
+    def _apply(self, entries, song_path=None, position=0.0, play=True):
+        self.current = song_path
+        self.stem_gen += 1
+        # fertiges Beat-Raster oder DEFAULT_BPM, bis die Analyse nachkommt
+        self.transport.set_grid(self.beats.get(song_path) if self.beats is not None and song_path else None)
+        self.transport.set_duration(max(duration for _, _, duration in entries))
+        for ch, (stem, table, duration) in zip(self.channels, entries):
+            ch.assign(stem["name"] if stem else None)
+            ch.swap_table(table, duration, stem_file(song_path, stem) if stem and song_path else None)
+            ch.prefetch(position)
+            # beim Preload noch stumm, inzwischen aufgedreht
+            self.ensure_loaded(ch)
+        self.transport.seek(position) # normalerweise an den Anfang
+        if play:
+            self.transport.play() # geladener Song startet direkt, auch nach stop
+        else:
+            self.transport.pause()
+
+    def ensure_loaded(self, ch):
+        # nach unmute/Lautstaerke > 0: fehlenden Stem nachladen, Wechsel an
+        # einer Block-Grenze, die Position kommt wie immer vom Transport
+        if self.release_after is None or ch.loaded or ch.stem_file is None or not ch.audible():
+            return
+        gen = self.stem_gen
+        path = ch.stem_file
+        # ohne Lock, wird auch aus _apply im Audio-Thread aufgerufen
+        if (gen, path) in self.loading:
+            return
+        self.loading.add((gen, path))
+
+        def run():
+            try:
+                table, duration = self._load_stem(ch.cache, path)
+            except Exception as e:
+                print(f"[Loader] {ch.track_type}: Nachladen fehlgeschlagen: {e}")
+                self.loading.discard((gen, path))
+                return
+
+            def apply():
+                self.loading.discard((gen, path))
+                if gen != self.stem_gen or ch.stem_file != path or ch.loaded:
+                    return # inzwischen anderer Song
+                ch.swap_table(table, duration, path)
+                ch.prefetch(self.transport.position())
+                print(f"[Loader] {ch.track_type}: nachgeladen")
+            self.engine.call_in_block(apply)
+
+        if self.sync:
+            run()
+        else:
+            self.executor.submit(run)
+
+    def _sweep(self):
+        # stumme Stems nach release_after Sekunden aus dem RAM nehmen
+        while self.sweeping:
+            time.sleep(1.0)
+            now = time.monotonic()
+            for ch in self.channels:
+                if not ch.loaded or ch.silent_since is None or now - ch.silent_since < self.release_after:
+                    continue
+                # Referenz auf die alte Table/Stream halten: swap_table im Block
+                # laesst sie nur los, freigegeben wird hier im Sweep-Thread
+                held = [ch.table, ch.stream]
+                path = ch.stem_file
+                done = threading.Event()
+                released = []
+
+                def release(ch=ch, done=done, released=released):
+                    if ch.loaded and not ch.audible():
+                        ch.swap_table(None, ch.duration, ch.stem_file)
+                        released.append(ch)
+                    done.set()
+                self.engine.call_in_block(release)
+                done.wait(timeout=1.0)
+                if released:
+                    print(f"[Loader] {ch.track_type}: stumm, Table freigegeben")
+                held.clear()
+                if not ch.loaded and ch.cache is not None and path is not None:
+                    ch.cache.forget(path)
+
+    def load_now(self, song_path):
+        # blockierend laden, solange der Server noch nicht laeuft
+        self._apply(self._decode(song_path), song_path)
@@ -0,0 +1,54 @@
+import os
+import json
+
+# Stem-Layout pro Song: stems.json im Song-Ordner, Reihenfolge = Kanal-Nummer
+#   {"stems": [{"name": "Drums", "file": "drums.wav", "role": "drums"},
+#              {"name": "Vox", "file": "vox.flac"}]}
+# role ist optional (bisher nur "drums" fuer die Beat-Analyse).
+# Ohne Manifest gelten die vier Standard-Stems als <name>.mp3.
+MANIFEST = "stems.json"
+DEFAULT_STEMS = ["Bass", "Drums", "Instruments", "Vocals"]
+
+def default_manifest():
+    return [{"name": name, "file": f"{name}.mp3", "role": name.lower()} for name in DEFAULT_STEMS]
+
+def read_manifest(song_path):
+    # Liste von {"name", "file", "role"}, ValueError bei kaputtem Manifest
+    path = os.path.join(song_path, MANIFEST)
+    if not os.path.exists(path):
+        return default_manifest()
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{MANIFEST} unlesbar: {e}")
+
+    entries = data.get("stems") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{MANIFEST}: Liste 'stems' fehlt")
+
+    stems = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError(f"{MANIFEST}: Eintrag {entry!r} ist kein Objekt")
+        name = entry.get("name")
+        file = entry.get("file")
+        if not isinstance(name, str) or not name or any(c.isspace() for c in name):
+            raise ValueError(f"{MANIFEST}: Name {name!r} ungueltig")
+        # Dateien nur direkt im Song-Ordner
+        if not isinstance(file, str) or os.path.basename(file) != file or file.startswith("."):
+            raise ValueError(f"{MANIFEST}: Datei {file!r} ungueltig")
+        if any(s["name"] == name for s in stems):
+            raise ValueError(f"{MANIFEST}: Stem {name} doppelt")
+        stems.append({"name": name, "file": file, "role": entry.get("role")})
+    return stems
+
+def stem_file(song_path, stem):
+    return os.path.join(song_path, stem["file"])
+
+def drum_stem(stems):
+    # Stem fuer die Beat-Analyse: role "drums", sonst None
+    for stem in stems:
+        if stem.get("role") == "drums":
+            return stem
+    return None
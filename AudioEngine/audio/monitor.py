@@ -0,0 +1,51 @@
+import time
+from collections import deque
+
+class BlockMonitor:
+    # Block-Listener: CPU-Zeit des Audio-Threads pro Block gegen die Deadline.
+    # thread_time() zwischen zwei Callbacks = Rechenzeit fuer einen Block
+    # (der Callback laeuft im Audio-Thread von pyo), Warten zaehlt nicht mit.
+    def __init__(self, engine, window=2048):
+        self.buffersize = engine.buffersize
+        self.period = engine.buffersize / engine.sr
+        self.loads = deque(maxlen=window) # Anteil am Block-Budget
+        self.blocks = 0
+        self.overruns = 0 # Rechenzeit > Deadline
+        self.xruns = 0    # Callback kam mehr als 1.5 Perioden zu spaet -> Aussetzer
+        self.load_avg = 0.0 # gleitender Mittelwert
+        self.last_wall = None
+        self.last_cpu = None
+
+    def __call__(self):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if self.last_wall is not None:
+            load = (cpu - self.last_cpu) / self.period
+            self.loads.append(load)
+            self.load_avg += (load - self.load_avg) * 0.05
+            self.blocks += 1
+            if load > 1.0:
+                self.overruns += 1
+            if wall - self.last_wall > 1.5 * self.period:
+                self.xruns += 1
+        self.last_wall = wall
+        self.last_cpu = cpu
+
+    def recent(self, seconds):
+        # mittlere und maximale Last der letzten Sekunden
+        n = max(1, int(seconds / self.period))
+        vals = list(self.loads)[-n:]
+        if not vals:
+            return 0.0, 0.0
+        return sum(vals) / len(vals), max(vals)
+
+    def summary(self):
+        avg, peak = self.recent(1.0)
+        return {
+            "load": round(avg, 3),
+            "peak": round(peak, 3),
+            "blocks": self.blocks,
+            "overruns": self.overruns,
+            "xruns": self.xruns,
+            "deadline_ms": round(self.period * 1000, 3),
+        }
@@ -0,0 +1,124 @@
+import time
+import threading
+from pyo import *
+from .effects import EffectsFactory
+
+# Nachklang in Sekunden: freigegebene Effekte laufen so lange auf Stille weiter,
+# bevor sie gestoppt werden (Reverb-Fahne, Filter-Zustand). Delay-Leitungen
+# werden beim Freigeben direkt per reset geleert.
+TAILS = {"reverb": 3.0, "flanger": 0.5}
+DEFAULT_TAIL = 0.2
+
+# ein gemeinsamer Thread stoppt ausgeklungene Effekte aller Pools. acquire/
+# release laufen auch im Audio-Thread (Bundles) -> dort kein Lock, kein Thread
+_pools = []
+_collector = None
+
+def _collect_all():
+    while True:
+        time.sleep(0.25)
+        for pool in list(_pools):
+            pool.collect()
+
+class EffectPool:
+    # Vorab erzeugte Effekt-Graphen pro Typ. add holt einen freien Effekt,
+    # rm gibt ihn geleert und zurueckgesetzt zurueck statt ihn wegzuwerfen.
+    def __init__(self, sizes, clock=None):
+        self.sizes = dict(sizes)
+        self.clock = clock # Transport fuer tempo-synchrone Effekte
+        self.silence = Sig([0, 0]) # Eingang fuer freie Effekte, stereo wie die Stems
+        self.free = {}
+        self.in_use = {}
+        self.overflow = {} # wie oft der Pool leer war und nachgebaut werden musste
+        self.draining = [] # (Ende des Nachklangs, fx), laufen noch auf Stille
+
+        for fx_type, size in self.sizes.items():
+            self.free[fx_type] = []
+            self.in_use[fx_type] = 0
+            self.overflow[fx_type] = 0
+            for _ in range(size):
+                fx = self._create(fx_type)
+                if fx is not None:
+                    fx.stop()
+                    self.free[fx_type].append(fx)
+
+        global _collector
+        _pools.append(self)
+        if _collector is None:
+            _collector = threading.Thread(target=_collect_all, name="pool-drain", daemon=True)
+            _collector.start()
+
+    def _create(self, fx_type):
+        fx = EffectsFactory.create(fx_type, self.silence, 0.5, clock=self.clock)
+        if fx is None:
+            return None
+        # Amp pro Effekt gehoert fest zum Graph
+        fx.amp = SigTo(1, time=0.5, init=1)
+        fx.out_node.setMul(fx.amp)
+        return fx
+
+    def acquire(self, fx_type, input_signal, y):
+        if fx_type not in EffectsFactory.TYPES:
+            print(f"Effekt {fx_type} unbekannt")
+            return None
+
+        free = self.free.setdefault(fx_type, [])
+        self.in_use.setdefault(fx_type, 0)
+        self.overflow.setdefault(fx_type, 0)
+        try:
+            fx = free.pop()
+        except IndexError:
+            fx = None
+        if fx is None:
+            # noch im Nachklang -> lieber den aeltesten nehmen als nachbauen
+            for item in list(self.draining):
+                if item[1].fx_type == fx_type and self._take(item):
+                    fx = item[1]
+                    break
+
+        if fx is None:
+            # Pool leer -> neu bauen, kommt beim rm ebenfalls in den Pool
+            fx = self._create(fx_type)
+            if fx is None:
+                return None
+            self.overflow[fx_type] += 1
+
+        fx.reset(y)
+        fx.set_input(input_signal)
+        fx.play()
+        self.in_use[fx_type] += 1
+        return fx
+
+    def release(self, fx):
+        # Eingang auf Stille, Delays leeren, Werte ohne Gleiten auf den
+        # Ausgangszustand -> der naechste Benutzer hoert nichts vom vorigen
+        fx.set_input(self.silence)
+        fx.flush()
+        fx.reset(0.5)
+        self.draining.append((time.monotonic() + TAILS.get(fx.fx_type, DEFAULT_TAIL), fx))
+        self.in_use[fx.fx_type] -= 1
+
+    def _take(self, item):
+        # list.remove ist atomar, wer es schafft, besitzt den Effekt
+        try:
+            self.draining.remove(item)
+            return True
+        except ValueError:
+            return False
+
+    def collect(self):
+        # ausgeklungene Effekte stoppen und zurueck in den Pool (pool-drain Thread)
+        now = time.monotonic()
+        for item in list(self.draining):
+            if item[0] <= now and self._take(item):
+                item[1].stop()
+                self.free[item[1].fx_type].append(item[1])
+
+    def stats(self):
+        draining = [fx.fx_type for _, fx in self.draining]
+        return {fx_type: {"size": self.sizes.get(fx_type, 0),
+                          "free": len(self.free[fx_type]),
+                          "draining": draining.count(fx_type),
+                          "in_use": self.in_use[fx_type],
+                          "overflow": self.overflow[fx_type]}
+                for fx_type in self.free}
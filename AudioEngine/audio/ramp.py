@@ -0,0 +1,56 @@
+from pyo import *
+
+class SpeedRamp:
+    # Gemeinsame Abspielrate fuer alle Stems, Rampen laufen im Audio-Graph
+    # (Linseg/Expseg) statt per time.sleep im Python-Thread
+
+    # alte Scrub-Geschwindigkeit: 0.012 pro 30ms
+    SECONDS_PER_UNIT = 0.03 / 0.012
+
+    # Kurvenform -> Exponent fuer Expseg (None = linear)
+    CURVES = {
+        "lin": None,
+        "exp": 3.0,
+        "log": 0.35,
+    }
+
+    def __init__(self, init=1.0):
+        self.target = init
+        self.seg = None
+        self.sig = Sig(init)
+
+    def value(self):
+        return self.sig.get()
+
+    def set(self, speed):
+        # sofort, ohne Rampe
+        self.ramp(speed, 0)
+
+    def ramp(self, speed, dur=None, curve="lin"):
+        self.prepare(speed, dur, curve)()
+
+    def prepare(self, speed, dur=None, curve="lin"):
+        # Segment hier bauen, die zurueckgegebene Funktion schaltet nur noch um
+        # (bei Bundles im Block-Callback). Startet beim aktuellen Wert, auch
+        # wenn noch eine Rampe laeuft
+        current = self.value()
+        if dur is None:
+            dur = abs(speed - current) * self.SECONDS_PER_UNIT
+
+        seg = None
+        if dur > 0:
+            exp = self.CURVES.get(curve)
+            points = [(0, current), (dur, speed)]
+            seg = Linseg(points) if exp is None else Expseg(points, exp=exp)
+
+        def apply():
+            old_seg = self.seg
+            self.seg = seg
+            if seg is None:
+                self.sig.value = speed
+            else:
+                self.sig.value = seg.play()
+            self.target = speed
+            if old_seg is not None:
+                old_seg.stop()
+        return apply
@@ -0,0 +1,444 @@
+import os
+import threading
+from pyo import Mix, SigTo, PeakAmp
+from .bus import EffectBus
+from .channel import AudioChannel
+from .loader import SongLoader
+from .manifest import stem_file
+from .ramp import SpeedRamp
+from .stream import StreamFeeder
+from .stats import process_stats, print_process_stats
+from .transport import Transport
+
+class AudioSession:
+    # Stems (Layout aus dem Manifest des Songs) + Transport + Befehlsverarbeitung,
+    # wird vom Socket-Server (main.py) und vom Offline-Render (render.py) benutzt
+    def __init__(self, engine, cache, song_base, sync=False, pool_sizes=None, library=None, waveform=None, out=True,
+                 freezer=None, fuse_eq=True, idle_hold=2.0, idle_threshold=1e-4, stream_after=None, stream_window=30,
+                 beats=None, stem_slots=4, stem_release=None):
+        self.engine = engine
+        self.cache = cache
+        self.song_base = song_base
+        self.library = library
+        self.waveform = waveform
+        self.freezer = freezer
+        self.beats = beats # BeatService, Beat-Raster fuer Sync-Effekte und Quantize
+        self.queue = None # wird von main.py gesetzt
+
+        # eine Abspielrate und ein Abspielkopf fuer alle Stems -> sample-synchron
+        self.ramp = SpeedRamp(1.0)
+        self.transport = Transport(self.ramp.sig)
+        # stem_slots Kanaele, ein Song belegt so viele wie sein Manifest Stems hat
+        self.channels = [AudioChannel(i, cache, self.transport, pool_sizes, out=False, fuse_eq=fuse_eq)
+                         for i in range(stem_slots)]
+        # stem_release: stumme Stems erst beim Aufdrehen laden, nach so vielen
+        # Sekunden Stille wieder freigeben, None -> immer alle laden
+        self.loader = SongLoader(engine, self.channels, self.transport, sync=sync,
+                                 stream_after=stream_after, stream_window=stream_window, beats=beats,
+                                 release_after=stem_release)
+        if beats is not None:
+            beats.listeners.append(self._grid_ready)
+        # lange Stems: Fenster um den Kopf im Hintergrund nachfuellen
+        self.feeder = StreamFeeder(self.channels, lambda: self.ramp.target) if stream_after is not None else None
+
+        # gemeinsame Send-Effekte statt einem Reverb/Delay pro Kanal
+        self.buses = {
+            "reverb": EffectBus("reverb", "reverb", self.channels, out=False),
+            "delay": EffectBus("delay", "delay", self.channels, out=False),
+        }
+
+        # Summe aller Stems + Returns, gain fuer Deck-Lautstaerke/Crossfader
+        # out=False: Ausgang wird woanders abgegriffen (Deck-Prozess)
+        self.gain = SigTo(1, time=0.05, init=1)
+        sources = [ch.output for ch in self.channels] + [bus.fx.out_node for bus in self.buses.values()]
+        self.output = Mix(sources, voices=2, mul=self.gain)
+        if out:
+            self.output.out()
+        self.out = out
+
+        # Leerlauf: steht der Transport und sind alle Fahnen abgeklungen,
+        # werden Kanaele, Busse und Summe angehalten. idle_hold=None -> nie
+        self.idle_hold = idle_hold
+        self.idle_threshold = idle_threshold
+        self.idle_blocks = 0
+        self.suspended = False
+        self.idle_lock = threading.Lock()
+        self.meter = PeakAmp(self.output)
+        if idle_hold is not None:
+            engine.block_listeners.append(self._idle_tick)
+
+    def song_path(self, artist, title):
+        return f"{self.song_base}/{artist}-{title}"
+
+    def get_state(self):
+        # fuer den State-Broadcast, nur Python-Werte lesen
+        song = self.loader.current
+        return {
+            "song": os.path.basename(song) if song else None,
+            "position": round(self.transport.position(), 4),
+            "duration": round(self.transport.duration, 3),
+            "playing": self.transport.playing,
+            "transport": self.transport.state,
+            "suspended": self.suspended,
+            "speed": round(self.ramp.target, 3),
+            "bpm": round(self.transport.bpm, 2) if self.transport.bpm is not None else None,
+            "channels": [ch.get_state() for ch in self.channels],
+            "sends": {name: dict(bus.levels) for name, bus in self.buses.items()},
+            "buses": {name: {"x": round(bus.fx.x, 3), "y": round(bus.fx.y, 3)} for name, bus in self.buses.items()},
+        }
+
+    def stats(self):
+        # pro Kanal/Effekt, ohne die prozessweiten Zahlen
+        return {
+            "channels": [ch.stats() for ch in self.channels],
+            "buses": {name: len(bus.fx._nodes()) + 1 for name, bus in self.buses.items()},
+            "cache_mb": self.cache.stats()["mem_mb"],
+        }
+
+    def print_stats(self):
+        print_process_stats(process_stats())
+        st = self.stats()
+        for ch in st["channels"]:
+            print(f"[Stats] {ch['track']}: {ch['nodes']} Objekte, {len(ch['effects'])} Effekte, "
+                  f"Pool {ch['pool_nodes']} Objekte, Table {ch['table_mb']} MB")
+            for i, fx in enumerate(ch["effects"]):
+                state = "Kaskade" if fx["fused"] else ("aktiv" if fx["active"] else "gestoppt")
+                print(f"\t{i}: {fx['type']} ({fx['nodes']} Objekte, {state})")
+        print(f"[Stats] Busse: {st['buses']}, Stem-Cache: {st['cache_mb']} MB")
+
+    def _song_ok(self, artist, title):
+        # fehlende Stems schon vor dem Dekodieren melden
+        if self.library is None:
+            return True
+        missing = self.library.check(artist, title)
+        if missing:
+            print(f"[Library] {artist}-{title}: Stems fehlen: {', '.join(missing)}")
+            return False
+        return True
+
+    def _prepare_waveform(self, artist, title, future):
+        # erst nach dem Decode des Loaders, sonst dekodieren beide denselben Stem
+        if self.waveform is not None:
+            future.add_done_callback(lambda f: self._waveform_after(artist, title, f))
+
+    def _waveform_after(self, artist, title, future):
+        # nur geladene Stems vorberechnen, stumme (lazy) kommen erst auf Anfrage
+        if future.exception() is not None:
+            return
+        song_path = self.song_path(artist, title)
+        self.waveform.prepare_song([stem_file(song_path, stem) for stem, table, _ in future.result()
+                                    if stem is not None and table is not None])
+
+    def _channel(self, index):
+        # Kanal-Nummer gegen die tatsaechlichen Slots pruefen
+        if not 0 <= index < len(self.channels):
+            print(f"[Session] Kanal {index} existiert nicht ({len(self.channels)} Slots)")
+            return None
+        return self.channels[index]
+
+    def _prepare_beats(self, artist, title):
+        if self.beats is not None:
+            self.beats.prepare(self.song_path(artist, title))
+
+    def _grid_ready(self, song_path, grid):
+        # Analyse erst nach dem Wechsel fertig -> Raster im naechsten Block nachreichen
+        def apply():
+            if song_path == self.loader.current:
+                self.transport.set_grid(grid)
+        self.engine.call_in_block(apply)
+
+    def _idle_tick(self):
+        # Block-Listener, darf den Audio-Thread nie blockieren
+        if not self.idle_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.transport.idle():
+                # z.B. Song fertig geladen -> sofort weiter
+                self.idle_blocks = 0
+                if self.suspended:
+                    self._resume()
+                return
+            if self.suspended:
+                return
+            self.idle_blocks += 1
+            hold = self.idle_hold * self.engine.sr / self.engine.buffersize
+            if self.idle_blocks >= hold and max(self.meter.get(all=True)) < self.idle_threshold:
+                self._suspend()
+        finally:
+            self.idle_lock.release()
+
+    def _suspend(self):
+        for ch in self.channels:
+            ch.suspend()
+        for bus in self.buses.values():
+            bus.suspend()
+        self.output.stop()
+        self.meter.stop()
+        self.suspended = True
+        print("[Idle] Transport steht, DSP-Graph angehalten")
+
+    def _resume(self):
+        # Transport steht noch -> Kanaele sind ueber das Gate still,
+        # der Graph laeuft also schon bevor der Kopf sich bewegt
+        self.meter.play()
+        if self.out:
+            self.output.out()
+        else:
+            self.output.play()
+        for bus in self.buses.values():
+            bus.resume()
+        for ch in self.channels:
+            ch.resume()
+        self.suspended = False
+        print("[Idle] DSP-Graph laeuft wieder")
+
+    def wake(self):
+        # vor jedem Befehl: Leerlauf-Zaehler zuruecksetzen, ggf. fortsetzen
+        with self.idle_lock:
+            self.idle_blocks = 0
+            if self.suspended:
+                self._resume()
+
+    def handle_query(self, cmd):
+        # Abfragen mit Antwort an den Client, laufen nicht ueber die Queue
+        if self.library is None:
+            return None
+        return self.library.handle_query(cmd)
+
+    def prepare_bundle_cmd(self, kind, cmd):
+        # Bundle-Befehl im Control-Thread vorbereiten: Pruefen, Prefetch und
+        # Pool-Zugriff hier, zurueck kommt (apply, after) oder None. apply hat
+        # nur nicht blockierende Setter fuer den Block-Callback, after laeuft
+        # danach wieder im Control-Thread (z.B. Nachladen)
+        cmd_split = cmd.split()
+        if not cmd_split:
+            return None
+        self.wake()
+        name = cmd_split[0]
+
+        if name == "bus":
+            bus = self.buses.get(cmd_split[1])
+            if bus is None:
+                return None
+            return lambda: bus.set_param(cmd_split[2], float(cmd_split[3])), None
+        if kind == "cmd" and name in ("play", "pause", "stop"):
+            return getattr(self.transport, name), None
+        if kind == "cmd" and name in ("speed", "scrspeed"):
+            speed = float(cmd_split[1])
+            if name == "speed":
+                return self.ramp.prepare(speed, 0), None
+            dur = float(cmd_split[2]) if len(cmd_split) > 2 and cmd_split[2] != "auto" else None
+            curve = cmd_split[3] if len(cmd_split) > 3 else "lin"
+            return self.ramp.prepare(speed, dur, curve), None
+        if kind == "cmd" and name == "seek":
+            pos = float(cmd_split[1])
+            snap = cmd_split[2] if len(cmd_split) > 2 else None
+            for ch in self.channels:
+                ch.prefetch(pos)
+            return lambda: self.transport.seek(pos, snap), None
+
+        # ab hier Befehle fuer einen Kanal
+        ch = self._channel(int(cmd_split[1]))
+        if ch is None:
+            return None
+        ensure = lambda: self.loader.ensure_loaded(ch)
+        if kind == "cmd":
+            if name == "volume":
+                return lambda: ch.set_vol(float(cmd_split[2])), ensure
+            if name == "mute":
+                return ch.toggle_mute, ensure
+            if name == "offset":
+                return lambda: ch.set_offset(float(cmd_split[2])), None
+        else:
+            if name == "add":
+                fx = ch.effect_acquire(cmd_split[2], cmd_split[3])
+                if fx is None:
+                    return None
+                return lambda: ch.effect_attach(fx), None
+            if name == "rm":
+                return lambda: ch.effect_rm(int(cmd_split[2]), log=False), None
+            if name == "set":
+                return lambda: ch.effect_set(int(cmd_split[2]), cmd_split[3], float(cmd_split[4]), log=False), None
+            if name == "bypass":
+                return lambda: ch.effect_bypass(int(cmd_split[2]), cmd_split[3] not in ("0", "off")), None
+            if name == "swap":
+                return ch.effect_swap, None
+            if name == "send":
+                bus = self.buses.get(cmd_split[2])
+                if bus is None:
+                    return None
+                return lambda: bus.set_send(ch.id, float(cmd_split[3])), None
+        print(f"[Session] {name} ist in Bundles nicht erlaubt")
+        return None
+
+    # Commandos entgegennehmen
+    def handle_cmd(self, cmd):
+        cmd_split = cmd.split()
+        print(cmd_split)
+        if not cmd_split: return
+        self.wake()
+
+        channels = self.channels
+
+        if cmd_split[0] == "load":
+            # load <artist> <title> [position 0-1] [play/pause]
+            if len(cmd_split) > 2 and self._song_ok(cmd_split[1], cmd_split[2]):
+                position = float(cmd_split[3]) if len(cmd_split) > 3 else 0.0
+                play = cmd_split[4] != "pause" if len(cmd_split) > 4 else True
+                # dekodieren laeuft im Loader-Thread, Wechsel an Block-Grenze
+                future = self.loader.load(self.song_path(cmd_split[1], cmd_split[2]), position, play)
+                self._prepare_waveform(cmd_split[1], cmd_split[2], future)
+                self._prepare_beats(cmd_split[1], cmd_split[2])
+
+        elif cmd_split[0] == "preload":
+            if len(cmd_split) > 2 and self._song_ok(cmd_split[1], cmd_split[2]):
+                future = self.loader.preload(self.song_path(cmd_split[1], cmd_split[2]))
+                self._prepare_waveform(cmd_split[1], cmd_split[2], future)
+                self._prepare_beats(cmd_split[1], cmd_split[2])
+
+        elif cmd_split[0] == "rescan":
+            if self.library is not None:
+                self.library.scan_async()
+
+        elif cmd_split[0] == "play":
+            self.transport.play()
+
+        elif cmd_split[0] == "pause":
+            self.transport.pause()
+
+        elif cmd_split[0] == "stop":
+            # Pause + zurueck an den Anfang, im selben Block
+            self.engine.call_in_block(self.transport.stop)
+
+        elif cmd_split[0] == "volume":
+            if len(cmd_split) > 2:
+                ch = self._channel(int(cmd_split[1]))
+                if ch is None:
+                    return
+                smoothing = ch.set_vol(float(cmd_split[2]))
+                # freigegebener Stem wird beim Aufdrehen nachgeladen
+                self.loader.ensure_loaded(ch)
+                return smoothing
+
+        elif cmd_split[0] == "mute":
+            if len(cmd_split) > 1:
+                ch = self._channel(int(cmd_split[1]))
+                if ch is None:
+                    return
+                ch.toggle_mute()
+                self.loader.ensure_loaded(ch)
+
+        elif cmd_split[0] == "speed":
+            if len(cmd_split) > 1:
+                self.ramp.set(float(cmd_split[1]))
+
+        elif cmd_split[0] == "scrspeed":
+            # scrspeed <speed> [dauer/auto] [lin/exp/log], kehrt sofort zurueck
+            if len(cmd_split) > 1:
+                dur = float(cmd_split[2]) if len(cmd_split) > 2 and cmd_split[2] != "auto" else None
+                curve = cmd_split[3] if len(cmd_split) > 3 else "lin"
+                self.ramp.ramp(float(cmd_split[1]), dur, curve)
+
+        elif cmd_split[0] == "seek":
+            # seek <position 0-1> [off/beat/bar]
+            if len(cmd_split) > 1:
+                # reset + setPhase im selben Block, Quantisieren ebenfalls erst dort
+                pos = float(cmd_split[1])
+                snap = cmd_split[2] if len(cmd_split) > 2 else None
+                for ch in channels:
+                    ch.prefetch(pos)
+                self.engine.call_in_block(lambda: self.transport.seek(pos, snap))
+
+        elif cmd_split[0] == "grid":
+            # Beat-Raster des aktuellen Songs neu lesen (Analyse lief woanders)
+            if self.beats is not None and self.loader.current is not None:
+                self.beats.prepare(self.loader.current)
+
+        elif cmd_split[0] == "offset":
+            # offset <ch> <sekunden>
+            if len(cmd_split) > 2:
+                ch = self._channel(int(cmd_split[1]))
+                if ch is not None:
+                    ch.set_offset(float(cmd_split[2]))
+
+        elif cmd_split[0] == "freeze":
+            # freeze <ch>: Effektkette im Hintergrund rendern und einfrieren
+            if len(cmd_split) > 1 and self.freezer is not None:
+                ch = self._channel(int(cmd_split[1]))
+                if ch is not None:
+                    self.freezer.freeze(ch)
+
+        elif cmd_split[0] == "unfreeze":
+            if len(cmd_split) > 1:
+                ch = self._channel(int(cmd_split[1]))
+                if ch is not None:
+                    self.engine.call_in_block(ch.unfreeze)
+
+        elif cmd_split[0] == "phase":
+            self.transport.print_phase()
+
+        elif cmd_split[0] == "cache":
+            self.cache.print_stats()
+
+        elif cmd_split[0] == "stats":
+            self.print_stats()
+
+        elif cmd_split[0] == "pool":
+            for ch in channels:
+                print(f"[Pool] {ch.track_type}:")
+                for fx_type, st in ch.pool.stats().items():
+                    print(f"\t{fx_type}: {st['in_use']} benutzt, {st['free']} frei, {st['overflow']}x nachgebaut")
+
+        elif cmd_split[0] == "queue":
+            if self.queue is not None:
+                self.queue.print_stats()
+
+        return
+    
+    def handle_fx_cmd(self, cmd):
+        cmd_split = cmd.split()
+        if len(cmd_split) <= 1: return
+
+        print(cmd_split)
+        self.wake()
+        if cmd_split[0] == "bus":
+            return self.handle_bus_cmd(cmd_split)
+
+        channels = self.channels
+        ch_index = int(cmd_split[1])
+        if self._channel(ch_index) is None:
+            return
+        if cmd_split[0] == "set":
+            if len(cmd_split) > 4:
+                # gibt die Glaettungszeit zurueck (Latenz-Tracing)
+                return channels[ch_index].effect_set(int(cmd_split[2]), cmd_split[3], float(cmd_split[4]))
+
+        elif cmd_split[0] == "add":
+            if len(cmd_split) > 3:
+                channels[ch_index].effect_add(cmd_split[2], cmd_split[3])
+
+        elif cmd_split[0] == "rm":
+            if len(cmd_split) > 2:
+                channels[ch_index].effect_rm(int(cmd_split[2]))
+
+        elif cmd_split[0] == "bypass":
+            # bypass <ch> <id> <0/1>
+            if len(cmd_split) > 3:
+                channels[ch_index].effect_bypass(int(cmd_split[2]), cmd_split[3] not in ("0", "off"))
+
+        elif cmd_split[0] == "swap":
+            channels[ch_index].effect_swap()
+
+        elif cmd_split[0] == "print":
+            channels[ch_index].effects_print()
+            [bus.print_state() for bus in self.buses.values()]
+
+        elif cmd_split[0] == "send":
+            # send <ch> <bus> <level>
+            if len(cmd_split) > 3 and cmd_split[2] in self.buses:
+                self.buses[cmd_split[2]].set_send(ch_index, float(cmd_split[3]))
+
+    def handle_bus_cmd(self, cmd_split):
+        # bus <name> <x/y> <value>
+        if len(cmd_split) > 3 and cmd_split[1] in self.buses:
+            return self.buses[cmd_split[1]].set_param(cmd_split[2], float(cmd_split[3]))
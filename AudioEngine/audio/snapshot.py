@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import threading
+
+# Zustand fuer einen Warmstart nach einem Absturz: Song, Position, Speed,
+# Lautstaerken, Effektketten in Reihenfolge mit x/y, Sends und Busse.
+# Geschrieben wird bei jeder Aenderung (die Position allein loest nur
+# hoechstens alle position_every Sekunden einen Write aus), immer atomar.
+
+class SnapshotWriter:
+    def __init__(self, get_state, path, period=0.25, position_every=1.0):
+        self.get_state = get_state
+        self.path = path
+        self.period = period
+        self.position_every = position_every
+        self.last_key = None
+        self.last_write = 0.0
+        self.writes = 0
+        self.running = False
+        self.thread = None
+
+    @staticmethod
+    def _without_position(state):
+        # alles ausser der laufenden Position entscheidet ueber einen Write
+        return [{k: v for k, v in deck.items() if k != "position"} for deck in state.get("decks", [])], \
+               state.get("xfade"), state.get("volumes")
+
+    def write(self, state):
+        snapshot = {"time": round(time.time(), 3), "state": state}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self.writes += 1
+
+    def _run(self, delay):
+        # nach einem Warmstart erst schreiben, wenn der alte Zustand wieder steht
+        time.sleep(delay)
+        while self.running:
+            try:
+                state = self.get_state()
+                key = self._without_position(state)
+                now = time.monotonic()
+                if key != self.last_key or now - self.last_write >= self.position_every:
+                    self.write(state)
+                    self.last_key = key
+                    self.last_write = now
+            except Exception as e:
+                print(f"[Snapshot] Fehler beim Schreiben: {e}")
+            time.sleep(self.period)
+
+    def start(self, delay=0.0):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(delay,), name="snapshot", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+def read_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Snapshot] {path} nicht lesbar: {e}")
+        return None
+
+def restore_commands(snapshot):
+    # Snapshot -> Liste von (cmd/fx, befehl) fuer die CommandQueue,
+    # die Kanaele sind nach dem Start leer, ungemutet und auf Lautstaerke 1
+    state = snapshot["state"]
+    commands = []
+    for deck_id, deck in enumerate(state.get("decks", [])):
+        prefix = f"@{deck_id} "
+
+        if deck.get("speed") is not None:
+            commands.append(("cmd", f"{prefix}speed {deck['speed']}"))
+
+        for ch_id, ch in enumerate(deck.get("channels", [])):
+            if ch.get("volume", 1) != 1:
+                commands.append(("cmd", f"{prefix}volume {ch_id} {ch['volume']}"))
+            if ch.get("muted"):
+                commands.append(("cmd", f"{prefix}mute {ch_id}"))
+            if ch.get("offset"):
+                commands.append(("cmd", f"{prefix}offset {ch_id} {ch['offset']}"))
+            # Reihenfolge der Kette bleibt durch die Reihenfolge der adds erhalten
+            for fx_id, fx in enumerate(ch.get("effects", [])):
+                commands.append(("fx", f"{prefix}add {ch_id} {fx['type']} {fx['y']}"))
+                commands.append(("fx", f"{prefix}set {ch_id} {fx_id} x {fx['x']}"))
+                if fx.get("bypassed"):
+                    commands.append(("fx", f"{prefix}bypass {ch_id} {fx_id} 1"))
+
+        for name, params in deck.get("buses", {}).items():
+            commands.append(("fx", f"{prefix}bus {name} x {params['x']}"))
+            commands.append(("fx", f"{prefix}bus {name} y {params['y']}"))
+        for name, levels in deck.get("sends", {}).items():
+            for ch_id, level in levels.items():
+                if level > 0:
+                    commands.append(("fx", f"{prefix}send {ch_id} {name} {level}"))
+
+        # Song zuletzt: Stems kommen aus dem Cache, Position/Pause direkt beim Wechsel
+        if deck.get("song"):
+            artist, title = deck["song"].split("-", 1)
+            play = "play" if deck.get("transport", "playing") == "playing" else "pause"
+            commands.append(("cmd", f"{prefix}load {artist} {title} {deck.get('position', 0.0)} {play}"))
+
+    if state.get("xfade") is not None:
+        commands.append(("cmd", f"xfade {state['xfade']}"))
+    for deck_id, volume in enumerate(state.get("volumes", [])):
+        if volume != 1:
+            commands.append(("cmd", f"deckvol {deck_id} {volume}"))
+    return commands
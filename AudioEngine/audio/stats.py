@@ -0,0 +1,60 @@
+import gc
+import os
+import resource
+from collections import Counter
+
+import numpy as np
+from pyo import PyoObjectBase, PyoTableObject
+
+# Instrumentierung: lebende pyo-Objekte, Table-Speicher und RSS.
+# Alles hier laeuft nur auf Anfrage (stats Befehl, /stats, stress.py),
+# nie im Audio-Callback.
+
+def rss_mb(pid="self"):
+    # aktueller RSS ueber /proc (Linux), sonst Spitzenwert des eigenen Prozesses
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError):
+        if pid != "self":
+            return None
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def table_bytes(table):
+    if table is None:
+        return 0
+    try:
+        return sum(np.asarray(table.getBuffer(c)).nbytes for c in range(len(table)))
+    except Exception:
+        return 0
+
+def live_objects(top=15):
+    # alle pyo-Objekte, die Python noch kennt (ueber den GC)
+    gc.collect()
+    counts = Counter()
+    tables = 0
+    tables_bytes = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, PyoTableObject):
+            tables += 1
+            tables_bytes += table_bytes(obj)
+        elif isinstance(obj, PyoObjectBase):
+            counts[type(obj).__name__] += 1
+    return {
+        "objects": sum(counts.values()),
+        "by_type": dict(counts.most_common(top)),
+        "tables": tables,
+        "table_mb": round(tables_bytes / (1024 * 1024), 1),
+    }
+
+def process_stats():
+    st = live_objects()
+    st["rss_mb"] = rss_mb()
+    return st
+
+def print_process_stats(st):
+    print(f"[Stats] RSS: {st['rss_mb']} MB, pyo-Objekte: {st['objects']}, "
+          f"Tables: {st['tables']} / {st['table_mb']} MB")
+    for name, n in st["by_type"].items():
+        print(f"\t{name}: {n}")
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import numpy as np
+from pyo import *
+
+# Streaming fuer lange Stems (z.B. einstuendige DJ-Mixe): statt des ganzen
+# Stems liegt nur ein Fenster um den Abspielkopf in einer DataTable.
+# Song-Frame f liegt im Ring an Stelle (f % frames) % size, der Pointer
+# liest deshalb an Wrap(stem position * frames / size). Die Daten kommen
+# aus dem memmap im StemCache und werden von einem Thread nachgefuellt.
+
+class StreamTable:
+    def __init__(self, pcm, file_sr, window_sec, behind=0.25):
+        self.pcm = pcm # memmap [chnls, frames]
+        self.chnls, self.frames = pcm.shape
+        self.sr = file_sr
+        self.duration = self.frames / file_sr
+        self.size = max(1, min(self.frames, int(window_sec * file_sr)))
+        self.behind = behind # Anteil des Fensters hinter dem Kopf (vorwaerts)
+
+        self.table = DataTable(size=self.size, chnls=self.chnls)
+        self.buffers = [np.asarray(self.table.getBuffer(c)) for c in range(self.chnls)]
+        self.lock = threading.Lock()
+
+        # gueltiger Bereich [lo, hi) in fortlaufenden Song-Frames
+        self.lo = 0
+        self.hi = 0
+        self.pending = None # Seek-Ziel, bis der Kopf dort angekommen ist
+        self.fill(0.0)
+
+    @property
+    def ratio(self):
+        return self.frames / self.size
+
+    def _copy(self, a, b):
+        # Song-Frames [a, b) in den Ring kopieren, an Song- und Ringgrenzen teilen
+        f = a
+        while f < b:
+            sf = f % self.frames
+            rs = sf % self.size
+            n = min(b - f, self.frames - sf, self.size - rs)
+            for c in range(self.chnls):
+                self.buffers[c][rs:rs + n] = self.pcm[c, sf:sf + n]
+            f += n
+
+    def _near(self, frame):
+        # Frame so verschieben, dass er am naechsten am bisherigen Fenster liegt
+        # (Kopf springt am Songende von frames auf 0)
+        center = (self.lo + self.hi) // 2
+        return frame + round((center - frame) / self.frames) * self.frames
+
+    def fill(self, pos, reverse=False):
+        # Fenster um die normierte Stem-Position pos nachfuellen
+        if self.size == self.frames:
+            # ganzer Stem passt ins Fenster -> nur einmal laden
+            with self.lock:
+                if self.hi - self.lo < self.frames:
+                    self._copy(0, self.frames)
+                    self.lo, self.hi = 0, self.frames
+            return
+
+        with self.lock:
+            frame = int(pos * self.frames)
+            if self.pending is not None:
+                # Seek noch nicht im Block angewendet -> Ziel statt alter Position
+                dist = (frame - self.pending) % self.frames
+                if min(dist, self.frames - dist) > self.size // 4:
+                    frame = self.pending
+                else:
+                    self.pending = None
+            frame = self._near(frame)
+            behind = int(self.size * (1 - self.behind if reverse else self.behind))
+            lo = frame - behind
+            hi = lo + self.size
+
+            if hi <= self.lo or lo >= self.hi:
+                # kein Ueberlapp (z.B. nach Seek ohne prefetch)
+                self._copy(lo, hi)
+            else:
+                if lo < self.lo:
+                    self._copy(lo, self.lo)
+                if hi > self.hi:
+                    self._copy(self.hi, hi)
+            self.lo, self.hi = lo, hi
+
+    def prefetch(self, pos, seconds=1.0):
+        # vor einem Seek: kurzes Stueck ab Zielposition sofort laden,
+        # den Rest fuellt der StreamFeeder im Hintergrund
+        if self.size == self.frames:
+            return
+        with self.lock:
+            frame = int(pos * self.frames)
+            n = min(self.size, int(seconds * self.sr))
+            lo = frame - n // 4
+            self._copy(lo, lo + n)
+            self.lo, self.hi = lo, lo + n
+            self.pending = frame
+
+    def mem_bytes(self):
+        return sum(buf.nbytes for buf in self.buffers)
+
+class StreamFeeder:
+    # ein Thread pro Session, haelt die Fenster aller streamenden Kanaele
+    # um den aktuellen Kopf gefuellt, auch bei negativer Geschwindigkeit
+    def __init__(self, channels, speed, period=0.05):
+        self.channels = channels
+        self.speed = speed # callable, aktuelle Zielgeschwindigkeit
+        self.period = period
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="stream-feeder", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            reverse = self.speed() < 0
+            for ch in self.channels:
+                stream = ch.stream
+                if stream is None:
+                    continue
+                try:
+                    stream.fill(ch.stem_position(), reverse)
+                except Exception as e:
+                    print(f"[Stream] {ch.track_type}: Fehler beim Nachfuellen: {e}")
+            time.sleep(self.period)
+
+    def stop(self):
+        self.running = False
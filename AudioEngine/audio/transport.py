@@ -0,0 +1,93 @@
+from pyo import *
+
+class Transport:
+    # Ein Abspielkopf fuer alle Stems. Seek, Speed und Play/Pause/Stop
+    # sind damit jeweils eine einzige Operation im selben Block.
+    STATES = ("playing", "paused", "stopped")
+    DEFAULT_BPM = 120.0 # solange fuer den Song kein Beat-Raster da ist
+
+    def __init__(self, rate):
+        self.rate = rate # gemeinsame Rate aus SpeedRamp
+        self.duration = 0
+        self.state = "playing"
+
+        self.inv_dur = Sig(0)  # 1 / dauer, 0 -> stehender Kopf
+        self.play_sig = Sig(1) # 0 = pausiert
+        self.phasor = Phasor(freq=self.rate * self.inv_dur * self.play_sig)
+        # blendet die Kanaele bei Pause/Stop kurz aus, statt den
+        # letzten Sample-Wert des stehenden Kopfes weiter auszugeben
+        self.gate = SigTo(1, time=0.01, init=1)
+
+        # Beat-Takt fuer tempo-synchrone Effekte: Position in Beats (folgt
+        # Speed, Seek und Pause automatisch) und Sekunden pro Beat bei aktueller Speed
+        self.grid = None # BeatGrid aus dem BeatService
+        self.song_beats = Sig(0)  # Dauer in Beats
+        self.beat_offset = Sig(0) # erster Beat in Beats
+        self.beats = self.phasor * self.song_beats - self.beat_offset
+        self.beat_len = Sig(60.0 / self.DEFAULT_BPM)
+        self.speed_abs = Max(Abs(self.rate), comp=0.05)
+        self.beat_sec = self.beat_len / self.speed_abs
+
+    @property
+    def playing(self):
+        return self.state == "playing"
+
+    def set_duration(self, duration):
+        self.duration = duration
+        self.inv_dur.value = 1.0 / duration if duration > 0 else 0
+        self._update_beats()
+
+    def set_grid(self, grid):
+        # None -> DEFAULT_BPM ab Sekunde 0
+        self.grid = grid
+        self._update_beats()
+
+    @property
+    def bpm(self):
+        return self.grid.bpm if self.grid is not None else None
+
+    def _update_beats(self):
+        bpm = self.grid.bpm if self.grid is not None else self.DEFAULT_BPM
+        first = self.grid.first_beat if self.grid is not None else 0.0
+        self.song_beats.value = self.duration * bpm / 60
+        self.beat_offset.value = first * bpm / 60
+        self.beat_len.value = 60.0 / bpm
+
+    def seek(self, position, snap=None):
+        # snap "beat"/"bar": Ziel aufs Raster ziehen, Phase zum Beat bleibt gleich
+        if snap in ("beat", "bar") and self.grid is not None and self.duration > 0:
+            position = self.grid.snap(float(position) * self.duration, self.seconds(), snap) / self.duration
+        pos = max(0.0, min(1.0, float(position)))
+        # An Anfang spulen und dann Phase setzen
+        self.phasor.reset()
+        self.phasor.setPhase(pos)
+
+    def play(self):
+        self.state = "playing"
+        self.play_sig.value = 1
+        self.gate.value = 1
+
+    def pause(self):
+        self.state = "paused"
+        self.play_sig.value = 0
+        self.gate.value = 0
+
+    def stop(self):
+        # wie Pause, Kopf zurueck an den Anfang
+        self.pause()
+        self.state = "stopped"
+        self.seek(0)
+
+    def idle(self):
+        # steht der Kopf? (pausiert, kein Song oder Speed 0)
+        return not self.playing or self.inv_dur.value == 0 or abs(self.rate.get()) < 1e-6
+
+    def position(self):
+        # normierte Position 0-1
+        return self.phasor.get()
+
+    def seconds(self):
+        return self.position() * self.duration
+
+    def print_phase(self):
+        print(f"Phase von Transport: {self.position():.4f} ({self.seconds():.2f}s / {self.duration:.2f}s)")
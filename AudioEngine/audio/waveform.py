@@ -0,0 +1,150 @@
+import os
+import struct
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from .manifest import read_manifest, stem_file
+
+# Peak-Pyramide pro Stem: Stufe 0 fasst BASE_BLOCK Samples zusammen,
+# jede weitere Stufe halbiert die Aufloesung. Pro Bin min/max/rms,
+# quantisiert auf 8 Bit, damit die Frames klein bleiben.
+BASE_BLOCK = 256
+MIN_BINS = 256
+
+# Frame-Header: Magic, Version, Stufe, Anzahl Stufen, Start-Bin, Anzahl Bins, Sekunden pro Bin
+HEADER = struct.Struct("<4sBBHIIf")
+MAGIC = b"PEAK"
+
+def build_pyramid(npy_path, out_path, sr, source_id):
+    # laeuft im Worker-Prozess, nur NumPy, kein pyo
+    pcm = np.load(npy_path, mmap_mode="r")
+    # Kanaele mitteln -> mono
+    mono = pcm.mean(axis=0, dtype=np.float32)
+
+    n_bins = len(mono) // BASE_BLOCK
+    blocks = mono[:n_bins * BASE_BLOCK].reshape(n_bins, BASE_BLOCK)
+    mins = blocks.min(axis=1)
+    maxs = blocks.max(axis=1)
+    sq = (blocks.astype(np.float32) ** 2).mean(axis=1)
+
+    levels = {}
+    level = 0
+    while True:
+        levels[f"min{level}"] = np.clip(mins * 127, -127, 127).astype(np.int8)
+        levels[f"max{level}"] = np.clip(maxs * 127, -127, 127).astype(np.int8)
+        levels[f"rms{level}"] = np.clip(np.sqrt(sq) * 255, 0, 255).astype(np.uint8)
+        if len(mins) < 2 * MIN_BINS:
+            break
+        # naechste Stufe: je zwei Bins zusammenfassen
+        even = len(mins) // 2 * 2
+        mins = mins[:even].reshape(-1, 2).min(axis=1)
+        maxs = maxs[:even].reshape(-1, 2).max(axis=1)
+        sq = sq[:even].reshape(-1, 2).mean(axis=1)
+        level += 1
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, source=np.array(source_id), sr=np.array(sr), n_levels=np.array(level + 1), **levels)
+    os.replace(tmp, out_path)
+    return out_path
+
+class WaveformService:
+    # berechnet Pyramiden im Process-Pool und liefert Ausschnitte als Binaer-Frames
+    def __init__(self, cache, song_base, workers=2):
+        self.cache = cache
+        self.song_base = os.path.realpath(song_base)
+        # spawn statt fork: der Hauptprozess hat laufende Audio-Threads
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.loaded = {} # peaks datei -> npz daten
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _source_id(stem_path):
+        st = os.stat(stem_path)
+        return f"{st.st_mtime_ns}|{st.st_size}"
+
+    @staticmethod
+    def peaks_path(stem_path):
+        # Cache liegt neben dem Song
+        song_dir, name = os.path.split(stem_path)
+        return os.path.join(song_dir, ".peaks", os.path.splitext(name)[0] + ".npz")
+
+    def _valid(self, out_path, source_id):
+        if not os.path.exists(out_path):
+            return False
+        try:
+            with np.load(out_path) as data:
+                return str(data["source"]) == source_id
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def ensure(self, stem_path):
+        # blockiert bis die Pyramide da ist -> nicht im Event-Loop aufrufen
+        out_path = self.peaks_path(stem_path)
+        source_id = self._source_id(stem_path)
+        if self._valid(out_path, source_id):
+            return out_path
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        npy_file, sr = self.cache.pcm_file(stem_path)
+        future = self.executor.submit(build_pyramid, npy_file, out_path, sr, source_id)
+        future.result()
+        with self.lock:
+            self.loaded.pop(out_path, None)
+        return out_path
+
+    def prepare_song(self, stems):
+        # nach load/preload im Hintergrund vorberechnen
+        def run():
+            for stem_path in stems:
+                try:
+                    self.ensure(stem_path)
+                except Exception as e:
+                    print(f"[Waveform] {stem_path}: {e}")
+        threading.Thread(target=run, name="waveform", daemon=True).start()
+
+    def _data(self, out_path):
+        with self.lock:
+            data = self.loaded.get(out_path)
+            if data is None:
+                with np.load(out_path) as npz:
+                    data = {k: npz[k] for k in npz.files}
+                # nur die Stems der letzten Songs im RAM halten
+                if len(self.loaded) >= 16:
+                    self.loaded.pop(next(iter(self.loaded)))
+                self.loaded[out_path] = data
+            return data
+
+    def frame(self, stem_path, level, start=0, count=None):
+        data = self._data(self.ensure(stem_path))
+        n_levels = int(data["n_levels"])
+        level = max(0, min(n_levels - 1, int(level)))
+
+        mins = data[f"min{level}"]
+        total = len(mins)
+        start = max(0, min(total, int(start)))
+        end = total if count is None else min(total, start + int(count))
+
+        sec_per_bin = BASE_BLOCK * (2 ** level) / float(data["sr"])
+        header = HEADER.pack(MAGIC, 1, level, n_levels, start, end - start, sec_per_bin)
+        return header + mins[start:end].tobytes() + data[f"max{level}"][start:end].tobytes() \
+            + data[f"rms{level}"][start:end].tobytes()
+
+    def stem_path(self, artist, title, stem):
+        song_dir = os.path.realpath(os.path.join(self.song_base, f"{artist}-{title}"))
+        if os.path.dirname(song_dir) != self.song_base:
+            raise ValueError(f"{artist}-{title} ungueltig")
+        for entry in read_manifest(song_dir):
+            if entry["name"] == stem:
+                return stem_file(song_dir, entry)
+        raise ValueError(f"Stem {stem} unbekannt")
+
+    async def handle_request(self, sid, data):
+        # socket: emit('peaks', {artist, title, stem, level, start, count}) -> Binaer-Frame
+        stem_path = self.stem_path(data["artist"], data["title"], data["stem"])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.frame, stem_path,
+                                          data.get("level", 0), data.get("start", 0), data.get("count"))
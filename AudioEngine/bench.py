@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+# DSP-Benchmark: rendert jede Effekt-Konfiguration offline auf vier Kanaelen
+# und misst die CPU-Zeit pro Audio-Block. Jede Messung laeuft in einem
+# eigenen Prozess, weil pyo nur einen Server pro Prozess erlaubt.
+#
+#   python bench.py --sr 44100 48000 --buffer 128 256 --out bench_results/neu.json
+#   python bench.py --compare bench_results/alt.json bench_results/neu.json
+
+FX_TYPES = ["lowcut", "hicut", "lowboost", "hiboost", "gate", "crush", "flanger", "reverb", "delay"]
+EQ_CHAIN = ["lowcut", "hicut", "lowboost", "hiboost"]
+
+def configs(depths):
+    # (name, kette, filter zu einer Kaskade zusammenfassen)
+    yield "baseline", [], True
+    for fx in FX_TYPES:
+        yield fx, [fx], True
+    # chainN wie bisher ohne Kaskade (vergleichbar mit alten Ergebnissen),
+    # chainN_fused mit zusammengefassten Filtern
+    for depth in depths:
+        yield f"chain{depth}", [FX_TYPES[i % len(FX_TYPES)] for i in range(depth)], False
+        yield f"chain{depth}_fused", [FX_TYPES[i % len(FX_TYPES)] for i in range(depth)], True
+    # gleiche EQ-Kette einmal als Kaskade, einmal als Einzel-Effekte
+    yield "eq4", EQ_CHAIN, True
+    yield "eq4_unfused", EQ_CHAIN, False
+
+def run_case(sr, buffersize, name, chain, fuse, dur, n_channels=4):
+    # laeuft im Kind-Prozess
+    import numpy as np
+    from audio.engine import AudioEngine
+    from audio.channel import AudioChannel
+    from audio.ramp import SpeedRamp
+    from audio.transport import Transport
+    from pyo import DataTable
+
+    engine = AudioEngine(sr=sr, buffersize=buffersize, audio="offline")
+    engine.boot()
+
+    ramp = SpeedRamp(1.0)
+    transport = Transport(ramp.sig)
+    channels = [AudioChannel(i, None, transport, fuse_eq=fuse) for i in range(n_channels)]
+
+    # synthetisches Stereo-Material statt MP3, damit kein Song noetig ist
+    frames = int(sr * 5)
+    rng = np.random.default_rng(0)
+    transport.set_duration(frames / sr)
+    for ch in channels:
+        table = DataTable(size=frames, chnls=2)
+        for c in range(2):
+            np.asarray(table.getBuffer(c))[:frames] = rng.uniform(-0.5, 0.5, frames)
+        ch.swap_table(table, frames / sr)
+        for fx in chain:
+            ch.effect_add(fx, 0.5)
+
+    fd, tmp = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        cpu_start = time.process_time()
+        wall = engine.render(dur, tmp)
+        cpu = time.process_time() - cpu_start
+    finally:
+        os.remove(tmp)
+
+    blocks = dur * sr / buffersize
+    deadline_us = buffersize / sr * 1e6
+    per_block_us = cpu / blocks * 1e6
+    return {
+        "name": name,
+        "chain": chain,
+        "fuse": fuse,
+        "sr": sr,
+        "buffersize": buffersize,
+        "channels": n_channels,
+        "dur": dur,
+        "cpu_s": round(cpu, 4),
+        "wall_s": round(wall, 4),
+        "per_block_us": round(per_block_us, 2),
+        "deadline_us": round(deadline_us, 2),
+        "load": round(per_block_us / deadline_us, 4), # Anteil am Block-Budget
+    }
+
+def _worker(args):
+    return run_case(*args)
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+def add_estimates(results):
+    # wie viele Effekte desselben Typs pro Kanal passen noch ins Block-Budget
+    base = {(r["sr"], r["buffersize"]): r for r in results if r["name"] == "baseline"}
+    for r in results:
+        b = base.get((r["sr"], r["buffersize"]))
+        if b is None or not r["chain"]:
+            continue
+        fx_cost = (r["per_block_us"] - b["per_block_us"]) / len(r["chain"])
+        r["fx_us"] = round(fx_cost, 2)
+        if fx_cost > 0:
+            r["max_fx"] = int((r["deadline_us"] - b["per_block_us"]) / fx_cost)
+
+def print_eq_saving(results):
+    # Ersparnis der Biquad-Kaskade gegenueber Einzel-Filtern
+    fused = {(r["sr"], r["buffersize"]): r for r in results if r["name"] == "eq4"}
+    for r in results:
+        if r["name"] != "eq4_unfused":
+            continue
+        f = fused.get((r["sr"], r["buffersize"]))
+        if f is None or not r["per_block_us"]:
+            continue
+        saving = r["per_block_us"] - f["per_block_us"]
+        print(f"[Bench] EQ-Kaskade sr={r['sr']} buf={r['buffersize']}: {saving:.1f} us/Block gespart "
+              f"({saving / r['per_block_us'] * 100:.1f}%)")
+
+def compare(old_file, new_file):
+    with open(old_file) as f:
+        old = {(r["name"], r["sr"], r["buffersize"]): r for r in json.load(f)["results"]}
+    with open(new_file) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'Konfiguration':<14}{'sr':>7}{'buf':>6}{'alt us':>10}{'neu us':>10}{'diff':>9}")
+    for r in new:
+        o = old.get((r["name"], r["sr"], r["buffersize"]))
+        if o is None:
+            continue
+        diff = (r["per_block_us"] - o["per_block_us"]) / o["per_block_us"] * 100 if o["per_block_us"] else 0
+        print(f"{r['name']:<14}{r['sr']:>7}{r['buffersize']:>6}{o['per_block_us']:>10.1f}{r['per_block_us']:>10.1f}{diff:>8.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU-Kosten pro Block fuer alle Effekttypen messen")
+    parser.add_argument("--sr", type=int, nargs="+", default=[44100, 48000])
+    parser.add_argument("--buffer", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--depth", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--dur", type=float, default=10.0, help="gerenderte Sekunden pro Messung")
+    parser.add_argument("--out", help="JSON-Datei (Standard: bench_results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("ALT", "NEU"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    cases = [(sr, bs, name, chain, fuse, args.dur)
+             for sr in args.sr for bs in args.buffer for name, chain, fuse in configs(args.depth)]
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for r in pool.imap(_worker, cases):
+            print(f"[Bench] {r['name']:<12} sr={r['sr']} buf={r['buffersize']}: "
+                  f"{r['per_block_us']:.1f} us/Block ({r['load'] * 100:.1f}% vom Budget)")
+            results.append(r)
+    add_estimates(results)
+    print_eq_saving(results)
+
+    rev = git_rev()
+    out = args.out or f"{Path(__file__).parent}/bench_results/{rev}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "commit": rev,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": platform.machine(),
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "results": results,
+        }, f, indent=2)
+    print(f"[Bench] Ergebnisse in {out}")
+
+if __name__ == "__main__":
+    main()
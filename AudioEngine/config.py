@@ -1,2 +1,78 @@
 BASE_PATH="musik_files"
-SONG_PATH="KanyeWest-FlashingLights"
\ No newline at end of file
+SONG_PATH="KanyeWest-FlashingLights"
+
+# Samples pro Audio-Block (Latenz gegen CPU-Reserve), nur beim Start
+BUFFERSIZE=256
+
+# Cache fuer dekodierte Stems
+CACHE_PATH=".stem_cache"
+CACHE_MEM_MB=512
+
+# Control-Queue (Socket -> Control-Thread)
+QUEUE_SIZE=1024
+QUEUE_PERIOD=0.01
+
+# Effekt-Pool: vorab gebaute Effekte pro Typ und Kanal
+FX_POOL_SIZES={
+    "lowcut": 1,
+    "hicut": 1,
+    "lowboost": 1,
+    "hiboost": 1,
+    "gate": 1,
+    "crush": 1,
+    "flanger": 1,
+    "reverb": 1,
+    "delay": 1,
+    "beatgate": 1,
+    "beatdelay": 1,
+}
+
+# benachbarte Filter-Effekte (lowcut/hicut/lowboost/hiboost) als eine Biquad-Kaskade rechnen
+FUSE_EQ=True
+
+# Leerlauf: nach so vielen Sekunden Stillstand (und abgeklungenen Fahnen
+# unter IDLE_THRESHOLD) wird der DSP-Graph angehalten, None -> nie
+IDLE_HOLD=2.0
+IDLE_THRESHOLD=1e-4
+
+# Streaming: Stems laenger als STREAM_AFTER Sekunden liegen nur als Fenster
+# von STREAM_WINDOW Sekunden um den Abspielkopf im RAM, None -> nie
+STREAM_AFTER=600
+STREAM_WINDOW=30
+
+# CPU-Governor: Massnahmen bei Ueberlast in dieser Reihenfolge
+# ("freeze", "bypass"), leere Liste -> nur messen. Reicht das nicht,
+# schlaegt der Governor im State eine groessere BUFFERSIZE vor.
+# Eingreifen ueber GOVERNOR_HIGH Last (Anteil am Block-Budget) oder bei
+# Ueberlaeufen, zuruecknehmen nach GOVERNOR_RECOVER Sekunden unter GOVERNOR_LOW
+GOVERNOR_POLICY=["freeze", "bypass"]
+GOVERNOR_HIGH=0.8
+GOVERNOR_LOW=0.5
+GOVERNOR_PERIOD=1.0
+GOVERNOR_RECOVER=5.0
+
+# Snapshot fuer Warmstart (main.py --restore), liegt neben main.py
+SNAPSHOT_FILE=".snapshot.json"
+SNAPSHOT_PERIOD=0.25
+
+# Beat-Raster: Prozesse fuer die BPM/Beat-Analyse der Drum-Stems
+BEAT_WORKERS=1
+
+# Stems: Kanaele pro Deck (so viele Stems darf ein Manifest haben, max. 16).
+# STEM_RELEASE: stumme Stems werden erst beim Aufdrehen dekodiert und nach
+# so vielen Sekunden Stille wieder aus dem RAM genommen, None -> immer alle laden
+STEM_SLOTS=4
+STEM_RELEASE=30
+
+# Song-Index (liegt in BASE_PATH)
+LIBRARY_INDEX=".library.json"
+
+# State-Broadcast an alle Clients (Hz)
+STATE_RATE=30
+
+# Decks: Anzahl, eigener Prozess pro Deck (eigener pyo-Server),
+# Ringpuffer zwischen Deck und Mixer in Blocks, Vorlauf in Blocks
+DECKS=1
+DECK_PROCESSES=False
+DECK_RING_BLOCKS=16
+DECK_PREFILL=4
@@ -0,0 +1,66 @@
+import asyncio
+
+class StateBroadcaster:
+    # Schickt Position, Speed, Mute/Volume und Effektketten mit fester Rate
+    # an alle Clients. Es werden nur geaenderte Felder (flach, z.B.
+    # "channels.0.volume") verschickt, jede Aenderung bekommt eine Version.
+    # Neue Clients bekommen beim Verbinden einmal den kompletten Stand.
+    def __init__(self, sio, get_state, rate=30):
+        self.sio = sio
+        self.get_state = get_state
+        self.period = 1.0 / rate
+        self.version = 0
+        self.last = {}
+        self.task = None
+
+    @staticmethod
+    def flatten(value, prefix="", out=None):
+        if out is None:
+            out = {}
+        if isinstance(value, dict):
+            for k, v in value.items():
+                StateBroadcaster.flatten(v, f"{prefix}{k}.", out)
+        elif isinstance(value, (list, tuple)):
+            out[prefix + "len"] = len(value)
+            for i, v in enumerate(value):
+                StateBroadcaster.flatten(v, f"{prefix}{i}.", out)
+        else:
+            out[prefix[:-1]] = value
+        return out
+
+    def _delta(self):
+        current = self.flatten(self.get_state())
+        changes = {k: v for k, v in current.items() if self.last.get(k) != v}
+        removed = [k for k in self.last if k not in current]
+        self.last = current
+        return changes, removed
+
+    async def send_full(self, sid):
+        await self.sio.emit('state', {"v": self.version, "full": True, "changes": self.last}, to=sid)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            try:
+                changes, removed = self._delta()
+                if changes or removed:
+                    self.version += 1
+                    msg = {"v": self.version, "changes": changes}
+                    if removed:
+                        msg["removed"] = removed
+                    await self.sio.emit('state', msg)
+            except Exception as e:
+                print(f"[State] Fehler: {e}")
+
+            # feste Rate, auch wenn ein Durchlauf laenger gedauert hat
+            next_tick += self.period
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+    async def start(self, app=None):
+        # als aiohttp on_startup Hook nutzbar
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self, app=None):
+        if self.task is not None:
+            self.task.cancel()
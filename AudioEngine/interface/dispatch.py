@@ -0,0 +1,152 @@
+import time
+import threading
+from collections import deque
+from .tracing import LatencyTracer
+
+class CommandQueue:
+    # Befehle vom Socket landen hier und werden von einem eigenen
+    # Control-Thread abgearbeitet, damit der Event-Loop nie blockiert.
+    # Kontinuierliche Regler (set/volume/seek/speed) werden pro Ziel
+    # zusammengefasst, es zaehlt nur der neueste Wert.
+    def __init__(self, callback_cmd, callback_fx, maxsize=1024, period=0.01, tracer=None, callback_bundle=None):
+        self.callback_cmd = callback_cmd
+        self.callback_fx = callback_fx
+        self.callback_bundle = callback_bundle # [(cmd/fx, msg), ...] im selben Audio-Block
+        self.maxsize = maxsize
+        self.period = period
+        self.tracer = tracer
+
+        self.entries = deque() # [kind, msg, trace]
+        self.pending = {}      # coalesce key -> entry (noch nicht abgearbeitet)
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        # Statistik
+        self.received = 0
+        self.applied = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def _coalesce_key(self, kind, msg):
+        if kind == "bundle":
+            # Bundles sind immer Barrieren
+            return None
+        parts = msg.split()
+        # Deck-Prefix ("@1 ...") gehoert mit zum Ziel
+        deck = "@0"
+        if parts and parts[0].startswith("@"):
+            deck = parts.pop(0)
+        if not parts:
+            return None
+        key = self._target(kind, parts)
+        return None if key is None else (deck, *key)
+
+    def _target(self, kind, parts):
+        if kind == "fx" and parts[0] == "set" and len(parts) > 4:
+            # set <ch> <id> <x/y> <v>
+            return ("fx", "set", parts[1], parts[2], parts[3])
+        if kind == "fx" and parts[0] in ("send", "bus") and len(parts) > 3:
+            # send <ch> <bus> <level> / bus <name> <x/y> <v>
+            return ("fx", parts[0], parts[1], parts[2])
+        if kind == "cmd":
+            if parts[0] == "volume" and len(parts) > 2:
+                return ("cmd", "volume", parts[1])
+            if parts[0] in ("seek", "speed", "xfade") and len(parts) > 1:
+                return ("cmd", parts[0])
+        return None
+
+    def put(self, kind, msg, trace=None):
+        with self.cond:
+            self.received += 1
+            key = self._coalesce_key(kind, msg)
+
+            if key is not None and key in self.pending:
+                # noch nicht angewendeter Wert wird einfach ueberschrieben
+                self.pending[key][1] = msg
+                self.pending[key][2] = trace
+                self.merged += 1
+                return True
+
+            if len(self.entries) >= self.maxsize:
+                self.dropped += 1
+                return False
+
+            entry = [kind, msg, trace]
+            self.entries.append(entry)
+            if key is not None:
+                self.pending[key] = entry
+            else:
+                # Barriere: spaetere Werte duerfen nicht vor diesen Befehl rutschen
+                self.pending.clear()
+            self.cond.notify()
+            return True
+
+    def put_cmd(self, msg, trace=None):
+        return self.put("cmd", msg, trace)
+
+    def put_fx(self, msg, trace=None):
+        return self.put("fx", msg, trace)
+
+    def put_bundle(self, entries, trace=None):
+        return self.put("bundle", list(entries), trace)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="control", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.entries:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                batch = list(self.entries)
+                self.entries.clear()
+                self.pending.clear()
+
+            for kind, msg, trace in batch:
+                LatencyTracer.mark(trace, "dequeued")
+                settle = None
+                try:
+                    if kind == "cmd":
+                        settle = self.callback_cmd(msg)
+                    elif kind == "bundle":
+                        settle = self.callback_bundle(msg)
+                    else:
+                        settle = self.callback_fx(msg)
+                except Exception as e:
+                    print(f"[Control] Fehler bei '{msg}': {e}")
+                self.applied += 1
+
+                # Rueckgabe der Callbacks = Glaettungszeit bis der Zielwert hoerbar ist
+                if self.tracer is not None:
+                    LatencyTracer.mark(trace, "applied")
+                    self.tracer.record(kind, msg if kind != "bundle" else "", trace, settle)
+
+            # Control-Periode: in der Zwischenzeit sammeln sich neue Werte an
+            time.sleep(self.period)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "depth": len(self.entries),
+                "received": self.received,
+                "applied": self.applied,
+                "merged": self.merged,
+                "dropped": self.dropped,
+            }
+
+    def print_stats(self):
+        st = self.stats()
+        print(f"[Control] Queue: {st['depth']}, empfangen: {st['received']}, angewendet: {st['applied']}, "
+              f"zusammengefasst: {st['merged']}, verworfen: {st['dropped']}")
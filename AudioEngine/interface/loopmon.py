@@ -0,0 +1,35 @@
+import asyncio
+from collections import deque
+
+class LoopMonitor:
+    # misst, wie viel spaeter als geplant der Event-Loop einen Sleep aufweckt
+    # (= wie lange andere Handler den Loop blockiert haben)
+    def __init__(self, interval=0.05, window=1200):
+        self.interval = interval
+        self.lags = deque(maxlen=window) # ms
+        self.max_lag = 0.0
+        self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, (loop.time() - start - self.interval) * 1000)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def summary(self):
+        vals = sorted(self.lags)
+        if not vals:
+            return {"samples": 0}
+        pick = lambda p: round(vals[min(len(vals) - 1, int(round(p / 100 * (len(vals) - 1))))], 3)
+        return {"samples": len(vals), "p50": pick(50), "p99": pick(99), "max": round(self.max_lag, 3)}
+
+    async def start(self, app=None):
+        # als aiohttp on_startup Hook nutzbar
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self, app=None):
+        if self.task is not None:
+            self.task.cancel()
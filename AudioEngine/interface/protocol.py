@@ -0,0 +1,262 @@
+import math
+import struct
+
+# Strukturiertes Steuerprotokoll fuer das 'ctl' Event, als JSON oder binaer.
+#
+# JSON:   {"cmd": "set", "ch": 2, "id": 0, "param": "x", "value": 0.8, "deck": 1}
+# Bundle: {"bundle": [{"cmd": "seek", "position": 0.25}, {"cmd": "speed", "value": 1.1}], "deck": 0}
+#         alle Befehle eines Bundles werden im selben Audio-Block angewendet,
+#         Befehle mit Platten-I/O oder Threads (BUNDLE_FORBIDDEN) sind dort verboten.
+#
+# Binaer (little endian): pro Befehl opcode (u8), deck (u8), dann die Felder
+# in Schema-Reihenfolge: int -> i16, float -> f32 (NaN = nicht gesetzt),
+# bool -> u8, str -> u8 Laenge + UTF-8. Ein Bundle ist 0xFF, Anzahl (u8),
+# danach die Befehle. Opcode = Position in COMMANDS, neue Befehle nur hinten
+# anhaengen.
+#
+# Gueltige Befehle werden in die bisherigen String-Befehle uebersetzt,
+# handle_cmd/handle_fx_cmd bekommen also nur noch geprueften, kanonischen Text.
+
+FX_TYPES = ("lowcut", "hicut", "lowboost", "hiboost", "gate", "crush", "flanger", "reverb", "delay",
+            "beatgate", "beatdelay")
+CURVES = ("lin", "exp", "log")
+REQUIRED = object()
+
+# name -> (cmd/fx, [(feld, typ, default)])
+COMMANDS = {
+    "load": ("cmd", [("artist", str, REQUIRED), ("title", str, REQUIRED), ("position", float, 0.0), ("play", bool, True)]),
+    "preload": ("cmd", [("artist", str, REQUIRED), ("title", str, REQUIRED)]),
+    "play": ("cmd", []),
+    "pause": ("cmd", []),
+    "stop": ("cmd", []),
+    "volume": ("cmd", [("ch", int, REQUIRED), ("value", float, REQUIRED)]),
+    "mute": ("cmd", [("ch", int, REQUIRED)]),
+    "speed": ("cmd", [("value", float, REQUIRED)]),
+    "scrspeed": ("cmd", [("value", float, REQUIRED), ("dur", float, None), ("curve", str, "lin")]),
+    "seek": ("cmd", [("position", float, REQUIRED), ("snap", str, "off")]),
+    "offset": ("cmd", [("ch", int, REQUIRED), ("seconds", float, REQUIRED)]),
+    "freeze": ("cmd", [("ch", int, REQUIRED)]),
+    "unfreeze": ("cmd", [("ch", int, REQUIRED)]),
+    "xfade": ("cmd", [("value", float, REQUIRED)]),
+    "deckvol": ("cmd", [("target", int, REQUIRED), ("value", float, REQUIRED)]),
+    "add": ("fx", [("ch", int, REQUIRED), ("type", str, REQUIRED), ("y", float, 0.5)]),
+    "rm": ("fx", [("ch", int, REQUIRED), ("id", int, REQUIRED)]),
+    "set": ("fx", [("ch", int, REQUIRED), ("id", int, REQUIRED), ("param", str, REQUIRED), ("value", float, REQUIRED)]),
+    "bypass": ("fx", [("ch", int, REQUIRED), ("id", int, REQUIRED), ("on", bool, True)]),
+    "swap": ("fx", [("ch", int, REQUIRED)]),
+    "send": ("fx", [("ch", int, REQUIRED), ("bus", str, REQUIRED), ("level", float, REQUIRED)]),
+    "bus": ("fx", [("name", str, REQUIRED), ("param", str, REQUIRED), ("value", float, REQUIRED)]),
+}
+OPCODES = list(COMMANDS)
+BUNDLE_OPCODE = 0xFF
+MAX_BUNDLE = 64
+# laufen nicht im Block-Callback: dekodieren, rendern, Tables freigeben
+BUNDLE_FORBIDDEN = ("load", "preload", "freeze", "unfreeze")
+
+# zusaetzliche Pruefungen pro Feld
+CHOICES = {
+    "type": FX_TYPES,
+    "param": ("x", "y"),
+    "curve": CURVES,
+    "snap": ("off", "beat", "bar"),
+    "bus": ("reverb", "delay"),
+    "name": ("reverb", "delay"),
+}
+RANGES = {
+    "ch": (0, 15), # Obergrenze fuer STEM_SLOTS
+    "id": (0, 255),
+    "deck": (0, 255),
+    "target": (0, 255),
+    "position": (0.0, 1.0),
+    "level": (0.0, 1.0),
+    "y": (0.0, 1.0),
+}
+# Bereiche, die vom Befehl abhaengen (z.B. value bei volume vs. speed)
+CMD_RANGES = {
+    "volume": {"value": (0.0, 1.0)},
+    "speed": {"value": (-16.0, 16.0)},
+    "scrspeed": {"value": (-16.0, 16.0), "dur": (0.0, 60.0)},
+    "offset": {"seconds": (-600.0, 600.0)},
+    "xfade": {"value": (0.0, 1.0)},
+    "deckvol": {"value": (0.0, 1.0)},
+    "set": {"value": (0.0, 1.0)},
+    "bus": {"value": (0.0, 1.0)},
+}
+
+class ProtocolError(ValueError):
+    pass
+
+def _check_field(name, ftype, value, cmd=None):
+    if ftype is float:
+        # inf/nan wuerden bis in SigTo/Phasor durchgereicht
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ProtocolError(f"{name}: endliche Zahl erwartet")
+        value = float(value)
+    elif ftype is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ProtocolError(f"{name}: Ganzzahl erwartet")
+    elif ftype is bool:
+        if not isinstance(value, bool):
+            raise ProtocolError(f"{name}: true/false erwartet")
+    elif ftype is str:
+        if not isinstance(value, str) or not value or any(c.isspace() for c in value):
+            raise ProtocolError(f"{name}: Text ohne Leerzeichen erwartet")
+
+    if name in CHOICES and value not in CHOICES[name]:
+        raise ProtocolError(f"{name}: {value!r} nicht in {CHOICES[name]}")
+    ranges = CMD_RANGES.get(cmd, {})
+    if name in ranges or name in RANGES:
+        lo, hi = ranges.get(name) or RANGES[name]
+        if not lo <= value <= hi:
+            raise ProtocolError(f"{name}: {value} ausserhalb {lo}-{hi}")
+    return value
+
+def validate(msg, deck=None):
+    # dict -> geprueftes dict mit allen Feldern (Defaults ergaenzt)
+    if not isinstance(msg, dict):
+        raise ProtocolError("Befehl muss ein Objekt sein")
+    name = msg.get("cmd")
+    if name not in COMMANDS:
+        raise ProtocolError(f"unbekannter Befehl {name!r}")
+    _, fields = COMMANDS[name]
+
+    known = {"cmd", "deck"} | {f[0] for f in fields}
+    unknown = set(msg) - known
+    if unknown:
+        raise ProtocolError(f"{name}: unbekannte Felder {sorted(unknown)}")
+
+    result = {"cmd": name, "deck": _check_field("deck", int, msg.get("deck", deck if deck is not None else 0))}
+    for fname, ftype, default in fields:
+        if fname in msg and msg[fname] is not None:
+            result[fname] = _check_field(fname, ftype, msg[fname], name)
+        elif default is REQUIRED:
+            raise ProtocolError(f"{name}: Feld {fname} fehlt")
+        else:
+            result[fname] = default
+    return result
+
+def _check_bundle(msgs):
+    for msg in msgs:
+        if msg["cmd"] in BUNDLE_FORBIDDEN:
+            raise ProtocolError(f"bundle: {msg['cmd']} nicht erlaubt")
+    return msgs
+
+def parse_json(data):
+    # liefert (ist_bundle, [gepruefte befehle])
+    if isinstance(data, dict) and "bundle" in data:
+        items = data["bundle"]
+        if not isinstance(items, list) or not items or len(items) > MAX_BUNDLE:
+            raise ProtocolError(f"bundle: Liste mit 1-{MAX_BUNDLE} Befehlen erwartet")
+        deck = data.get("deck")
+        return True, _check_bundle([validate(item, deck) for item in items])
+    return False, [validate(data)]
+
+def _fmt(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+def to_legacy(msg):
+    # gepruefter Befehl -> (cmd/fx, "@deck name arg ...")
+    name = msg["cmd"]
+    kind, fields = COMMANDS[name]
+    args = []
+    for fname, _, _ in fields:
+        value = msg[fname]
+        if name == "load" and fname == "play":
+            value = "play" if value else "pause"
+        elif name == "scrspeed" and fname == "dur" and value is None:
+            value = "auto"
+        args.append(_fmt(value))
+    # xfade/deckvol gelten fuer den Mixer, nicht fuer ein Deck
+    prefix = "" if name in ("xfade", "deckvol") else f"@{msg['deck']} "
+    return kind, prefix + " ".join([name] + args)
+
+# --- binaer ---
+
+def _encode_one(msg, out):
+    msg = validate(msg)
+    out += struct.pack("<BB", OPCODES.index(msg["cmd"]), msg["deck"])
+    for fname, ftype, _ in COMMANDS[msg["cmd"]][1]:
+        value = msg[fname]
+        if ftype is float:
+            out += struct.pack("<f", math.nan if value is None else value)
+        elif ftype is int:
+            out += struct.pack("<h", value)
+        elif ftype is bool:
+            out += struct.pack("<B", 1 if value else 0)
+        else:
+            raw = value.encode("utf-8")
+            out += struct.pack("<B", len(raw)) + raw
+
+def encode_binary(data):
+    # fuer Clients: JSON-Form (Befehl oder Bundle) -> bytes
+    out = bytearray()
+    if isinstance(data, dict) and "bundle" in data:
+        deck = data.get("deck")
+        out += struct.pack("<BB", BUNDLE_OPCODE, len(data["bundle"]))
+        for item in data["bundle"]:
+            item = dict(item)
+            if deck is not None:
+                item.setdefault("deck", deck)
+            _encode_one(item, out)
+    else:
+        _encode_one(data, out)
+    return bytes(out)
+
+def _decode_one(data, pos):
+    try:
+        opcode, deck = struct.unpack_from("<BB", data, pos)
+        pos += 2
+        if opcode >= len(OPCODES):
+            raise ProtocolError(f"unbekannter Opcode {opcode}")
+        name = OPCODES[opcode]
+        msg = {"cmd": name, "deck": deck}
+        for fname, ftype, _ in COMMANDS[name][1]:
+            if ftype is float:
+                value = struct.unpack_from("<f", data, pos)[0]
+                # f32 -> kurze Dezimalzahl (1.1 statt 1.100000023841858)
+                msg[fname] = None if math.isnan(value) else float(f"{value:.7g}")
+                pos += 4
+            elif ftype is int:
+                msg[fname] = struct.unpack_from("<h", data, pos)[0]
+                pos += 2
+            elif ftype is bool:
+                msg[fname] = data[pos] != 0
+                pos += 1
+            else:
+                n = data[pos]
+                msg[fname] = bytes(data[pos + 1:pos + 1 + n]).decode("utf-8")
+                if len(msg[fname].encode("utf-8")) != n:
+                    raise ProtocolError(f"{fname}: Text abgeschnitten")
+                pos += 1 + n
+    except (struct.error, IndexError, UnicodeDecodeError):
+        raise ProtocolError("Binaerdaten unvollstaendig")
+    return validate(msg), pos
+
+def parse_binary(data):
+    # liefert (ist_bundle, [gepruefte befehle])
+    if not data:
+        raise ProtocolError("leere Nachricht")
+    if data[0] == BUNDLE_OPCODE:
+        if len(data) < 2 or not 0 < data[1] <= MAX_BUNDLE:
+            raise ProtocolError(f"bundle: 1-{MAX_BUNDLE} Befehle erwartet")
+        pos = 2
+        msgs = []
+        for _ in range(data[1]):
+            msg, pos = _decode_one(data, pos)
+            msgs.append(msg)
+        _check_bundle(msgs)
+        bundle = True
+    else:
+        msg, pos = _decode_one(data, 0)
+        msgs = [msg]
+        bundle = False
+    if pos != len(data):
+        raise ProtocolError("ueberzaehlige Bytes")
+    return bundle, msgs
+
+def parse(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return parse_binary(bytes(data))
+    return parse_json(data)
@@ -0,0 +1,56 @@
+import os
+import json
+import time
+import queue
+import threading
+
+class TrafficRecorder:
+    # Schreibt jedes cmd/fx Event (plus connect/disconnect) als JSON-Zeile mit
+    # Zeitstempel und sid mit, fuer replay.py. Geschrieben wird in einem
+    # eigenen Thread, der Event-Loop legt nur in eine Queue.
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.start_time = time.perf_counter()
+        self.count = 0
+        self.lines = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self.thread.start()
+        print(f"[Recorder] schreibt nach {path}")
+
+    def record(self, sid, event, data=None):
+        self.count += 1
+        self.lines.put({
+            "t": round(time.perf_counter() - self.start_time, 6),
+            "wall": round(time.time(), 6),
+            "sid": sid,
+            "event": event,
+            "data": data,
+        })
+
+    def _run(self):
+        with open(self.path, "a") as f:
+            while True:
+                item = self.lines.get()
+                if item is None:
+                    return
+                f.write(json.dumps(item) + "\n")
+                # nur flushen wenn gerade nichts nachkommt
+                if self.lines.empty():
+                    f.flush()
+
+    def stop(self):
+        self.lines.put(None)
+        self.thread.join(timeout=2)
+        print(f"[Recorder] {self.count} Events in {self.path}")
+
+def read_log(path):
+    # liefert die Events sortiert nach Zeit
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    events.sort(key=lambda e: e["t"])
+    return events
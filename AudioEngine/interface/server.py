@@ -1,10 +1,19 @@
+import asyncio
 import socketio
 from aiohttp import web
+from .tracing import LatencyTracer
+from .protocol import ProtocolError, parse, to_legacy
 
 class AudioSocketServer:
-    def __init__(self, callback_cmd, callback_fx):
+    def __init__(self, callback_cmd, callback_fx, tracer=None, callback_query=None, recorder=None,
+                 callback_bundle=None):
         self.callback_cmd = callback_cmd
         self.callback_fx = callback_fx
+        self.callback_bundle = callback_bundle
+        self.callback_query = callback_query
+        self.tracer = tracer
+        self.recorder = recorder # TrafficRecorder, schreibt alle Events mit
+        self.connect_handlers = [] # async handler(sid), z.B. kompletten State schicken
         
         # Setup Aiohttp & SocketIO
         self.sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins='*')
@@ -13,16 +22,55 @@ class AudioSocketServer:
         
         # Events registrieren
         self._register_events()
+        self._register_routes()
+
+    def _register_routes(self):
+        # HTTP: Latenz-Histogramme pro Befehlstyp
+        async def latency(request):
+            if self.tracer is None:
+                return web.json_response({})
+            return web.json_response(self.tracer.summary())
+
+        self.app.router.add_get('/latency', latency)
+
+    def on_get(self, path, handler):
+        # HTTP GET mit JSON-Antwort, handler() ist synchron (z.B. /stats) und
+        # laeuft im Thread-Pool, damit er den Event-Loop nicht blockiert
+        async def route(request):
+            loop = asyncio.get_running_loop()
+            return web.json_response(await loop.run_in_executor(None, handler))
+
+        self.app.router.add_get(path, route)
+
+    def on_request(self, event, handler):
+        # Anfrage/Antwort Events (z.B. 'peaks'): handler(sid, data) ist async,
+        # das Ergebnis geht als Ack und als gleichnamiges Event zurueck
+        async def on_event(sid, data):
+            try:
+                result = await handler(sid, data)
+            except Exception as e:
+                print(f"[Server] {event} fehlgeschlagen: {e}")
+                result = {"error": str(e)}
+            await self.sio.emit(event, result, to=sid)
+            return result
+
+        self.sio.on(event, on_event)
 
     def _register_events(self):
         
         @self.sio.event
         async def connect(sid, environ):
             print(f"[Server] Client connected: {sid}")
+            if self.recorder is not None:
+                self.recorder.record(sid, "connect")
+            for handler in self.connect_handlers:
+                await handler(sid)
 
         @self.sio.event
         async def disconnect(sid):
             print(f"[Server] Client disconnected: {sid}")
+            if self.recorder is not None:
+                self.recorder.record(sid, "disconnect")
 
         # --- ROUTING DER BEFEHLE ---
 
@@ -31,19 +79,60 @@ class AudioSocketServer:
         # ODER: socket.emit('cmd', {action: 'load', p1: 'Folder', p2: 'Song'})
         @self.sio.on('cmd')
         async def on_cmd(sid, data):
+            trace = LatencyTracer.new_trace()
+            if self.recorder is not None:
+                self.recorder.record(sid, "cmd", data)
             msg = self._parse_to_string(data)
+            LatencyTracer.mark(trace, "parsed")
             print(f"[Server] CMD received: {msg}")
-            # Ruft deine Funktion handle_cmd(cmd) in main.py auf
-            self.callback_cmd(msg)
+
+            # Abfragen (list/info) direkt beantworten: als Ack und als 'library' Event
+            if self.callback_query is not None:
+                result = self.callback_query(msg)
+                if result is not None:
+                    await self.sio.emit('library', result, to=sid)
+                    return result
+
+            # Landet in der CommandQueue, handle_cmd(cmd) laeuft im Control-Thread
+            self.callback_cmd(msg, trace)
 
         # Event: 'fx' -> Leitet an handle_fx_cmd weiter
         # Client sendet: socket.emit('fx', 'add 0 gate')
         @self.sio.on('fx')
         async def on_fx(sid, data):
+            trace = LatencyTracer.new_trace()
+            if self.recorder is not None:
+                self.recorder.record(sid, "fx", data)
             msg = self._parse_to_string(data)
+            LatencyTracer.mark(trace, "parsed")
             print(f"[Server] FX received: {msg}")
-            # Ruft deine Funktion handle_fx_cmd(cmd) in main.py auf
-            self.callback_fx(msg)
+            # Landet in der CommandQueue, handle_fx_cmd(cmd) laeuft im Control-Thread
+            self.callback_fx(msg, trace)
+
+        # Event: 'ctl' -> strukturierte Befehle (JSON oder binaer), siehe protocol.py
+        # Client sendet: socket.emit('ctl', {cmd: 'set', ch: 2, id: 0, param: 'x', value: 0.8})
+        # ODER ein Bundle: socket.emit('ctl', {bundle: [{cmd: 'seek', position: 0.5}, {cmd: 'play'}]})
+        @self.sio.on('ctl')
+        async def on_ctl(sid, data):
+            trace = LatencyTracer.new_trace()
+            if self.recorder is not None:
+                self.recorder.record(sid, "ctl", {"bin": bytes(data).hex()} if isinstance(data, (bytes, bytearray)) else data)
+            try:
+                bundle, msgs = parse(data)
+            except ProtocolError as e:
+                print(f"[Server] CTL ungueltig: {e}")
+                return {"error": str(e)}
+            LatencyTracer.mark(trace, "parsed")
+
+            entries = [to_legacy(msg) for msg in msgs]
+            if bundle:
+                if self.callback_bundle is None:
+                    return {"error": "bundle nicht unterstuetzt"}
+                self.callback_bundle(entries, trace)
+            else:
+                kind, msg = entries[0]
+                (self.callback_cmd if kind == "cmd" else self.callback_fx)(msg, trace)
+            return {"ok": True, "count": len(entries)}
 
     def _parse_to_string(self, data):
         # wenn Input als JSON ankommt
@@ -53,7 +142,11 @@ class AudioSocketServer:
         if isinstance(data, dict):
             # Beispiel: {'action': 'load', 'p1': 'Techno', 'p2': 'Beat'}
             # Wird zu: "load Techno Beat"
-            return " ".join(str(v) for v in data.values())
+            # mit {'deck': 1, ...} -> "@1 load Techno Beat"
+            data = dict(data)
+            deck = data.pop('deck', None)
+            msg = " ".join(str(v) for v in data.values())
+            return msg if deck is None else f"@{deck} {msg}"
         
         return str(data)
 
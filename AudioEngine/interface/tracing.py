@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import deque
+
+class LatencyTracer:
+    # Zeitstempel pro Befehl: Socket-Event -> geparst -> aus der Queue geholt
+    # -> angewendet (z.B. Effect.set_x) -> SigTo hat den Zielwert erreicht.
+    # Pro Befehlstyp werden die letzten Messungen fuer p50/p95/p99 gehalten.
+    STAGES = ["parse", "queue", "apply", "applied", "audible"]
+
+    def __init__(self, window=4096, block_time=0.0):
+        self.window = window
+        # ein Audio-Block bis der neue Wert ueberhaupt gelesen wird
+        self.block_time = block_time
+        self.samples = {} # befehlstyp -> stage -> deque(ms)
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def new_trace():
+        return {"recv": time.perf_counter()}
+
+    @staticmethod
+    def mark(trace, stage):
+        if trace is not None:
+            trace[stage] = time.perf_counter()
+
+    @staticmethod
+    def cmd_type(kind, msg):
+        parts = [p for p in msg.split(maxsplit=2) if not p.startswith("@")]
+        return f"{kind} {parts[0]}" if parts else kind
+
+    def record(self, kind, msg, trace, settle=None):
+        # trace braucht recv, parsed, dequeued, applied
+        if trace is None or "applied" not in trace:
+            return
+        recv = trace["recv"]
+        parsed = trace.get("parsed", recv)
+        dequeued = trace.get("dequeued", parsed)
+        applied = trace["applied"]
+        audible = applied + self.block_time + (settle or 0.0)
+
+        values = {
+            "parse": parsed - recv,
+            "queue": dequeued - parsed,
+            "apply": applied - dequeued,
+            "applied": applied - recv,
+            "audible": audible - recv,
+        }
+
+        key = self.cmd_type(kind, msg)
+        with self.lock:
+            stages = self.samples.get(key)
+            if stages is None:
+                stages = {s: deque(maxlen=self.window) for s in self.STAGES}
+                self.samples[key] = stages
+                self.counts[key] = 0
+            for stage, val in values.items():
+                stages[stage].append(val * 1000)
+            self.counts[key] += 1
+
+    @staticmethod
+    def _percentile(sorted_vals, p):
+        if not sorted_vals:
+            return 0.0
+        idx = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+        return round(sorted_vals[idx], 3)
+
+    def summary(self):
+        with self.lock:
+            snapshot = {k: {s: sorted(v) for s, v in stages.items()} for k, stages in self.samples.items()}
+            counts = dict(self.counts)
+
+        result = {}
+        for key, stages in snapshot.items():
+            result[key] = {"count": counts[key]}
+            for stage, vals in stages.items():
+                result[key][stage] = {
+                    "p50": self._percentile(vals, 50),
+                    "p95": self._percentile(vals, 95),
+                    "p99": self._percentile(vals, 99),
+                }
+        return result
@@ -1,101 +1,198 @@
 import time
+import argparse
 from pathlib import Path
 from config import BASE_PATH 
 from config import SONG_PATH
+from config import CACHE_PATH
+from config import CACHE_MEM_MB
+from config import QUEUE_SIZE
+from config import QUEUE_PERIOD
+from config import FX_POOL_SIZES
+from config import LIBRARY_INDEX
+from config import STATE_RATE
+from config import DECKS
+from config import DECK_PROCESSES
+from config import DECK_RING_BLOCKS
+from config import DECK_PREFILL
+from config import FUSE_EQ
+from config import IDLE_HOLD
+from config import IDLE_THRESHOLD
+from config import STREAM_AFTER
+from config import STREAM_WINDOW
+from config import BUFFERSIZE
+from config import GOVERNOR_POLICY
+from config import GOVERNOR_HIGH
+from config import GOVERNOR_LOW
+from config import GOVERNOR_PERIOD
+from config import GOVERNOR_RECOVER
+from config import SNAPSHOT_FILE
+from config import SNAPSHOT_PERIOD
+from config import BEAT_WORKERS
+from config import STEM_SLOTS
+from config import STEM_RELEASE
 from audio.engine import AudioEngine
-from audio.channel import AudioChannel
+from audio.cache import StemCache
+from audio.session import AudioSession
+from audio.library import SongLibrary
+from audio.waveform import WaveformService
+from audio.beats import BeatService
+from audio.deck import LocalDeck, ProcessDeck, DeckRouter
+from audio.freeze import Freezer
+from audio.monitor import BlockMonitor
+from audio.governor import CpuGovernor
+from audio.snapshot import SnapshotWriter, read_snapshot, restore_commands
 #from interface.cli import AudioShell
 from interface.server import AudioSocketServer
+from interface.dispatch import CommandQueue
+from interface.tracing import LatencyTracer
+from interface.broadcast import StateBroadcaster
+from interface.recorder import TrafficRecorder
+from interface.loopmon import LoopMonitor
 
 def main():
-    # Engine starten
-    engine = AudioEngine()
-    engine.start()
-
-    # Kanaele erstellen
-    channels = [AudioChannel(i) for i in range(4)]
-
-    time.sleep(1)
-    print("\n" * 3)
-
-    # Commandos entgegennehmen
-    def handle_cmd(cmd):
-        cmd_split = cmd.split()
-        print(cmd_split)
-
-        if cmd_split[0] == "load":
-            if len(cmd_split) > 2:
-                parent_path = Path(__file__).parent
-                SONG_PATH = f"{cmd_split[1]}-{cmd_split[2]}"
-                [channels[i].load(f"{parent_path}/{BASE_PATH}/{SONG_PATH}") for i in range(4)]
-
-        elif cmd_split[0] == "play":
-            pass
-
-        elif cmd_split[0] == "volume":
-            if len(cmd_split) > 2:
-                channels[int(cmd_split[1])].set_vol(float(cmd_split[2]))
-
-        elif cmd_split[0] == "mute":
-            if len(cmd_split) > 1:
-                channels[int(cmd_split[1])].toggle_mute()
-
-        elif cmd_split[0] == "speed":
-            if len(cmd_split) > 1:
-                [channels[i].set_speed(float(cmd_split[1])) for i in range(4)]
-
-        elif cmd_split[0] == "scrspeed":
-            if len(cmd_split) > 1:
-                [channels[i].scrub_speed(float(cmd_split[1])) for i in range(4)]
+    parser = argparse.ArgumentParser(description="Audio-Engine mit Socket-Server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--headless", action="store_true", help="ohne Soundkarte, Blocks im Echtzeit-Takt (fuer replay.py)")
+    parser.add_argument("--record", metavar="DATEI", help="alle cmd/fx Events als JSON-Zeilen mitschreiben")
+    parser.add_argument("--restore", action="store_true", help="letzten Snapshot wiederherstellen (Warmstart)")
+    args = parser.parse_args()
+    start_time = time.perf_counter()
 
-        elif cmd_split[0] == "seek":
-            if len(cmd_split) > 1:
-                [channels[i].seek(float(cmd_split[1])) for i in range(4)]
-
-        elif cmd_split[0] == "phase":
-            [channels[i].get_phasor_phase() for i in range(4)]
-
-        return
-    
-    def handle_fx_cmd(cmd):
-        cmd_split = cmd.split()
-        if len(cmd_split) <= 1: return
-
-        print(cmd_split)
-        ch_index = int(cmd_split[1])
-        if cmd_split[0] == "set":
-            if len(cmd_split) > 4:
-                channels[ch_index].effect_set(int(cmd_split[2]), cmd_split[3], float(cmd_split[4]))
-
-        elif cmd_split[0] == "add":
-            if len(cmd_split) > 3:
-                channels[ch_index].effect_add(cmd_split[2], cmd_split[3])
-
-        elif cmd_split[0] == "rm":
-            if len(cmd_split) > 2:
-                channels[ch_index].effect_rm(int(cmd_split[2]))
-
-        elif cmd_split[0] == "swap":
-            channels[ch_index].effect_swap()
-
-        elif cmd_split[0] == "print":
-            channels[ch_index].effects_print()
+    # Engine starten
+    if args.headless:
+        engine = AudioEngine(buffersize=BUFFERSIZE, audio="manual")
+        engine.start()
+        engine.start_clock()
+    else:
+        engine = AudioEngine(buffersize=BUFFERSIZE)
+        engine.start()
+
+    # Cache fuer dekodierte Stems
+    parent_path = Path(__file__).parent
+    cache = StemCache(f"{parent_path}/{CACHE_PATH}", CACHE_MEM_MB, engine.server.getSamplingRate())
+
+    # Song-Index einmal im Hintergrund aktualisieren
+    library = SongLibrary(f"{parent_path}/{BASE_PATH}", f"{parent_path}/{BASE_PATH}/{LIBRARY_INDEX}")
+
+    # Waveform-Uebersichten, werden im Process-Pool berechnet
+    waveform = WaveformService(cache, f"{parent_path}/{BASE_PATH}")
+
+    # BPM/Beat-Raster: neue Songs nach jedem Scan, geladene Songs sofort
+    beats = BeatService(cache, workers=BEAT_WORKERS)
+    library.listeners.append(beats.prepare_many)
+    library.scan_async()
+
+    # Decks: Kanaele, Transport und Befehle, je nach Config im eigenen Prozess
+    song_base = f"{parent_path}/{BASE_PATH}"
+    freezer = Freezer(engine, cache, {
+        "sr": engine.sr,
+        "buffersize": engine.buffersize,
+        "cache_path": f"{parent_path}/{CACHE_PATH}",
+        "cache_mem_mb": CACHE_MEM_MB,
+    })
+    decks = []
+    for i in range(DECKS):
+        if DECK_PROCESSES:
+            decks.append(ProcessDeck(i, {
+                "sr": engine.sr,
+                "buffersize": engine.buffersize,
+                "cache_path": f"{parent_path}/{CACHE_PATH}",
+                "cache_mem_mb": CACHE_MEM_MB,
+                "song_base": song_base,
+                "pool_sizes": FX_POOL_SIZES,
+                "fuse_eq": FUSE_EQ,
+                "idle_hold": IDLE_HOLD,
+                "idle_threshold": IDLE_THRESHOLD,
+                "stream_after": STREAM_AFTER,
+                "stream_window": STREAM_WINDOW,
+                "stem_slots": STEM_SLOTS,
+                "stem_release": STEM_RELEASE,
+                "ring_blocks": DECK_RING_BLOCKS,
+                "prefill": DECK_PREFILL,
+                "state_rate": STATE_RATE,
+            }))
+        else:
+            session = AudioSession(engine, cache, song_base, pool_sizes=FX_POOL_SIZES,
+                                   library=library, waveform=waveform, freezer=freezer,
+                                   fuse_eq=FUSE_EQ, idle_hold=IDLE_HOLD, idle_threshold=IDLE_THRESHOLD,
+                                   stream_after=STREAM_AFTER, stream_window=STREAM_WINDOW, beats=beats,
+                                   stem_slots=STEM_SLOTS, stem_release=STEM_RELEASE)
+            decks.append(LocalDeck(i, session))
+
+    router = DeckRouter(decks, library, waveform, song_base, engine, beats)
+    engine.block_listeners.append(router.tick)
+    # Rechenzeit pro Block gegen die Deadline
+    monitor = BlockMonitor(engine)
+    engine.block_listeners.append(monitor)
+
+    if not args.restore:
+        time.sleep(1)
+        print("\n" * 3)
 
-    
     # Fuer testzwecke: CLI aktivieren
-   #cli = AudioShell(handle_cmd, handle_fx_cmd)
+   #cli = AudioShell(router.handle_cmd, router.handle_fx_cmd)
    #try:
    #    cli.cmdloop()
    #except KeyboardInterrupt:
    #    pass
 
-    server = AudioSocketServer(handle_cmd, handle_fx_cmd)
+    # Befehle laufen ueber die Queue im Control-Thread, nicht im Event-Loop
+    # Latenz pro Befehlstyp, abrufbar unter http://<host>:8080/latency
+    tracer = LatencyTracer(block_time=engine.buffersize / engine.sr)
+    queue = CommandQueue(router.handle_cmd, router.handle_fx_cmd, maxsize=QUEUE_SIZE, period=QUEUE_PERIOD, tracer=tracer,
+                         callback_bundle=router.handle_bundle)
+    router.set_queue(queue)
+    queue.start()
+
+    # bei Ueberlast Ketten einfrieren/umgehen, abrufbar unter /engine und im State
+    governor = CpuGovernor(monitor, decks, queue, GOVERNOR_POLICY, high=GOVERNOR_HIGH, low=GOVERNOR_LOW,
+                           period=GOVERNOR_PERIOD, recover=GOVERNOR_RECOVER)
+    governor.start()
+
+    # Warmstart: Befehle aus dem letzten Snapshot vor allen Client-Befehlen einreihen
+    snapshot_path = f"{parent_path}/{SNAPSHOT_FILE}"
+    if args.restore:
+        snapshot = read_snapshot(snapshot_path)
+        if snapshot is not None:
+            commands = restore_commands(snapshot)
+            for kind, msg in commands:
+                queue.put(kind, msg)
+            print(f"[Snapshot] {len(commands)} Befehle aus Snapshot von vor {time.time() - snapshot['time']:.1f}s, "
+                  f"eingereiht nach {(time.perf_counter() - start_time) * 1000:.0f} ms")
+    snapshots = SnapshotWriter(router.get_state, snapshot_path, period=SNAPSHOT_PERIOD)
+    snapshots.start(delay=5.0 if args.restore else 0.0)
+
+    recorder = TrafficRecorder(args.record) if args.record else None
+    server = AudioSocketServer(queue.put_cmd, queue.put_fx, tracer, router.handle_query, recorder, queue.put_bundle)
+    server.on_request('peaks', waveform.handle_request)
+    # Objekte/Speicher pro Kanal und Effekt, abrufbar unter http://<host>:8080/stats
+    server.on_get('/stats', router.stats)
+    # fuer replay.py: Queue-Tiefe und Event-Loop-Verzoegerung
+    loop_monitor = LoopMonitor()
+    server.on_get('/queue', queue.stats)
+    server.on_get('/loop', loop_monitor.summary)
+    server.on_get('/engine', governor.get_state)
+    server.app.on_startup.append(loop_monitor.start)
+    server.app.on_cleanup.append(loop_monitor.stop)
+
+    # Position/Engine-State an alle Clients, Deltas mit fester Rate
+    broadcaster = StateBroadcaster(server.sio, lambda: dict(router.get_state(), engine=governor.get_state()),
+                                   STATE_RATE)
+    server.connect_handlers.append(broadcaster.send_full)
+    server.app.on_startup.append(broadcaster.start)
+    server.app.on_cleanup.append(broadcaster.stop)
     try:
-        server.start(port=8080)
+        server.start(port=args.port)
     except KeyboardInterrupt:
         print("\nEngine stoppen...")
     
+    if recorder is not None:
+        recorder.stop()
+    snapshots.stop()
+    governor.stop()
+    queue.stop()
+    router.stop()
     engine.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
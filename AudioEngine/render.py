@@ -0,0 +1,90 @@
+import sys
+import argparse
+from pathlib import Path
+from config import BASE_PATH
+from config import CACHE_PATH
+from config import CACHE_MEM_MB
+from config import FX_POOL_SIZES
+from audio.engine import AudioEngine
+from audio.cache import StemCache
+from audio.session import AudioSession
+
+# Offline-Render: Song + Skript mit zeitgestempelten cmd/fx Befehlen -> WAV
+#
+# Skriptformat (eine Zeile pro Befehl, # fuer Kommentare):
+#   0.0   cmd speed 1.0
+#   4.5   fx  add 2 gate 0.5
+#   6.0   fx  set 2 0 x 0.8
+#   10.0  cmd seek 0.25
+
+def parse_script(path):
+    events = []
+    with open(path) as f:
+        for line_nr, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split(maxsplit=2)
+            if len(parts) < 3 or parts[1] not in ("cmd", "fx"):
+                print(f"[Render] Zeile {line_nr} ignoriert: {line}")
+                continue
+            events.append((float(parts[0]), parts[1], parts[2]))
+    events.sort(key=lambda e: e[0])
+    return events
+
+class ScriptPlayer:
+    # arbeitet das Skript blockgenau im Audio-Callback ab
+    def __init__(self, engine, session, events):
+        self.engine = engine
+        self.session = session
+        self.events = events
+        self.next = 0
+
+    def __call__(self):
+        now = self.engine.block_time()
+        while self.next < len(self.events) and self.events[self.next][0] <= now:
+            _, kind, msg = self.events[self.next]
+            if kind == "cmd":
+                self.session.handle_cmd(msg)
+            else:
+                self.session.handle_fx_cmd(msg)
+            self.next += 1
+
+def render(artist, title, script, out, dur=None, sr=44100, buffersize=256):
+    engine = AudioEngine(sr=sr, buffersize=buffersize, audio="offline")
+    engine.boot()
+
+    parent_path = Path(__file__).parent
+    cache = StemCache(f"{parent_path}/{CACHE_PATH}", CACHE_MEM_MB, sr)
+    session = AudioSession(engine, cache, f"{parent_path}/{BASE_PATH}", sync=True, pool_sizes=FX_POOL_SIZES,
+                           idle_hold=None) # Render soll auch leise Fahnen vollstaendig enthalten
+    session.loader.load_now(session.song_path(artist, title))
+
+    events = parse_script(script) if script else []
+    engine.block_listeners.append(ScriptPlayer(engine, session, events))
+
+    if dur is None:
+        dur = session.transport.duration
+    if dur <= 0:
+        print("[Render] Dauer unbekannt, Song nicht geladen?")
+        return None
+
+    print(f"[Render] {artist}-{title}: {dur:.1f}s -> {out}")
+    wall = engine.render(dur, out)
+    factor = dur / wall if wall > 0 else float("inf")
+    print(f"[Render] fertig in {wall:.2f}s, Realtime-Faktor {factor:.1f}x")
+    return factor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Song offline mit Befehlsskript rendern")
+    parser.add_argument("artist")
+    parser.add_argument("title")
+    parser.add_argument("out", help="WAV-Datei")
+    parser.add_argument("--script", help="Datei mit zeitgestempelten cmd/fx Befehlen")
+    parser.add_argument("--dur", type=float, help="Dauer in Sekunden (Standard: Songlaenge)")
+    parser.add_argument("--sr", type=int, default=44100)
+    parser.add_argument("--buffer", type=int, default=256)
+    args = parser.parse_args()
+
+    factor = render(args.artist, args.title, args.script, args.out, args.dur, args.sr, args.buffer)
+    sys.exit(0 if factor is not None else 1)
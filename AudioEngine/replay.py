@@ -0,0 +1,197 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from interface.recorder import read_log
+
+# Last-Test: spielt mit main.py --record aufgezeichnete cmd/fx Events gegen
+# einen laufenden Server (am besten headless) zurueck. Jede aufgezeichnete sid
+# wird zu einem Strom, --clients simulierte Clients verteilen sich reihum auf
+# die Stroeme. Gemessen werden Durchsatz, Queue-Tiefe, Event-Loop-Lag des
+# Servers, Ack-Roundtrip und die Befehlslatenz aus /latency.
+#
+#   python main.py --headless --port 8080
+#   python replay.py show.jsonl --speed 1 --clients 4
+#   python replay.py show.jsonl --speed 0 --clients 32 --repeat 5 --out replay.json
+#
+# --speed 1 = Echtzeit, N = N-fach, 0 = so schnell wie moeglich
+
+def split_streams(events):
+    streams = {}
+    for e in events:
+        if e["event"] in ("cmd", "fx", "ctl"):
+            streams.setdefault(e["sid"], []).append(e)
+    return list(streams.values())
+
+def percentiles(vals):
+    vals = sorted(vals)
+    if not vals:
+        return {}
+    pick = lambda p: round(vals[min(len(vals) - 1, int(round(p / 100 * (len(vals) - 1))))], 3)
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": round(vals[-1], 3)}
+
+class ReplayStats:
+    def __init__(self):
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.rtt = [] # ms
+        self.samples = [] # Server-Zustand waehrend des Replays
+
+async def run_client(url, stream, speed, repeat, origin, start, stats):
+    import socketio
+    loop = asyncio.get_running_loop()
+    sio = socketio.AsyncClient(reconnection=False)
+    try:
+        await sio.connect(url, transports=["websocket"])
+    except Exception as e:
+        print(f"[Replay] Verbindung fehlgeschlagen: {e}")
+        stats.errors += 1
+        return
+
+    span = (stream[-1]["t"] - origin) if stream else 0
+    for r in range(repeat):
+        for e in stream:
+            if speed > 0:
+                due = start + (r * span + e["t"] - origin) / speed
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            sent = time.perf_counter()
+
+            def ack(*_, sent=sent):
+                stats.acked += 1
+                stats.rtt.append((time.perf_counter() - sent) * 1000)
+
+            data = e["data"]
+            if isinstance(data, dict) and "bin" in data:
+                # binaere ctl-Nachricht, im Log als Hex
+                data = bytes.fromhex(data["bin"])
+            try:
+                await sio.emit(e["event"], data, callback=ack)
+                stats.sent += 1
+            except Exception:
+                stats.errors += 1
+
+    # auf ausstehende Acks warten
+    deadline = loop.time() + 5
+    while stats.acked < stats.sent and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    await sio.disconnect()
+
+async def poll_server(session, url, stats, done, period=0.25):
+    while not done.is_set():
+        try:
+            async with session.get(f"{url}/queue") as resp:
+                q = await resp.json()
+            async with session.get(f"{url}/loop") as resp:
+                lag = await resp.json()
+            stats.samples.append({"t": time.perf_counter(), "queue": q, "loop": lag})
+        except Exception as e:
+            print(f"[Replay] Server-Abfrage fehlgeschlagen: {e}")
+        try:
+            await asyncio.wait_for(done.wait(), period)
+        except asyncio.TimeoutError:
+            pass
+
+async def replay(log_file, url, speed, clients, repeat):
+    import aiohttp
+
+    events = read_log(log_file)
+    streams = split_streams(events)
+    if not streams:
+        print("[Replay] keine cmd/fx Events im Log")
+        return None
+    origin = min(s[0]["t"] for s in streams)
+    print(f"[Replay] {sum(len(s) for s in streams)} Events aus {len(streams)} Clients, "
+          f"{clients} simulierte Clients, Speed {speed or 'max'}, {repeat}x")
+
+    stats = ReplayStats()
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    async with aiohttp.ClientSession() as session:
+        poller = asyncio.create_task(poll_server(session, url, stats, done))
+        deadline = loop.time() + 5
+        while not stats.samples and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if not stats.samples:
+            print(f"[Replay] {url} antwortet nicht auf /queue")
+            done.set()
+            await poller
+            return None
+        first = stats.samples[0]["queue"]
+
+        t_start = time.perf_counter()
+        start = loop.time() + 0.5 # alle Clients verbinden lassen
+        await asyncio.gather(*(run_client(url, streams[i % len(streams)], speed, repeat, origin, start, stats)
+                               for i in range(clients)))
+        # Queue leerlaufen lassen (hoechstens 30 s)
+        deadline = loop.time() + 30
+        while stats.samples[-1]["queue"]["depth"] > 0 and loop.time() < deadline:
+            await asyncio.sleep(0.25)
+        duration = time.perf_counter() - t_start - 0.5
+        done.set()
+        await poller
+
+        async with session.get(f"{url}/latency") as resp:
+            latency = await resp.json()
+
+    last = stats.samples[-1]["queue"]
+    depths = [s["queue"]["depth"] for s in stats.samples]
+    lag_p99 = [s["loop"].get("p99", 0) for s in stats.samples]
+    applied = last["applied"] - first["applied"]
+    return {
+        "events": stats.sent,
+        "errors": stats.errors,
+        "duration_s": round(duration, 3),
+        "send_rate": round(stats.sent / duration, 1) if duration > 0 else 0,
+        "apply_rate": round(applied / duration, 1) if duration > 0 else 0,
+        "queue": {
+            "max_depth": max(depths),
+            "final_depth": depths[-1],
+            "merged": last["merged"] - first["merged"],
+            "dropped": last["dropped"] - first["dropped"],
+        },
+        "loop_lag_ms": {"max_p99": max(lag_p99), "max": stats.samples[-1]["loop"].get("max", 0)},
+        "ack_ms": percentiles(stats.rtt),
+        "latency": latency,
+    }
+
+def print_report(r):
+    print(f"[Replay] {r['events']} Events in {r['duration_s']}s: gesendet {r['send_rate']}/s, "
+          f"angewendet {r['apply_rate']}/s, Fehler: {r['errors']}")
+    q = r["queue"]
+    print(f"[Replay] Queue: max {q['max_depth']}, zusammengefasst {q['merged']}, verworfen {q['dropped']}")
+    print(f"[Replay] Event-Loop-Lag: p99 bis {r['loop_lag_ms']['max_p99']} ms, max {r['loop_lag_ms']['max']} ms")
+    if r["ack_ms"]:
+        a = r["ack_ms"]
+        print(f"[Replay] Ack-Roundtrip: p50 {a['p50']} ms, p99 {a['p99']} ms, max {a['max']} ms")
+    for cmd_type, st in sorted(r["latency"].items()):
+        print(f"\t{cmd_type:<14} n={st['count']:<6} applied p50 {st['applied']['p50']} / p99 {st['applied']['p99']} ms, "
+              f"audible p99 {st['audible']['p99']} ms")
+    if q["dropped"] or r["errors"]:
+        print("[Replay] Server ist ueberlastet (verworfene Befehle oder Fehler)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aufgezeichneten Socket-Verkehr gegen einen Server abspielen")
+    parser.add_argument("log", help="JSON-Zeilen von main.py --record")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = Echtzeit, 0 = so schnell wie moeglich")
+    parser.add_argument("--clients", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Log so oft hintereinander abspielen")
+    parser.add_argument("--out", help="Bericht als JSON speichern")
+    args = parser.parse_args()
+
+    report = asyncio.run(replay(args.log, args.url, args.speed, args.clients, args.repeat))
+    if report is None:
+        sys.exit(1)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Replay] Bericht in {args.out}")
+
+if __name__ == "__main__":
+    main()
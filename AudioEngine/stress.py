@@ -0,0 +1,123 @@
+import sys
+import random
+import argparse
+from config import FX_POOL_SIZES
+
+# Stress-Test fuer Effekt-Churn: tausende add/rm/swap/set Zyklen auf vier
+# Kanaelen, danach muss die Zahl der pyo-Objekte wieder auf dem Stand nach
+# dem Aufwaermen sein und der RSS darf nur um --tolerance MB gewachsen sein.
+# Der Server laeuft im manual-Modus, pro Zyklus wird ein Block gerechnet.
+#
+#   python stress.py --cycles 5000
+#   python stress.py --cycles 20000 --depth 6 --tolerance 4
+
+FX_TYPES = ["lowcut", "hicut", "lowboost", "hiboost", "gate", "crush", "flanger", "reverb", "delay",
+            "beatgate", "beatdelay"]
+
+def clear(channels):
+    for ch in channels:
+        while ch.effects:
+            ch.effect_rm(len(ch.effects) - 1)
+
+def saturate(channels, depth):
+    # jeden Pool-Typ und die EQ-Kaskaden einmal auf Maximalgroesse bringen,
+    # damit spaeteres Nachbauen nicht als Leak zaehlt
+    patterns = [[fx_type] * depth for fx_type in FX_TYPES]
+    patterns.append([["lowcut", "hicut", "gate"][i % 3] for i in range(depth)])
+    for chain in patterns:
+        for ch in channels:
+            for fx_type in chain:
+                ch.effect_add(fx_type, 0.5)
+        clear(channels)
+
+def churn(channels, rng, depth):
+    ch = rng.choice(channels)
+    n = len(ch.effects)
+    action = rng.random()
+    if n < depth and action < 0.45:
+        ch.effect_add(rng.choice(FX_TYPES), rng.random())
+    elif n > 0 and action < 0.8:
+        ch.effect_rm(rng.randrange(n))
+    elif n == 2 and action < 0.9:
+        ch.effect_swap()
+    elif n > 0:
+        ch.effect_set(rng.randrange(n), rng.choice("xy"), rng.random())
+
+def run(cycles, depth, warmup, tolerance, seed, sr=44100, buffersize=256):
+    import numpy as np
+    from audio.engine import AudioEngine
+    from audio.channel import AudioChannel
+    from audio.ramp import SpeedRamp
+    from audio.transport import Transport
+    from audio.stats import live_objects, rss_mb
+    from pyo import DataTable
+
+    engine = AudioEngine(sr=sr, buffersize=buffersize, audio="manual")
+    engine.start()
+
+    ramp = SpeedRamp(1.0)
+    transport = Transport(ramp.sig)
+    channels = [AudioChannel(i, None, transport, FX_POOL_SIZES) for i in range(4)]
+
+    frames = sr * 2
+    transport.set_duration(frames / sr)
+    noise = np.random.default_rng(seed).uniform(-0.5, 0.5, frames)
+    for ch in channels:
+        table = DataTable(size=frames, chnls=2)
+        for c in range(2):
+            np.asarray(table.getBuffer(c))[:frames] = noise
+        ch.swap_table(table, frames / sr)
+
+    rng = random.Random(seed)
+
+    # Aufwaermen: Pool und Kaskaden wachsen auf ihre Maximalgroesse
+    saturate(channels, depth)
+    for _ in range(warmup):
+        churn(channels, rng, depth)
+        engine.server.process()
+    clear(channels)
+    engine.server.process()
+    base = live_objects()
+    base_rss = rss_mb()
+    print(f"[Stress] Basis: {base['objects']} pyo-Objekte, RSS {base_rss} MB")
+
+    report_every = max(1, cycles // 10)
+    for i in range(1, cycles + 1):
+        churn(channels, rng, depth)
+        engine.server.process()
+        if i % report_every == 0:
+            print(f"[Stress] {i}/{cycles}: RSS {rss_mb()} MB")
+
+    clear(channels)
+    engine.server.process()
+    end = live_objects()
+    end_rss = rss_mb()
+    engine.stop()
+
+    grown = end["objects"] - base["objects"]
+    rss_diff = end_rss - base_rss
+    print(f"[Stress] Ende: {end['objects']} pyo-Objekte ({grown:+d}), RSS {end_rss} MB ({rss_diff:+.1f} MB)")
+    if grown > 0:
+        for name, n in end["by_type"].items():
+            diff = n - base["by_type"].get(name, 0)
+            if diff:
+                print(f"\t{name}: {diff:+d}")
+
+    ok = grown <= 0 and rss_diff <= tolerance
+    print(f"[Stress] {'OK' if ok else 'LEAK'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Effekt add/rm Zyklen und Speicher gegen Basis pruefen")
+    parser.add_argument("--cycles", type=int, default=5000)
+    parser.add_argument("--depth", type=int, default=4, help="maximale Effekte pro Kanal")
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--tolerance", type=float, default=8.0, help="erlaubtes RSS-Wachstum in MB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = run(args.cycles, args.depth, args.warmup, args.tolerance, args.seed)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests laufen gegen die Module in AudioEngine/ (audio, interface)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
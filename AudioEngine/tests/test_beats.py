@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from audio.beats import BeatGrid, HOP, estimate_period
+
+def test_snap_keeps_phase_to_beat():
+    grid = BeatGrid(120.0, np.arange(0, 20, 0.5), np.arange(0, 20, 2.0))
+    # Kopf 0.1 s hinter einem Beat -> Ziel landet 0.1 s hinter dem naechsten Beat
+    assert grid.snap(5.2, 3.1) == pytest.approx(5.1)
+    # Takt: naechster Downbeat 6.0, Kopf 1.1 s hinter dem Downbeat 2.0
+    assert grid.snap(5.2, 3.1, unit="bar") == pytest.approx(7.1)
+    assert grid.first_beat == 0.0
+
+def test_snap_without_grid():
+    grid = BeatGrid(0.0, np.zeros(0), np.zeros(0))
+    assert grid.snap(3.3, 1.0) == 3.3
+    assert grid.first_beat == 0.0
+
+def test_estimate_period_finds_tempo():
+    sr = 44100
+    fps = sr / HOP
+    for bpm in (96.0, 120.0, 128.0):
+        onset = np.zeros(int(fps * 30))
+        period = fps * 60 / bpm
+        onset[(np.arange(int(len(onset) / period)) * period).astype(int)] = 1.0
+        lag = estimate_period(onset, fps)
+        assert 60 * fps / lag == pytest.approx(bpm, rel=0.02)
+
+def test_estimate_period_too_short():
+    assert estimate_period(np.ones(10), 86.0) is None
@@ -0,0 +1,71 @@
+import threading
+from interface.dispatch import CommandQueue
+
+def make_queue(**kwargs):
+    return CommandQueue(lambda msg: None, lambda msg: None, **kwargs)
+
+def messages(queue):
+    return [(kind, msg) for kind, msg, _ in queue.entries]
+
+def test_coalesces_per_target():
+    q = make_queue()
+    q.put_fx("set 0 1 x 0.1")
+    q.put_fx("set 0 1 y 0.2")
+    q.put_fx("set 0 1 x 0.3")
+    q.put_cmd("volume 2 0.4")
+    q.put_cmd("volume 2 0.5")
+    assert messages(q) == [("fx", "set 0 1 x 0.3"), ("fx", "set 0 1 y 0.2"), ("cmd", "volume 2 0.5")]
+    assert q.merged == 2
+
+def test_deck_prefix_is_part_of_target():
+    q = make_queue()
+    q.put_cmd("@0 seek 0.1")
+    q.put_cmd("@1 seek 0.2")
+    q.put_cmd("seek 0.3") # ohne Prefix -> Deck 0
+    assert messages(q) == [("cmd", "seek 0.3"), ("cmd", "@1 seek 0.2")]
+
+def test_barriers_stop_coalescing():
+    q = make_queue()
+    q.put_cmd("speed 1.0")
+    q.put_fx("add 0 reverb 0.5")
+    q.put_cmd("speed 1.2")
+    q.put_bundle([("cmd", "@0 play")])
+    q.put_cmd("speed 1.4")
+    assert [msg for _, msg in messages(q)] == ["speed 1.0", "add 0 reverb 0.5", "speed 1.2",
+                                                [("cmd", "@0 play")], "speed 1.4"]
+    assert q.merged == 0
+
+def test_drops_when_full():
+    q = make_queue(maxsize=2)
+    assert q.put_cmd("play")
+    assert q.put_cmd("pause")
+    assert not q.put_cmd("stop")
+    # zusammengefasst wird auch bei voller Queue
+    q2 = make_queue(maxsize=1)
+    assert q2.put_cmd("speed 1")
+    assert q2.put_cmd("speed 2")
+    assert q.dropped == 1 and q2.dropped == 0
+
+def test_runs_in_order_on_control_thread():
+    seen = []
+    done = threading.Event()
+
+    def on_cmd(msg):
+        seen.append(("cmd", msg))
+        if msg == "stop":
+            done.set()
+
+    q = CommandQueue(on_cmd, lambda msg: seen.append(("fx", msg)), period=0.001,
+                     callback_bundle=lambda entries: seen.append(("bundle", entries)))
+    q.put_cmd("play")
+    q.put_bundle([("fx", "@0 add 0 gate 0.5")])
+    q.put_fx("set 0 0 x 0.7")
+    q.put_cmd("stop")
+    q.start()
+    try:
+        assert done.wait(timeout=2)
+    finally:
+        q.stop()
+    assert seen == [("cmd", "play"), ("bundle", [("fx", "@0 add 0 gate 0.5")]), ("fx", "set 0 0 x 0.7"),
+                    ("cmd", "stop")]
+    assert q.stats()["applied"] == 4
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("pyo") # SongLibrary liest Stem-Header mit pyo.sndinfo
+from audio.library import SongLibrary
+
+@pytest.fixture
+def library(tmp_path):
+    lib = SongLibrary(str(tmp_path), str(tmp_path / ".library.json"))
+    for name in ("B-two", "A-one", "C-three"):
+        artist, title = name.split("-")
+        lib.songs[name] = {"artist": artist, "title": title, "duration": 1.0, "valid": True}
+    return lib
+
+def test_not_a_query(library):
+    assert library.handle_query("") is None
+    assert library.handle_query("play") is None
+    assert library.handle_query("info A") is None
+
+def test_list_sorted_and_paged(library):
+    result = library.handle_query("list 1 1")
+    assert result["type"] == "list"
+    assert result["offset"] == 1 and result["total"] == 3
+    assert [s["title"] for s in result["songs"]] == ["two"]
+    assert len(library.handle_query("list")["songs"]) == 3
+
+@pytest.mark.parametrize("query", ["list x", "list 0 y", "list -1", "list 0 -5"])
+def test_list_bad_arguments(library, query):
+    assert "error" in library.handle_query(query)
+
+def test_info(library):
+    assert library.handle_query("info A one")["title"] == "one"
+    assert "error" in library.handle_query("info A missing")
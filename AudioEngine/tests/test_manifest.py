@@ -0,0 +1,43 @@
+import json
+import pytest
+from audio.manifest import MANIFEST, DEFAULT_STEMS, read_manifest, stem_file, drum_stem
+
+def write(tmp_path, data):
+    path = tmp_path / MANIFEST
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+
+def test_default_without_manifest(tmp_path):
+    stems = read_manifest(str(tmp_path))
+    assert [s["name"] for s in stems] == DEFAULT_STEMS
+    assert drum_stem(stems)["file"] == "Drums.mp3"
+
+def test_reads_manifest_in_order(tmp_path):
+    write(tmp_path, {"stems": [{"name": "Vox", "file": "vox.flac"},
+                               {"name": "Beat", "file": "beat.wav", "role": "drums"}]})
+    stems = read_manifest(str(tmp_path))
+    assert [s["name"] for s in stems] == ["Vox", "Beat"]
+    assert stems[0]["role"] is None
+    assert stem_file(str(tmp_path), drum_stem(stems)) == str(tmp_path / "beat.wav")
+
+def test_no_drums(tmp_path):
+    write(tmp_path, {"stems": [{"name": "Vox", "file": "vox.flac"}]})
+    assert drum_stem(read_manifest(str(tmp_path))) is None
+
+@pytest.mark.parametrize("data", [
+    "{kaputt",
+    [],
+    {"stems": []},
+    {"stems": "a"},
+    {"stems": ["Vox"]},
+    {"stems": [{"name": "", "file": "a.wav"}]},
+    {"stems": [{"name": "Lead Vox", "file": "a.wav"}]},
+    {"stems": [{"name": "Vox", "file": "../a.wav"}]},
+    {"stems": [{"name": "Vox", "file": "sub/a.wav"}]},
+    {"stems": [{"name": "Vox", "file": ".hidden.wav"}]},
+    {"stems": [{"name": "Vox"}]},
+    {"stems": [{"name": "Vox", "file": "a.wav"}, {"name": "Vox", "file": "b.wav"}]},
+])
+def test_invalid_manifest(tmp_path, data):
+    write(tmp_path, data)
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
@@ -0,0 +1,73 @@
+import math
+import pytest
+from interface.protocol import ProtocolError, parse, encode_binary, to_legacy, BUNDLE_FORBIDDEN
+
+def test_json_defaults_and_legacy():
+    bundle, msgs = parse({"cmd": "add", "ch": 1, "type": "reverb"})
+    assert not bundle
+    assert msgs == [{"cmd": "add", "deck": 0, "ch": 1, "type": "reverb", "y": 0.5}]
+    assert to_legacy(msgs[0]) == ("fx", "@0 add 1 reverb 0.5")
+
+def test_legacy_special_fields():
+    _, [load] = parse({"cmd": "load", "artist": "A", "title": "B", "play": False})
+    assert to_legacy(load) == ("cmd", "@0 load A B 0.0 pause")
+    _, [scr] = parse({"cmd": "scrspeed", "value": -1.0})
+    assert to_legacy(scr) == ("cmd", "@0 scrspeed -1.0 auto lin")
+    _, [xfade] = parse({"cmd": "xfade", "value": 0.5, "deck": 1})
+    assert to_legacy(xfade) == ("cmd", "xfade 0.5")
+
+@pytest.mark.parametrize("msg", [
+    {"cmd": "set", "ch": 2, "id": 0, "param": "x", "value": 0.8, "deck": 1},
+    {"cmd": "scrspeed", "value": 1.1, "curve": "exp"},
+    {"cmd": "load", "artist": "Kanyeé", "title": "Flashing", "position": 0.25, "play": True},
+    {"bundle": [{"cmd": "seek", "position": 0.25, "snap": "bar"}, {"cmd": "speed", "value": 1.1}], "deck": 3},
+])
+def test_binary_round_trip(msg):
+    assert parse(encode_binary(msg)) == parse(msg)
+
+def test_binary_keeps_unset_float():
+    _, [msg] = parse(encode_binary({"cmd": "scrspeed", "value": 2.0}))
+    assert msg["dur"] is None
+
+@pytest.mark.parametrize("msg", [
+    {"cmd": "nope"},
+    {"cmd": "volume", "ch": 1},
+    {"cmd": "volume", "ch": 1, "value": 0.5, "extra": 1},
+    {"cmd": "volume", "ch": 16, "value": 0.5},
+    {"cmd": "volume", "ch": True, "value": 0.5},
+    {"cmd": "volume", "ch": 1, "value": math.inf},
+    {"cmd": "volume", "ch": 1, "value": 1.5},
+    {"cmd": "speed", "value": 1e308},
+    {"cmd": "speed", "value": math.nan},
+    {"cmd": "set", "ch": 0, "id": 0, "param": "z", "value": 0.5},
+    {"cmd": "add", "ch": 0, "type": "chorus"},
+    {"cmd": "load", "artist": "two words", "title": "x"},
+    "volume 1 0.5",
+])
+def test_invalid_rejected(msg):
+    with pytest.raises(ProtocolError):
+        parse(msg)
+
+@pytest.mark.parametrize("name", BUNDLE_FORBIDDEN)
+def test_bundle_rejects_non_realtime(name):
+    item = {"cmd": name, "artist": "A", "title": "B"} if name in ("load", "preload") else {"cmd": name, "ch": 0}
+    bundle = {"bundle": [{"cmd": "play"}, item]}
+    with pytest.raises(ProtocolError):
+        parse(bundle)
+    with pytest.raises(ProtocolError):
+        parse(encode_binary(bundle))
+
+def test_bundle_size_limits():
+    with pytest.raises(ProtocolError):
+        parse({"bundle": []})
+    with pytest.raises(ProtocolError):
+        parse({"bundle": [{"cmd": "play"}] * 65})
+
+def test_binary_truncated_and_trailing():
+    data = encode_binary({"cmd": "volume", "ch": 1, "value": 0.5})
+    with pytest.raises(ProtocolError):
+        parse(data[:-1])
+    with pytest.raises(ProtocolError):
+        parse(data + b"\x00")
+    with pytest.raises(ProtocolError):
+        parse(b"")
@@ -0,0 +1,46 @@
+from audio.snapshot import restore_commands
+
+def test_empty_state():
+    assert restore_commands({"state": {}}) == []
+
+def test_restore_order_and_defaults():
+    state = {
+        "decks": [{
+            "song": "KanyeWest-Flashing-Lights",
+            "position": 0.25,
+            "transport": "paused",
+            "speed": 1.1,
+            "channels": [
+                {"volume": 1, "muted": False, "offset": 0, "effects": []},
+                {"volume": 0.5, "muted": True, "offset": 0.2, "effects": [
+                    {"type": "reverb", "x": 0.3, "y": 0.6},
+                    {"type": "delay", "x": 0.1, "y": 0.2, "bypassed": True},
+                ]},
+            ],
+            "buses": {"reverb": {"x": 0.4, "y": 0.5}},
+            "sends": {"reverb": {"1": 0.3, "2": 0}},
+        }, {
+            "speed": None,
+            "channels": [],
+        }],
+        "xfade": 0.7,
+        "volumes": [1, 0.8],
+    }
+    assert restore_commands({"state": state}) == [
+        ("cmd", "@0 speed 1.1"),
+        ("cmd", "@0 volume 1 0.5"),
+        ("cmd", "@0 mute 1"),
+        ("cmd", "@0 offset 1 0.2"),
+        ("fx", "@0 add 1 reverb 0.6"),
+        ("fx", "@0 set 1 0 x 0.3"),
+        ("fx", "@0 add 1 delay 0.2"),
+        ("fx", "@0 set 1 1 x 0.1"),
+        ("fx", "@0 bypass 1 1 1"),
+        ("fx", "@0 bus reverb x 0.4"),
+        ("fx", "@0 bus reverb y 0.5"),
+        ("fx", "@0 send 1 reverb 0.3"),
+        # Song zuletzt, Titel darf selbst Bindestriche enthalten
+        ("cmd", "@0 load KanyeWest Flashing-Lights 0.25 pause"),
+        ("cmd", "xfade 0.7"),
+        ("cmd", "deckvol 1 0.8"),
+    ]